@@ -1,22 +1,86 @@
-from typing import Dict, List
+from typing import Any, Dict, List, Optional
+
+import numpy as np
 
 from ocdb.core.models.dataset import Dataset
 
 
 class DbDataset(Dataset):
+    """
+    A dataset as produced by the readers and stored by the database drivers.
+
+    The measurement values are either held row-wise as list of records or column-wise as one
+    NumPy array per field, if the dataset has been read in columnar mode. Both representations
+    can be accessed in either case: the records are materialised from the columns on first access
+    of ``records``, a column is computed from the records by ``get_column()``.
+    """
 
     def __init__(self,
                  metadata: Dict,
-                 records: List[List[float]],
+                 records: Optional[List[List[float]]],
                  id_: str = None,
                  path: str = None,
                  filename: str = None,
                  user_id: int = None,
                  submission_id: str = None,
-                 status: str = None
+                 status: str = None,
+                 columns: List[np.ndarray] = None
                  ):
-        super().__init__(metadata, records, id_=id_, path=path, filename=filename, user_id=user_id,
-                         submission_id=submission_id, status=status)
+        super().__init__(metadata, records if columns is None else [], id_=id_, path=path, filename=filename,
+                         user_id=user_id, submission_id=submission_id, status=status)
+        self._columns = columns
+        if columns is not None:
+            # records are materialised lazily from the columns
+            self._records = records
+
+    @property
+    def records(self) -> List[List[float]]:
+        if self._records is None:
+            self._records = [list(record) for record in zip(*[column.tolist() for column in self._columns])]
+        return self._records
+
+    @records.setter
+    def records(self, value: List[List[float]]):
+        Dataset.records.fset(self, value)
+        self._columns = None
+
+    @property
+    def columns(self) -> Optional[List[np.ndarray]]:
+        """The typed value arrays, one per field, or None if the dataset is held row-wise."""
+        return self._columns
+
+    @property
+    def is_columnar(self) -> bool:
+        return self._columns is not None
+
+    def get_column(self, index: int) -> np.ndarray:
+        """
+        Get the values of the field at *index*. Columns of integer or floating point numbers are returned
+        as int64 or float64 arrays, all other columns as object arrays.
+        """
+        if self._columns is not None:
+            return self._columns[index]
+        return to_column([record[index] for record in self._records])
+
+    def get_column_values(self, index: int) -> List[Dataset.Field]:
+        """Get the values of the field at *index* as list of plain Python values."""
+        if self._columns is not None:
+            return self._columns[index].tolist()
+        return [record[index] for record in self._records]
+
+    def to_dict(self) -> Dict[str, Any]:
+        result_dict = super().to_dict()
+        # columns are an in-memory representation of the records only
+        del result_dict['columns']
+        return result_dict
+
+    def __eq__(self, other) -> bool:
+        if not isinstance(other, DbDataset):
+            return False
+        return self.to_dict() == other.to_dict()
+
+    # datasets are mutable and compare by value, so like all models they are not hashable
+    __hash__ = None
 
     def add_metadatum(self, key, value):
         self._metadata.update({key: value})
@@ -34,14 +98,37 @@ class DbDataset(Dataset):
 
     @property
     def record_count(self) -> int:
+        if self._records is None:
+            return len(self._columns[0]) if self._columns else 0
         return len(self._records)
 
     def add_record(self, record):
-        self._records.append(record)
+        self.records.append(record)
+        self._columns = None
 
     def add_geo_location(self, lon, lat):
         self._longitudes.append(lon)
         self._latitudes.append(lat)
 
     def add_time(self, timestamp):
+        if isinstance(self._times, np.ndarray):
+            self._times = self._times.tolist()
         self._times.append(timestamp)
+
+
+def to_column(values: List[Any]) -> np.ndarray:
+    """
+    Convert the parsed *values* of a single field into a typed array. Integer columns become int64,
+    numeric columns float64 arrays. Columns containing any other value are kept as object arrays.
+    """
+    types = set(type(value) for value in values)
+    if types <= {int}:
+        try:
+            return np.array(values, dtype=np.int64)
+        except OverflowError:
+            pass
+    if types <= {int, float}:
+        return np.array(values, dtype=np.float64)
+    column = np.empty(len(values), dtype=object)
+    column[:] = values
+    return column
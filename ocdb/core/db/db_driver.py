@@ -1,14 +1,15 @@
 from abc import abstractmethod
-from typing import Optional, List
+from typing import Any, Dict, Optional, List, Tuple
 
 from ocdb.core.db.db_links import DbLinks
 from ocdb.core.db.db_submission import DbSubmission
 from ocdb.core.db.db_user import DbUser
 from ocdb.core.models.submission_file import SubmissionFile
-from .. import Service
+from .. import Service, UNDEFINED
 from ..models import DatasetQueryResult
 from ..models.dataset import Dataset
 from ..models.dataset_query import DatasetQuery
+from ..models.issue import Issue
 
 
 class DbDriver(Service):
@@ -17,17 +18,32 @@ class DbDriver(Service):
     def add_dataset(self, dataset: Dataset) -> str:
         """Add new dataset and return ID."""
 
+    @abstractmethod
+    def add_datasets(self, datasets: List[Dataset]) -> List[str]:
+        """Add new datasets in bulk and return their IDs. Either all or none of the datasets are added."""
+
     @abstractmethod
     def update_dataset(self, dataset: Dataset) -> bool:
         """Update existing dataset and return success."""
 
+    @abstractmethod
+    def update_dataset_metadata(self, dataset_id: str, patch: Dict[str, Any]) -> bool:
+        """
+        Set the given top-level or dotted fields, e.g. ``{"metadata.qc_info": {...}}``, of an existing dataset
+        without touching its records, and return success.
+        """
+
     @abstractmethod
     def delete_dataset(self, dataset_id: str) -> bool:
         """Delete existing dataset by ID and return success."""
 
     @abstractmethod
-    def get_dataset(self, dataset_id: str) -> Optional[Dataset]:
-        """Get existing dataset by ID."""
+    def delete_datasets_by_submission(self, submission_id: str, exclude_dataset_ids: List[str] = None) -> int:
+        """Delete all datasets of a submission, except the excluded ones, and return their number."""
+
+    @abstractmethod
+    def get_dataset(self, dataset_id: str, fields: Optional[List[str]] = None) -> Optional[Dataset]:
+        """Get existing dataset by ID. If *fields* are given, the records contain only the values of these fields."""
 
     @abstractmethod
     def find_datasets(self, query: DatasetQuery) -> DatasetQueryResult:
@@ -60,19 +76,24 @@ class DbDriver(Service):
     def get_submission_file_by_filename(self, submission_id: str, file_name: str) -> Optional[SubmissionFile]:
         """Get existing submission_file by file name."""
 
+    @abstractmethod
+    def get_submission_file_issues(self, submission_id: str, index: int, offset: int = None,
+                                   count: int = None) -> Tuple[List[Issue], int]:
+        """Get a page of the validation issues of an existing submission file, and their total count."""
+
     @abstractmethod
     def get_submissions(self, offset: int = None, count: int = None, user_id: str = None, query_column: str = None,
                         query_value: str = None, query_operator: str = None, sort_column: str = None,
-                        sort_order: str = None) -> List[DbSubmission]:
-        """Get existing submissions for user."""
+                        sort_order: str = None, after_submission_id: str = None) -> Tuple[List[DbSubmission], int]:
+        """Get a page of existing submissions, starting at offset or after the given submission, and the total count."""
 
     @abstractmethod
     def get_submissions_for_user(self, user_name: str, offset: int = None, count: int = None) -> List[DbSubmission]:
         """Get existing submissions for user."""
 
     @abstractmethod
-    def get_submission(self, submission_id: str) -> Optional[DbSubmission]:
-        """Get existing submission_file by ID."""
+    def get_submission(self, submission_id: str, include_files: bool = True) -> Optional[DbSubmission]:
+        """Get existing submission by ID, without its files if include_files is false."""
 
     @abstractmethod
     def delete_submission(self, submission_id: str) -> bool:
@@ -82,6 +103,30 @@ class DbDriver(Service):
     def update_submission(self, submission: DbSubmission) -> bool:
         """Get existing submission_file by ID."""
 
+    @abstractmethod
+    def update_submission_fields(self, submission_id: str, fields: Dict[str, Any]) -> bool:
+        """Set the given top-level fields of an existing submission, except its files, and return success."""
+
+    @abstractmethod
+    def set_submission_status(self, submission_id: str, status: str, publication_date=UNDEFINED) -> bool:
+        """Set the status and optionally the publication date of an existing submission and return success."""
+
+    @abstractmethod
+    def set_submission_file_status(self, submission_id: str, index: int, status: str) -> bool:
+        """Set the status of the file at index of an existing submission and return success."""
+
+    @abstractmethod
+    def set_submission_file(self, submission_id: str, index: int, file: SubmissionFile, status: str = None) -> bool:
+        """Replace the file at index of an existing submission, optionally setting its status, and return success."""
+
+    @abstractmethod
+    def push_submission_file(self, submission_id: str, file: SubmissionFile, status: str = None) -> bool:
+        """Append a file to an existing submission, optionally setting its status, and return success."""
+
+    @abstractmethod
+    def pull_submission_file(self, submission_id: str, index: int) -> bool:
+        """Remove the file at index of an existing submission, renumbering the following files, and return success."""
+
     @abstractmethod
     def add_user(self, user: DbUser) -> str:
         """Add new user"""
@@ -113,3 +158,8 @@ class DbDriver(Service):
     @abstractmethod
     def update_links(self, content: DbLinks) -> bool:
         """Update Links page content"""
+
+    # noinspection PyMethodMayBeStatic
+    def get_query_stats(self, limit: int = 20, explain: bool = False) -> Optional[List[Dict[str, Any]]]:
+        """Get the statistics of the slowest query shapes, or None if queries are not traced."""
+        return None
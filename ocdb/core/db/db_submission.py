@@ -42,6 +42,9 @@ class DbSubmission(Submission):
 
     @property
     def files(self):
+        # files read from the database are only converted into models when accessed
+        if self._files and isinstance(self._files[0], dict):
+            self._files = [SubmissionFile.from_dict(file_dict) for file_dict in self._files]
         return self._files
 
     @files.setter
@@ -76,12 +79,6 @@ class DbSubmission(Submission):
     def from_dict(cls: Type[T], dictionary: Dict[str, Any]):
         subm = super().from_dict(dictionary)
 
-        subm_files_array = []
-        files_array = dictionary["files"]
-        for file_dict in files_array:
-            submf = SubmissionFile.from_dict(file_dict)
-            subm_files_array.append(submf)
-
         path = dictionary["path"]
         id_ = None
         if "id" in dictionary:
@@ -96,12 +93,12 @@ class DbSubmission(Submission):
                             store_user_path=dictionary['store_sub_path'],
                             publication_date=subm.publication_date,
                             allow_publication=subm.allow_publication,
-                            files=subm_files_array,
+                            files=list(dictionary["files"]),
                             id_=id_)
 
     def to_submission(self):
         file_refs = []
-        for file in self._files:
+        for file in self.files:
             file_refs.append(file.to_ref())
 
         subm = Submission(submission_id=self._submission_id,
@@ -1,6 +1,7 @@
 import os
 import re
 from logging import LoggerAdapter
+from typing import TextIO
 from datetime import datetime
 import chardet
 
@@ -124,14 +125,20 @@ class CalCharValidator:
 
         return cls._filename_compiled_reg_ex
 
-    def validate(self, filename: str, text: bytes, log: LoggerAdapter) -> dict[str: str] or None:
+    def validate(self, filename: str, text: bytes or TextIO, log: LoggerAdapter) -> dict[str: str] or None:
+        """
+        :param text: The file content, or a text file opened with newline='', which is read line by line
+        """
         class_or_serial, file_type, date_time = self._split_up_filename(filename)
 
         valid_types = self._get_valid_types_as_list()
         if file_type not in valid_types:
             return {filename: f"Unknown filetype. Valid filetypes are {valid_types}."}
 
-        lines = self._convert_bytes_to_lines(text)
+        if isinstance(text, bytes):
+            lines = self._convert_bytes_to_lines(text)
+        else:
+            lines = self._read_lines(text)
         num_lines = len(lines)
 
         wrong_keyword = self._check_keyword_in_file_matches_the_file_type_specified_in_the_file_name(file_type, lines)
@@ -273,6 +280,25 @@ class CalCharValidator:
         # lines = [x for x in lines if not x.startswith("#") or x != ""]  # removes comment lines and empty lines
         return lines
 
+    @staticmethod
+    def _read_lines(text_io: TextIO) -> list[str]:
+        # the same lines as _convert_bytes_to_lines(), which takes "\n\r" as a single line break
+        lines = []
+        line = ''
+        for line in text_io:
+            if line.startswith('\r') and lines and previous_line.endswith('\n') \
+                    and not previous_line.endswith('\r\n'):
+                # the "\r" completes the line break of the previous line
+                line = line[1:]
+                if not line:
+                    previous_line = '\n\r'
+                    continue
+            lines.append(line.strip())
+            previous_line = line
+        if not lines or line.endswith(('\n', '\r')) or previous_line == '\n\r':
+            lines.append('')
+        return lines
+
     @staticmethod
     def _extract_metadata_key_information_from(lines) -> dict[int, str]:
         idx = -1
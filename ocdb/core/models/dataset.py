@@ -22,6 +22,8 @@
 
 from typing import Dict, List, Optional, Union, Any
 
+import numpy as np
+
 from ..asserts import assert_not_none
 from ..model import Model
 
@@ -168,8 +170,11 @@ class Dataset(Model):
 
     def to_dict(self) -> Dict[str, Any]:
         result_dict = super().to_dict()
-        converted_times = []
-        for time in self._times:
-            converted_times.append(time.isoformat())
+        if isinstance(self._times, np.ndarray):
+            converted_times = np.datetime_as_string(self._times, unit='s').tolist()
+        else:
+            converted_times = []
+            for time in self._times:
+                converted_times.append(time.isoformat())
         result_dict.update({'times': converted_times})
         return result_dict
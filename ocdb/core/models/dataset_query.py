@@ -46,7 +46,8 @@ class DatasetQuery(Model):
                  offset: int = 1,
                  user_id: str = None,
                  wlmode: str = None,
-                 count: int = 1000):
+                 count: int = 1000,
+                 max_total_count: int = None):
         self._expr = expr
         self._region = region
         self._time = time
@@ -61,6 +62,7 @@ class DatasetQuery(Model):
         self._geojson = geojson
         self._offset = offset
         self._count = count
+        self._max_total_count = max_total_count
         self._wlmode = wlmode
         self._user_id = user_id
 
@@ -184,6 +186,15 @@ class DatasetQuery(Model):
     def count(self, value: Optional[int]):
         self._count = value
 
+    @property
+    def max_total_count(self) -> Optional[int]:
+        """Stop counting the total number of results at this number, None to count all."""
+        return self._max_total_count
+
+    @max_total_count.setter
+    def max_total_count(self, value: Optional[int]):
+        self._max_total_count = value
+
     @property
     def user_id(self) -> Optional[int]:
         return self._user_id
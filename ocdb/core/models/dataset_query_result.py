@@ -37,12 +37,14 @@ class DatasetQueryResult(Model):
                  locations: dict,
                  total_count: int,
                  datasets: List[DatasetRef],
-                 query: DatasetQuery):
+                 query: DatasetQuery,
+                 total_count_exact: bool = True):
         assert_not_none(total_count, name='total_count')
         assert_not_none(datasets, name='datasets')
         assert_not_none(query, name='query')
         self._locations = locations
         self._total_count = total_count
+        self._total_count_exact = total_count_exact
         self._datasets = datasets
         self._query = query
         self._dataset_ids = [dataset.id for dataset in datasets]
@@ -65,6 +67,16 @@ class DatasetQueryResult(Model):
         assert_not_none(value, name='value')
         self._total_count = value
 
+    @property
+    def total_count_exact(self) -> bool:
+        """False, if counting has stopped at the query's max_total_count, so that total_count is a lower bound."""
+        return self._total_count_exact
+
+    @total_count_exact.setter
+    def total_count_exact(self, value: bool):
+        assert_not_none(value, name='value')
+        self._total_count_exact = value
+
     @property
     def datasets(self) -> List[DatasetRef]:
         return self._datasets
@@ -1,9 +1,19 @@
 from datetime import datetime, date
-from typing import Optional
+from typing import Any, Dict, Optional, Sequence, Union
 
 from ...core.models.submission_file_ref import SubmissionFileRef
 from ...core.model import Model
 from ...core.models import DatasetValidationResult
+from ...core.models.issue import Issue, ISSUE_TYPE_ERROR, ISSUE_TYPE_WARNING
+
+# the number of validation issues per issue type, stored in the result of a submission file instead of the issues
+ISSUE_COUNTS = 'issue_counts'
+
+
+def count_issues(issues: Sequence[Union[Issue, Dict[str, Any]]]) -> Dict[str, int]:
+    """Count the validation *issues*, given as models or as dicts, per issue type."""
+    types = [issue['type'] if isinstance(issue, dict) else issue.type for issue in issues]
+    return {issue_type: types.count(issue_type) for issue_type in (ISSUE_TYPE_ERROR, ISSUE_TYPE_WARNING)}
 
 
 class SubmissionFile(Model):
@@ -79,9 +89,23 @@ class SubmissionFile(Model):
     def result(self, value: DatasetValidationResult):
         self._result = value
 
+    @property
+    def issue_counts(self) -> Optional[Dict[str, int]]:
+        """The number of validation issues per issue type, None if the file has no validation result."""
+        result = self._result
+        if result is None:
+            return None
+        if not isinstance(result, dict):
+            return count_issues(result.issues)
+        # results read from the database carry the counts only, the issues are stored separately
+        if ISSUE_COUNTS in result:
+            return result[ISSUE_COUNTS]
+        return count_issues(result.get('issues') or [])
+
     def to_ref(self) -> SubmissionFileRef:
         return SubmissionFileRef(index=self._index,
                                  submission_id=self._submission_id,
                                  filename=self._filename,
                                  filetype=self._filetype,
-                                 status=self._status)
+                                 status=self._status,
+                                 issue_counts=self.issue_counts)
@@ -1,5 +1,5 @@
 from datetime import datetime
-from typing import Optional
+from typing import Dict, Optional
 
 from ..model import Model
 
@@ -11,13 +11,15 @@ class SubmissionFileRef(Model):
                  filename: str,
                  filetype: str,
                  status: str,
-                 creationdate: Optional[datetime] = datetime.now()):
+                 creationdate: Optional[datetime] = datetime.now(),
+                 issue_counts: Optional[Dict[str, int]] = None):
         self._index = index
         self._submission_id = submission_id
         self._filename = filename
         self._filetype = filetype
         self._creationdate = creationdate
         self._status = status
+        self._issue_counts = issue_counts
 
     @property
     def index(self):
@@ -66,3 +68,11 @@ class SubmissionFileRef(Model):
     @creationdate.setter
     def creationdate(self, value: str):
         self._creationdate = value
+
+    @property
+    def issue_counts(self) -> Optional[Dict[str, int]]:
+        return self._issue_counts
+
+    @issue_counts.setter
+    def issue_counts(self, value: Optional[Dict[str, int]]):
+        self._issue_counts = value
@@ -20,8 +20,11 @@
 # SOFTWARE.
 
 import datetime
+import os
 import re
-from typing import List, Sequence, Any
+from typing import List, Sequence, Any, Iterable, Iterator, Optional, Tuple
+
+import numpy as np
 
 from ..db.db_dataset import DbDataset
 from ..models.dataset import Dataset
@@ -29,31 +32,98 @@ from ...db.static_data import get_groups_for_product
 
 EOF = 'end_of_file'
 
+COLUMNAR_CHUNK_SIZE = 4096
+DEFAULT_CHUNK_SIZE = 10000
+
 
 class SbFileReader:
 
-    def __init__(self):
-        self._lines = []
+    def __init__(self, columnar: bool = False):
+        """
+        :param columnar: If True, the measurement values are parsed into one typed NumPy array per field
+            instead of a list of records. See ``DbDataset.columns``.
+        """
+        self._lines = iter([])
         self._line_index = 0
+        self._row_count = 0
+        self._num_columns = None
         self._field_list = None
+        self._columnar = columnar
 
     def read(self, file_obj: Any) -> Dataset:
         """
         Read a Dataset from plain text file in SeaBASS format.
 
-        :param file_obj: A path or a file-like object.
+        :param file_obj: A path, a file-like object or any other iterable of lines.
         :return: A Dataset
         """
-        self._line_index = 0
-        if hasattr(file_obj, "readlines"):
-            return self._parse(file_obj.readlines())
-        else:
+        if isinstance(file_obj, (str, bytes, os.PathLike)):
+            with open(file_obj, 'r') as fp:
+                return self._parse(fp)
+        return self._parse(file_obj)
+
+    def read_chunks(self, file_obj: Any, chunk_size: int = DEFAULT_CHUNK_SIZE) -> Iterator[DbDataset]:
+        """
+        Read a plain text file in SeaBASS format chunk-wise. Lines are consumed lazily, so that
+        memory consumption is bounded by *chunk_size* rather than by the size of the file.
+
+        Each chunk is a Dataset with the complete metadata, attributes and groups, and at most *chunk_size*
+        records together with their geo-locations and times. Header errors are raised before the first chunk
+        is returned, format errors in the records when reaching the chunk that contains them.
+
+        :param file_obj: A path, a file-like object or any other iterable of lines.
+        :param chunk_size: The maximum number of records per chunk.
+        :return: An iterator over Datasets
+        """
+        if chunk_size < 1:
+            raise ValueError("chunk_size must be a positive number")
+
+        if isinstance(file_obj, (str, bytes, os.PathLike)):
+            with open(file_obj, 'r') as fp:
+                yield from self.read_chunks(fp, chunk_size=chunk_size)
+            return
+
+        metadata, delimiter_regex = self._parse_metadata(file_obj)
+        while True:
+            dataset = self._parse_chunk(metadata, delimiter_regex, chunk_size)
+            if dataset is None:
+                return
+            yield dataset
+
+    def read_header(self, file_obj: Any, count_rows: bool = False) -> 'SbFileHeader':
+        """
+        Read the header of a plain text file in SeaBASS format only. Reading stops at "/end_header",
+        unless *count_rows* is True. Then the remaining lines are counted, but not parsed.
+
+        :param file_obj: A path, a file-like object or any other iterable of lines.
+        :param count_rows: Whether to count the data rows.
+        :return: The header
+        """
+        if isinstance(file_obj, (str, bytes, os.PathLike)):
             with open(file_obj, 'r') as fp:
-                return self._parse(fp.readlines())
+                return self.read_header(fp, count_rows=count_rows)
+
+        metadata, delimiter_regex = self._parse_metadata(file_obj)
+        self._check_fields_and_units_present(metadata)
 
-    def _parse(self, lines: Sequence[str]) -> DbDataset:
+        num_fields = len(metadata['fields'].split(','))
+        num_units = len(metadata['units'].split(','))
+        if num_fields != num_units:
+            raise SbFormatError('Number of fields (' + str(num_fields) + ') does not match ' +
+                                'number of units (' + str(num_units) + ').')
+
+        row_count = self._count_rows(delimiter_regex) if count_rows else None
+        return SbFileHeader(metadata, self._extract_field_list(), self._extract_group_list(), row_count=row_count)
 
-        self._lines = lines
+    def _parse(self, lines: Iterable[str]) -> DbDataset:
+        metadata, delimiter_regex = self._parse_metadata(lines)
+        return self._parse_chunk(metadata, delimiter_regex)
+
+    def _parse_metadata(self, lines: Iterable[str]) -> Tuple[dict, str]:
+        self._lines = iter(lines)
+        self._line_index = 0
+        self._row_count = 0
+        self._num_columns = None
 
         self.handle_header = None
 
@@ -69,19 +139,30 @@ class SbFileReader:
             raise SbFormatError("/end_header tag missing")
 
         delimiter_regex = self._extract_delimiter_regex(metadata)
-        records = self._parse_records(delimiter_regex)
+        return metadata, delimiter_regex
 
-        if 'fields' not in metadata:
-            raise SbFormatError(
-                'SeaBASS header field "fields" required. See: https://seabass.gsfc.nasa.gov/wiki/metadataheaders#fields')
+    def _parse_chunk(self, metadata: dict, delimiter_regex: str,
+                     chunk_size: Optional[int] = None) -> Optional[DbDataset]:
+        """
+        Parse the next *chunk_size* records, or all remaining records if *chunk_size* is None.
+        In the chunked case, None is returned if there are no more records.
+        """
+        if self._columnar:
+            records = None
+            columns = self._parse_columns(delimiter_regex, max_count=chunk_size)
+            if chunk_size is not None and (not columns or len(columns[0]) == 0):
+                return None
+        else:
+            records = self._parse_records(delimiter_regex, max_count=chunk_size)
+            columns = None
+            if chunk_size is not None and not records:
+                return None
 
-        if 'units' not in metadata:
-            raise SbFormatError(
-                'SeaBASS header field "units" required. See: https://seabass.gsfc.nasa.gov/wiki/metadataheaders#units')
+        self._check_fields_and_units_present(metadata)
 
         num_fields = len(metadata['fields'].split(','))
         num_units = len(metadata['units'].split(','))
-        len_record = len(records[0])
+        len_record = len(columns) if self._columnar else len(records[0])
 
         if num_fields != len_record:
             raise SbFormatError('Number of fields (' + str(num_fields) + ') does not match ' +
@@ -91,7 +172,8 @@ class SbFileReader:
             raise SbFormatError('Number of fields (' + str(num_fields) + ') does not match ' +
                                 'number of units (' + str(num_units) + ').')
 
-        dataset = DbDataset(metadata, records)
+        # every chunk gets its own copy, as callers usually amend the metadata
+        dataset = DbDataset(dict(metadata), records, columns=columns)
         dataset.attributes = self._extract_field_list()
         dataset.groups = self._extract_group_list()
 
@@ -99,13 +181,30 @@ class SbFileReader:
 
         return dataset
 
+    @classmethod
+    def _check_fields_and_units_present(cls, metadata: dict):
+        if 'fields' not in metadata:
+            raise SbFormatError(
+                'SeaBASS header field "fields" required. See: https://seabass.gsfc.nasa.gov/wiki/metadataheaders#fields')
+
+        if 'units' not in metadata:
+            raise SbFormatError(
+                'SeaBASS header field "units" required. See: https://seabass.gsfc.nasa.gov/wiki/metadataheaders#units')
+
+    def _count_rows(self, delimiter_regex: str) -> int:
+        # counts the lines _parse_records() would turn into records, without splitting them
+        delimiter_pattern = re.compile(delimiter_regex)
+        row_count = 0
+        for line in self._lines:
+            if line != '\n' and delimiter_pattern.search(line) is not None:
+                row_count += 1
+        return row_count
+
     def _next_line(self) -> str:
-        if self._line_index < len(self._lines):
-            line = self._lines[self._line_index]
+        line = next(self._lines, EOF)
+        if line is not EOF:
             self._line_index += 1
-            return line
-
-        return EOF
+        return line
 
     def _parse_header(self) -> dict:
         metadata = dict()
@@ -184,14 +283,21 @@ class SbFileReader:
     def _extract_times(self, dataset):
         # Check for '[GMT]' if start_time from Metadata is used,
         # otherwise use check_gmt=False.
+        #
+        # Per-record times are converted into a datetime64 array in one pass. If this fails due to
+        # an invalid value, the row-wise conversion is used, which reports the first offending row.
         if 'date' in dataset.attribute_names and 'time' in dataset.attribute_names:
             # all time info in records as 'date' and 'time'
             date_index = dataset.attribute_names.index('date')
             time_index = dataset.attribute_names.index('time')
-            for record in dataset.records:
-                date_string = str(record[date_index])
-                time_string = str(record[time_index])
-                timestamp = self._extract_date(date_string, time_string, check_gmt=False)
+            times = self._to_datetime64(dataset.get_column(date_index), dataset.get_column(time_index))
+            if times is not None:
+                dataset.times = times
+                return
+
+            for date_value, time_value in zip(dataset.get_column_values(date_index),
+                                              dataset.get_column_values(time_index)):
+                timestamp = self._extract_date(str(date_value), str(time_value), check_gmt=False)
                 dataset.add_time(timestamp)
         # Year, month, day, hour, min and second defined per record
         elif 'year' in dataset.attribute_names and 'hour' in dataset.attribute_names:
@@ -200,28 +306,48 @@ class SbFileReader:
             day_index = dataset.attribute_names.index('day')
             hour_index = dataset.attribute_names.index('hour')
             minute_index = dataset.attribute_names.index('minute')
-            second_index = -1
-            if 'second' in dataset.attribute_names:
-                second_index = dataset.attribute_names.index('second')
-
-            for record in dataset.records:
-                year = record[year_index]
-                month = record[month_index]
-                day = record[day_index]
-                hour = record[hour_index]
-                minute = record[minute_index]
-                second = 0
-                if second_index >= 0:
-                    second = record[second_index]
+            second_index = dataset.attribute_names.index('second') if 'second' in dataset.attribute_names else -1
+
+            years = dataset.get_column(year_index)
+            times = self._parts_to_datetime64(years,
+                                              dataset.get_column(month_index),
+                                              dataset.get_column(day_index),
+                                              dataset.get_column(hour_index),
+                                              dataset.get_column(minute_index),
+                                              dataset.get_column(second_index) if second_index >= 0
+                                              else np.zeros(len(years), dtype=np.int64))
+            if times is not None:
+                dataset.times = times
+                return
+
+            years = dataset.get_column_values(year_index)
+            if second_index >= 0:
+                seconds = dataset.get_column_values(second_index)
+            else:
+                seconds = [0] * len(years)
+
+            for year, month, day, hour, minute, second in zip(years,
+                                                               dataset.get_column_values(month_index),
+                                                               dataset.get_column_values(day_index),
+                                                               dataset.get_column_values(hour_index),
+                                                               dataset.get_column_values(minute_index),
+                                                               seconds):
                 dataset.add_time(datetime.datetime(year, month, day, hour, minute, second))
 
         elif 'date' not in dataset.attribute_names and 'time' in dataset.attribute_names:
             # time information split into header and record part
             start_date_string = dataset.metadata['start_date']
             time_index = dataset.attribute_names.index('time')
-            for record in dataset.records:
-                time_string = str(record[time_index])
-                timestamp = self._extract_date(start_date_string, time_string, check_gmt=False)
+            time_column = dataset.get_column(time_index)
+            times_of_day = self._times_to_timedelta64(time_column) if len(time_column) > 0 else None
+            if times_of_day is not None:
+                # raises the same date errors as the row-wise conversion of the first record
+                start_date = self._extract_date(start_date_string, '00:00:00', check_gmt=False)
+                dataset.times = np.datetime64(start_date, 's') + times_of_day
+                return
+
+            for time_value in dataset.get_column_values(time_index):
+                timestamp = self._extract_date(start_date_string, str(time_value), check_gmt=False)
                 dataset.add_time(timestamp)
 
         elif 'start_date' in dataset.metadata and 'start_time' in dataset.metadata:
@@ -246,9 +372,7 @@ class SbFileReader:
         if 'lon' in dataset.attribute_names and 'lat' in dataset.attribute_names:
             lon_index = dataset.attribute_names.index('lon')
             lat_index = dataset.attribute_names.index('lat')
-            for record in dataset.records:
-                lon = record[lon_index]
-                lat = record[lat_index]
+            for lon, lat in zip(dataset.get_column_values(lon_index), dataset.get_column_values(lat_index)):
                 dataset.add_geo_location(lon, lat)
 
         elif 'north_latitude' in dataset.metadata:
@@ -269,10 +393,10 @@ class SbFileReader:
         else:
             return "n_a"
 
-    def _parse_records(self, delimiter_regex) -> List[List[Dataset.Field]]:
+    def _parse_records(self, delimiter_regex, max_count: int = None) -> List[List[Dataset.Field]]:
         records = []
 
-        while True:
+        while max_count is None or len(records) < max_count:
             line = self._next_line()
             if line == EOF:
                 break
@@ -288,24 +412,100 @@ class SbFileReader:
             record = []
             for token in tokens:
                 if len(token) < 1:
-                    row = len(records) + 1
+                    row = self._row_count + len(records) + 1
                     column = len(record) + 1
                     raise SbFormatError('Value missing in data row {row} and column {col}. Please use '
                                         'the placeholder as defined in metadata header “/missing”.'
                                         .format(row=row, col=column))
 
-                if self._is_number(token):
-                    if self._is_integer(token):
-                        record.append(int(token))
-                    else:
-                        record.append(float(token))
-                else:
-                    record.append(token)
+                record.append(self._convert_token(token))
 
             records.append(record)
 
+        self._row_count += len(records)
         return records
 
+    def _parse_columns(self, delimiter_regex, max_count: int = None) -> List[np.ndarray]:
+        split = re.compile(delimiter_regex).split
+        num_fields = len(self._field_list.split(',')) if self._field_list is not None else None
+        row = self._row_count
+        chunk = []
+        column_chunks = [[] for _ in range(self._num_columns or 0)]
+
+        while max_count is None or row - self._row_count < max_count:
+            line = self._next_line()
+            if line == EOF:
+                break
+            if line == '\n':
+                continue
+
+            tokens = [s.strip() for s in split(line)]
+            if len(tokens) <= 1:
+                # some files have whitespace between header and records - skip this here tb 2018-09-21
+                continue
+
+            row += 1
+            if '' in tokens:
+                raise SbFormatError('Value missing in data row {row} and column {col}. Please use '
+                                    'the placeholder as defined in metadata header “/missing”.'
+                                    .format(row=row, col=tokens.index('') + 1))
+
+            if self._num_columns is None:
+                self._num_columns = len(tokens)
+                column_chunks = [[] for _ in range(self._num_columns)]
+            elif len(tokens) != self._num_columns:
+                raise SbFormatError('Number of fields (' + str(num_fields or self._num_columns) + ') does not match ' +
+                                    'number of columns (' + str(len(tokens)) + ').')
+
+            chunk.append(tokens)
+            if len(chunk) == COLUMNAR_CHUNK_SIZE:
+                self._append_column_chunks(column_chunks, chunk)
+                chunk = []
+
+        if chunk:
+            self._append_column_chunks(column_chunks, chunk)
+
+        self._row_count = row
+        return [self._concatenate_column_chunks(chunks) for chunks in column_chunks]
+
+    @classmethod
+    def _append_column_chunks(cls, column_chunks: List[List[np.ndarray]], rows: List[List[str]]):
+        for column_index, tokens in enumerate(zip(*rows)):
+            column_chunks[column_index].append(cls._tokens_to_column(tokens))
+
+    @classmethod
+    def _tokens_to_column(cls, tokens: Sequence[str]) -> np.ndarray:
+        try:
+            return np.array(tokens, dtype=np.int64)
+        except (ValueError, OverflowError):
+            pass
+        try:
+            return np.array(tokens, dtype=np.float64)
+        except ValueError:
+            pass
+        # a real string column, or numbers mixed with strings
+        column = np.empty(len(tokens), dtype=object)
+        column[:] = [cls._convert_token(token) for token in tokens]
+        return column
+
+    @classmethod
+    def _concatenate_column_chunks(cls, chunks: List[np.ndarray]) -> np.ndarray:
+        if len(chunks) == 0:
+            return np.array([])
+        if len(chunks) == 1:
+            return chunks[0]
+        if any(chunk.dtype == object for chunk in chunks):
+            return np.concatenate([chunk.astype(object) for chunk in chunks])
+        return np.concatenate(chunks)
+
+    @classmethod
+    def _convert_token(cls, token: str) -> Dataset.Field:
+        if cls._is_number(token):
+            if cls._is_integer(token):
+                return int(token)
+            return float(token)
+        return token
+
     @classmethod
     def _extract_delimiter_regex(cls, metadata):
         if 'delimiter' not in metadata:
@@ -345,6 +545,87 @@ class SbFileReader:
             parse_str = angle_str[0:unit_index]
         return float(parse_str)
 
+    @classmethod
+    def _to_datetime64(cls, dates: np.ndarray, times: np.ndarray) -> Optional[np.ndarray]:
+        """
+        Convert a column of YYYYMMDD dates and a column of HH:MM:SS times into a datetime64 array.
+        Return None, if any of the values is invalid or not in the expected format.
+        """
+        if dates.dtype != np.int64 or np.any((dates < 10000000) | (dates > 99999999)):
+            return None
+
+        days = cls._days_to_datetime64(dates // 10000, dates // 100 % 100, dates % 100,
+                                       1900, datetime.datetime.now().year)
+        if days is None:
+            return None
+
+        times_of_day = cls._times_to_timedelta64(times)
+        if times_of_day is None:
+            return None
+
+        return days + times_of_day
+
+    @classmethod
+    def _parts_to_datetime64(cls, years: np.ndarray, months: np.ndarray, days: np.ndarray,
+                             hours: np.ndarray, minutes: np.ndarray, seconds: np.ndarray) -> Optional[np.ndarray]:
+        """
+        Convert integer columns of years, months, days, hours, minutes and seconds into a datetime64 array.
+        Return None, if any of the values is invalid.
+        """
+        if any(column.dtype != np.int64 for column in (years, months, days, hours, minutes, seconds)):
+            return None
+
+        dates = cls._days_to_datetime64(years, months, days, datetime.MINYEAR, datetime.MAXYEAR)
+        if dates is None:
+            return None
+
+        if np.any((hours < 0) | (hours > 23) | (minutes < 0) | (minutes > 59) | (seconds < 0) | (seconds > 59)):
+            return None
+
+        return dates + (hours * 3600 + minutes * 60 + seconds).astype('timedelta64[s]')
+
+    @classmethod
+    def _days_to_datetime64(cls, years: np.ndarray, months: np.ndarray, days: np.ndarray,
+                            min_year: int, max_year: int) -> Optional[np.ndarray]:
+        if np.any((years < min_year) | (years > max_year) |
+                  (months < 1) | (months > 12) |
+                  (days < 1) | (days > 31)):
+            return None
+
+        year_months = ((years - 1970) * 12 + months - 1).astype('datetime64[M]')
+        dates = year_months.astype('datetime64[D]') + (days - 1).astype('timedelta64[D]')
+        # days beyond the end of the month, e.g. 20020230
+        if np.any(dates.astype('datetime64[M]') != year_months):
+            return None
+
+        return dates
+
+    @classmethod
+    def _times_to_timedelta64(cls, times: np.ndarray) -> Optional[np.ndarray]:
+        """
+        Convert a column of HH:MM:SS strings into a timedelta64 array of the times of day.
+        Return None, if any of the values is not a valid time in this format.
+        """
+        if times.dtype != object:
+            return None
+
+        strings = np.array(times.tolist(), dtype=str)
+        if strings.dtype != np.dtype('<U8'):
+            return None
+
+        codes = strings.view(np.uint32).reshape(-1, 8).astype(np.int64) - ord('0')
+        digits = codes[:, [0, 1, 3, 4, 6, 7]]
+        if np.any(codes[:, [2, 5]] != ord(':') - ord('0')) or np.any((digits < 0) | (digits > 9)):
+            return None
+
+        hours = digits[:, 0] * 10 + digits[:, 1]
+        minutes = digits[:, 2] * 10 + digits[:, 3]
+        seconds = digits[:, 4] * 10 + digits[:, 5]
+        if np.any(hours > 23) or np.any(minutes > 59) or np.any(seconds > 59):
+            return None
+
+        return (hours * 3600 + minutes * 60 + seconds).astype('timedelta64[s]')
+
     @classmethod
     def _extract_date(cls, date_str, time_str, check_gmt=False):
 
@@ -403,6 +684,23 @@ class SbFileReader:
             raise SbFormatError(f"Invalid date or time format ({date_time_str}): {str(e)}")
 
 
+class SbFileHeader:
+    """
+    The header of a SeaBASS file as read by ``SbFileReader.read_header()``.
+
+    :param metadata: The header metadata
+    :param attributes: The lower-case field names
+    :param groups: The product groups of the fields
+    :param row_count: The number of data rows, if counted
+    """
+
+    def __init__(self, metadata: dict, attributes: List[str], groups: List[str], row_count: Optional[int] = None):
+        self.metadata = metadata
+        self.attributes = attributes
+        self.groups = groups
+        self.row_count = row_count
+
+
 # noinspection PyArgumentList
 class SbFormatError(Exception):
     """
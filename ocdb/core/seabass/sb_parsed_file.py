@@ -0,0 +1,190 @@
+# The MIT License (MIT)
+# Copyright (c) 2018 by EUMETSAT
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy of
+# this software and associated documentation files (the "Software"), to deal in
+# the Software without restriction, including without limitation the rights to
+# use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies
+# of the Software, and to permit persons to whom the Software is furnished to do
+# so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+"""
+Parsed representation of an uploaded SeaBASS file, stored in a cache directory outside the upload space.
+
+The artifact holds the header, the typed columns, times and geo-locations of the dataset. It is named after the
+content hash of the file it has been parsed from, so that the file must only be parsed again if it has been changed
+in the meantime, and users cannot name or overwrite it.
+
+The artifact is a NumPy ``.npz`` archive, which is written and loaded without pickling, so loading it never executes
+code. The metadata and the values of columns without a numeric type are stored as UTF-8 encoded JSON.
+"""
+
+import datetime
+import hashlib
+import json
+import os
+import zipfile
+from typing import Any, Optional
+
+import numpy as np
+
+from .sb_file_reader import SbFileReader
+from ..db.db_dataset import DbDataset
+
+PARSED_FILE_SUFFIX = '.parsed'
+PARSED_FILE_VERSION = 2
+
+_HASH_BLOCK_SIZE = 1024 * 1024
+
+_HEADER = 'header'
+_TIMES = 'times'
+_COLUMN_PREFIX = 'column_'
+
+_KIND_ARRAY = 'array'
+_KIND_JSON = 'json'
+_KIND_DATETIME = 'datetime'
+
+
+def get_parsed_file_path(cache_dir_path: str, content_hash: str) -> str:
+    return os.path.join(cache_dir_path, content_hash + PARSED_FILE_SUFFIX)
+
+
+def compute_content_hash(file_path: str) -> str:
+    """Compute the SHA-256 hex digest of the file at *file_path*."""
+    content_hash = hashlib.sha256()
+    with open(file_path, 'rb') as fp:
+        for block in iter(lambda: fp.read(_HASH_BLOCK_SIZE), b''):
+            content_hash.update(block)
+    return content_hash.hexdigest()
+
+
+def write_parsed_file(dataset: DbDataset, file_path: str, cache_dir_path: str, content_hash: str = None) -> str:
+    """
+    Store the parsed *dataset* read from the file at *file_path* in the cache directory.
+
+    :param dataset: The dataset as read by the SbFileReader
+    :param file_path: The path of the uploaded file
+    :param cache_dir_path: The directory of the parsed files, created if missing
+    :param content_hash: The content hash of the file, computed if not given
+    :return: The path of the parsed file
+    """
+    if content_hash is None:
+        content_hash = compute_content_hash(file_path)
+
+    arrays = dict()
+    column_kinds = []
+    for index in range(len(dataset.attributes)):
+        column = dataset.get_column(index)
+        if column.dtype == object:
+            arrays[_COLUMN_PREFIX + str(index)] = _to_json_array(column.tolist())
+            column_kinds.append(_KIND_JSON)
+        else:
+            arrays[_COLUMN_PREFIX + str(index)] = column
+            column_kinds.append(_KIND_ARRAY)
+
+    if isinstance(dataset.times, np.ndarray):
+        arrays[_TIMES] = dataset.times
+        times_kind = _KIND_ARRAY
+    else:
+        arrays[_TIMES] = _to_json_array([time.isoformat() for time in dataset.times])
+        times_kind = _KIND_DATETIME
+
+    arrays[_HEADER] = _to_json_array(dict(version=PARSED_FILE_VERSION,
+                                          content_hash=content_hash,
+                                          metadata=dataset.metadata,
+                                          attributes=dataset.attributes,
+                                          groups=dataset.groups,
+                                          column_kinds=column_kinds,
+                                          times_kind=times_kind,
+                                          longitudes=dataset.longitudes,
+                                          latitudes=dataset.latitudes))
+
+    os.makedirs(cache_dir_path, exist_ok=True)
+    parsed_file_path = get_parsed_file_path(cache_dir_path, content_hash)
+    # write to a temporary file first, so that readers never see a partially written artifact
+    tmp_file_path = f'{parsed_file_path}.{os.getpid()}.tmp'
+    with open(tmp_file_path, 'wb') as fp:
+        np.savez(fp, **arrays)
+    os.replace(tmp_file_path, parsed_file_path)
+    return parsed_file_path
+
+
+def read_parsed_file(cache_dir_path: str, content_hash: str) -> Optional[DbDataset]:
+    """
+    Load the parsed dataset of the file with the given content hash from the cache directory.
+
+    :param cache_dir_path: The directory of the parsed files
+    :param content_hash: The current content hash of the file
+    :return: The dataset, or None if there is no valid parsed file for the content
+    """
+    parsed_file_path = get_parsed_file_path(cache_dir_path, content_hash)
+    if not os.path.isfile(parsed_file_path):
+        return None
+
+    try:
+        with np.load(parsed_file_path, allow_pickle=False) as arrays:
+            header = _from_json_array(arrays[_HEADER])
+            if header.get('version') != PARSED_FILE_VERSION or header.get('content_hash') != content_hash:
+                return None
+            columns = []
+            for index, kind in enumerate(header['column_kinds']):
+                column = arrays[_COLUMN_PREFIX + str(index)]
+                if kind == _KIND_JSON:
+                    values = _from_json_array(column)
+                    column = np.empty(len(values), dtype=object)
+                    column[:] = values
+                columns.append(column)
+            if header['times_kind'] == _KIND_ARRAY:
+                times = arrays[_TIMES]
+            else:
+                times = [datetime.datetime.fromisoformat(time) for time in _from_json_array(arrays[_TIMES])]
+    except (OSError, KeyError, TypeError, ValueError, zipfile.BadZipFile):
+        return None
+
+    dataset = DbDataset(header['metadata'], None, columns=columns)
+    dataset.attributes = header['attributes']
+    dataset.groups = header['groups']
+    dataset.times = times
+    dataset.longitudes = header['longitudes']
+    dataset.latitudes = header['latitudes']
+    return dataset
+
+
+def read_dataset(file_path: str, cache_dir_path: str) -> DbDataset:
+    """
+    Read the dataset from the SeaBASS file at *file_path*. The parsed file in the cache directory is used,
+    if there is one for the current file content, otherwise the file is parsed again.
+
+    :param file_path: The path of the uploaded file
+    :param cache_dir_path: The directory of the parsed files
+    :return: The dataset
+    """
+    dataset = read_parsed_file(cache_dir_path, compute_content_hash(file_path))
+    if dataset is None:
+        dataset = SbFileReader().read(file_path)
+    return dataset
+
+
+def delete_parsed_file(cache_dir_path: str, content_hash: str):
+    parsed_file_path = get_parsed_file_path(cache_dir_path, content_hash)
+    if os.path.isfile(parsed_file_path):
+        os.remove(parsed_file_path)
+
+
+def _to_json_array(value: Any) -> np.ndarray:
+    return np.frombuffer(json.dumps(value).encode('utf-8'), dtype=np.uint8)
+
+
+def _from_json_array(array: np.ndarray) -> Any:
+    return json.loads(array.tobytes().decode('utf-8'))
@@ -8,6 +8,7 @@ from ocdb.core.val._meta_field_obsolete_rule import MetaFieldObsoleteRule
 from ocdb.core.val._number_record_rule import NumberRecordRule
 from ocdb.core.val._string_record_rule import StringRecordRule
 from ocdb.core.val._time_record_rule import TimeRecordRule
+from ..db.db_dataset import DbDataset
 from ..models.dataset import Dataset
 from ..models.dataset_validation_result import DatasetValidationResult
 from ..models.issue import ISSUE_TYPE_WARNING, ISSUE_TYPE_ERROR, Issue
@@ -15,6 +16,7 @@ from ...core.val._message_library import MessageLibrary
 from ...core.val._meta_field_compare_rule import MetaFieldCompareRule
 from ...core.val._meta_field_optional_rule import MetaFieldOptionalRule
 from ...core.val._meta_field_required_rule import MetaFieldRequiredRule
+from ...db.static_data import strip_wavelength
 from ...ws.context import Config
 
 validator_inst = None
@@ -41,8 +43,6 @@ class Validator(MessageLibrary):
 
         self._parse_rules(rules_config)
 
-        self._var_name_pattern = re.compile(r"\w*[a-zA-Z]\w*[\d.]+$")
-
     def validate_dataset(self, dataset: Dataset) -> DatasetValidationResult:
         issues = []
 
@@ -133,17 +133,21 @@ class Validator(MessageLibrary):
                 continue
 
             rule = self._record_rules[variable]
-            values = []
-            ct = 0
-            for record in dataset.records:
-                ct += 1
-                # Check whether the row has the correct number of entries
-                if len(var_names) != len(record):
-                    if str(ct) not in errored_lines:
-                        errored_lines.append(str(ct))
-                    errors += 1
-                else:
-                    values.append(record[index])
+            if isinstance(dataset, DbDataset) and dataset.is_columnar:
+                # All rows of a columnar dataset have the same number of entries, see SbFileReader
+                values = dataset.get_column_values(index)
+            else:
+                values = []
+                ct = 0
+                for record in dataset.records:
+                    ct += 1
+                    # Check whether the row has the correct number of entries
+                    if len(var_names) != len(record):
+                        if str(ct) not in errored_lines:
+                            errored_lines.append(str(ct))
+                        errors += 1
+                    else:
+                        values.append(record[index])
 
             record_issues = rule.eval(units[index], values, self, missing_value)
             if record_issues is not None:
@@ -289,14 +293,6 @@ class Validator(MessageLibrary):
         rule = MetaFieldCompareRule(reference, compare, operation, error=error, warning=warning, data_type=data_type)
         return rule
 
+    # noinspection PyMethodMayBeStatic
     def _strip_wavelength(self, variable: str) -> str:
-        if self._var_name_pattern.match(variable):
-            index = len(variable)
-            for i in reversed(range(0, index)):
-                var_i = variable[i]
-                if var_i.isdigit() or var_i == "." or var_i == ",":
-                    continue
-
-                return variable[0:i + 1]
-
-        return variable
+        return strip_wavelength(variable)
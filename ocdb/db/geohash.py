@@ -0,0 +1,54 @@
+"""
+Coarse geohash cells of dataset positions, used to narrow region searches down before the positions are compared.
+"""
+
+from typing import Iterable, List, Set, Tuple
+
+# three characters, cells of 1.40625 x 1.40625 degrees
+CELL_PRECISION = 3
+
+_BASE32 = '0123456789bcdefghjkmnpqrstuvwxyz'
+
+_LON_BITS = (5 * CELL_PRECISION + 1) // 2
+_LAT_BITS = 5 * CELL_PRECISION // 2
+_LON_CELL_COUNT = 1 << _LON_BITS
+_LAT_CELL_COUNT = 1 << _LAT_BITS
+
+
+def get_cells(points: Iterable[Tuple[float, float]]) -> List[str]:
+    """Get the sorted distinct cells containing the (lon, lat) *points*."""
+    return sorted({_encode(_lon_index(lon), _lat_index(lat)) for lon, lat in points})
+
+
+def get_region_cells(lon_min: float, lat_min: float, lon_max: float, lat_max: float) -> Set[str]:
+    """Get all cells intersecting the region."""
+    return {_encode(lon_index, lat_index)
+            for lon_index in range(_lon_index(lon_min), _lon_index(lon_max) + 1)
+            for lat_index in range(_lat_index(lat_min), _lat_index(lat_max) + 1)}
+
+
+def get_region_cell_count(lon_min: float, lat_min: float, lon_max: float, lat_max: float) -> int:
+    return (_lon_index(lon_max) - _lon_index(lon_min) + 1) * (_lat_index(lat_max) - _lat_index(lat_min) + 1)
+
+
+def _lon_index(lon: float) -> int:
+    return min(max(int((lon + 180.) / 360. * _LON_CELL_COUNT), 0), _LON_CELL_COUNT - 1)
+
+
+def _lat_index(lat: float) -> int:
+    return min(max(int((lat + 90.) / 180. * _LAT_CELL_COUNT), 0), _LAT_CELL_COUNT - 1)
+
+
+def _encode(lon_index: int, lat_index: int) -> str:
+    # interleave the bits, starting with the longitude
+    bits = 0
+    lon_bit = _LON_BITS
+    lat_bit = _LAT_BITS
+    for i in range(5 * CELL_PRECISION):
+        if i % 2 == 0:
+            lon_bit -= 1
+            bits = (bits << 1) | ((lon_index >> lon_bit) & 1)
+        else:
+            lat_bit -= 1
+            bits = (bits << 1) | ((lat_index >> lat_bit) & 1)
+    return ''.join(_BASE32[(bits >> (5 * (CELL_PRECISION - 1 - i))) & 31] for i in range(CELL_PRECISION))
@@ -0,0 +1,374 @@
+# The MIT License (MIT)
+# Copyright (c) 2018 by EUMETSAT
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy of
+# this software and associated documentation files (the "Software"), to deal in
+# the Software without restriction, including without limitation the rights to
+# use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies
+# of the Software, and to permit persons to whom the Software is furnished to do
+# so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+
+"""
+Declarative specification of the indexes of the OCDB database.
+
+``ensure_indexes()`` creates the indexes of the specification missing in a database and is called whenever the
+server connects. The ``ocdb-indexes`` command additionally reports live indexes differing from the specification,
+optionally rebuilds or drops them, and verifies by ``explain()`` that representative queries are served by an
+index rather than by a collection scan.
+"""
+
+import argparse
+import re
+import sys
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import pymongo
+import pymongo.collection
+import pymongo.database
+
+# noinspection PyPep8Naming
+from ocdb.ws import __version__ as VERSION
+
+DESCRIPTION = "Verifies the indexes of the OCDB database against their specification"
+
+DEFAULT_DB_URL = 'mongodb://localhost:27017'
+
+DATASETS_COLLECTION_NAME = 'sb_datasets'
+SUBMISSIONS_COLLECTION_NAME = 'submission_files'
+SUBMISSION_ISSUES_COLLECTION_NAME = 'submission_issues'
+USERS_COLLECTION_NAME = 'users'
+FIDRADDB_COLLECTION_NAME = 'fidraddb'
+
+# case-insensitive comparison of strings, for queries passing the same collation
+CASE_INSENSITIVE_COLLATION = {'locale': 'en', 'strength': 2}
+
+# metadata searched by query terms without a field name
+TEXT_SEARCH_FIELDS = ('path', 'filename', 'metadata.investigators', 'metadata.affiliations', 'metadata.contact',
+                      'metadata.experiment', 'metadata.cruise', 'metadata.station', 'metadata.documents',
+                      'metadata.calibration_files', 'metadata.data_type', 'metadata.instrument_manufacturer',
+                      'metadata.instrument_model')
+
+Key = List[Tuple[str, Any]]
+
+
+class IndexSpec:
+    """
+    The specification of an index.
+
+    :param name: The index name
+    :param key: The indexed fields and their direction or type, as passed to ``create_index()``
+    :param collation: Optional collation, queries must pass the same collation to use the index
+    :param options: Further options passed to ``create_index()``, e.g. ``weights`` of a text index
+    """
+
+    def __init__(self, name: str, key: Key, collation: Optional[Dict[str, Any]] = None, **options):
+        self.name = name
+        self.key = list(key)
+        self.collation = collation
+        self.options = options
+
+    @property
+    def is_text(self) -> bool:
+        return any(index_type == pymongo.TEXT for _, index_type in self.key)
+
+    def create(self, collection: pymongo.collection.Collection):
+        options = dict(self.options)
+        if self.collation is not None:
+            options['collation'] = self.collation
+        collection.create_index(self.key, name=self.name, background=True, **options)
+
+    def matches(self, index_info: Dict[str, Any]) -> bool:
+        """Test whether the live index described by *index_info* of ``index_information()`` meets this spec."""
+        live_key = [(field, index_type) for field, index_type in index_info['key']]
+        if self.is_text and live_key and live_key[0][0] == '_fts':
+            # the server reports text indexes by their weights
+            if set(index_info.get('weights', {}).keys()) != {field for field, _ in self.key}:
+                return False
+        elif live_key != [(field, index_type) for field, index_type in self.key]:
+            return False
+        live_collation = index_info.get('collation')
+        if self.collation is None:
+            return live_collation is None or live_collation.get('locale') == 'simple'
+        return live_collation is not None \
+            and all(live_collation.get(name) == value for name, value in self.collation.items())
+
+
+class ExplainQuery:
+    """
+    A representative query which must be served by an index.
+
+    :param collection_name: The name of the queried collection
+    :param filter_: The query filter
+    :param sort: Optional sort key
+    :param collation: Optional collation of the query
+    """
+
+    def __init__(self, collection_name: str, filter_: Dict[str, Any], sort: Optional[Key] = None,
+                 collation: Optional[Dict[str, Any]] = None):
+        self.collection_name = collection_name
+        self.filter = filter_
+        self.sort = sort
+        self.collation = collation
+
+    def explain(self, db: pymongo.database.Database) -> Dict[str, Any]:
+        cursor = db[self.collection_name].find(self.filter)
+        if self.sort is not None:
+            cursor = cursor.sort(self.sort)
+        if self.collation is not None:
+            cursor = cursor.collation(self.collation)
+        return cursor.explain()
+
+    def __str__(self):
+        text = f"{self.collection_name}.find({self.filter})"
+        if self.sort is not None:
+            text += f".sort({self.sort})"
+        return text
+
+
+INDEX_SPECS: Dict[str, List[IndexSpec]] = {
+    DATASETS_COLLECTION_NAME: [
+        IndexSpec("_location_", [('location', pymongo.GEOSPHERE)]),
+        IndexSpec("_status_time_", [('status', pymongo.ASCENDING),
+                                    ('time_min', pymongo.ASCENDING),
+                                    ('time_max', pymongo.ASCENDING)]),
+        IndexSpec("_geohashes_", [('geohashes', pymongo.ASCENDING)]),
+        IndexSpec("_products_", [('products', pymongo.ASCENDING)]),
+        IndexSpec("_user_id_", [('user_id', pymongo.ASCENDING)]),
+        IndexSpec("_submission_id_", [('submission_id', pymongo.ASCENDING)]),
+        IndexSpec("_content_hash_", [('content_hash', pymongo.ASCENDING)]),
+        IndexSpec("_text_", [(field, pymongo.TEXT) for field in TEXT_SEARCH_FIELDS],
+                  default_language='none'),
+    ],
+    SUBMISSIONS_COLLECTION_NAME: [
+        IndexSpec("_submission_id_", [('submission_id', pymongo.ASCENDING)]),
+        # listings of a user's submissions, sorted by date or status
+        IndexSpec("_userid_", [('user_id', pymongo.ASCENDING)]),
+        IndexSpec("_user_id_date_", [('user_id', pymongo.ASCENDING), ('date', pymongo.DESCENDING)]),
+        IndexSpec("_user_id_status_", [('user_id', pymongo.ASCENDING), ('status', pymongo.ASCENDING)]),
+        # listings of all submissions, sorted by any column, with _id breaking ties for keyset pagination
+        IndexSpec("_date_", [('date', pymongo.DESCENDING), ('_id', pymongo.DESCENDING)]),
+        IndexSpec("_status_", [('status', pymongo.ASCENDING), ('_id', pymongo.ASCENDING)]),
+        IndexSpec("_qc_status_", [('qc_status', pymongo.ASCENDING), ('_id', pymongo.ASCENDING)]),
+        IndexSpec("_publication_date_", [('publication_date', pymongo.DESCENDING), ('_id', pymongo.DESCENDING)]),
+        # case-insensitive prefix filters and sorting on the lower-cased columns, "contains" filters on their trigrams
+        IndexSpec("_search_keys_submission_id_", [('search_keys.submission_id', pymongo.ASCENDING),
+                                                  ('_id', pymongo.ASCENDING)]),
+        IndexSpec("_search_keys_user_id_", [('search_keys.user_id', pymongo.ASCENDING), ('_id', pymongo.ASCENDING)]),
+        IndexSpec("_search_keys_path_", [('search_keys.path', pymongo.ASCENDING), ('_id', pymongo.ASCENDING)]),
+        IndexSpec("_search_ngrams_", [('search_ngrams', pymongo.ASCENDING)]),
+    ],
+    SUBMISSION_ISSUES_COLLECTION_NAME: [
+        # the issues of a submission file in the order of its validation result, also serving renumbering and deletion
+        IndexSpec("_submission_id_index_position_", [('submission_id', pymongo.ASCENDING),
+                                                     ('index', pymongo.ASCENDING),
+                                                     ('position', pymongo.ASCENDING)]),
+    ],
+    USERS_COLLECTION_NAME: [
+        IndexSpec("_name_", [('name', pymongo.ASCENDING)]),
+    ],
+    FIDRADDB_COLLECTION_NAME: [
+        IndexSpec("_filename_", [('filename', pymongo.ASCENDING)]),
+        IndexSpec("_user_name_", [('user_name', pymongo.ASCENDING)]),
+        IndexSpec("_public_", [('public', pymongo.ASCENDING)]),
+    ],
+}
+
+_SAMPLE_TIME = datetime(2000, 1, 1)
+
+EXPLAIN_QUERIES: List[ExplainQuery] = [
+    ExplainQuery(DATASETS_COLLECTION_NAME, {'status': 'PUBLISHED',
+                                            'time_max': {'$gte': _SAMPLE_TIME},
+                                            'time_min': {'$lte': _SAMPLE_TIME}}),
+    ExplainQuery(DATASETS_COLLECTION_NAME, {'status': 'PUBLISHED', 'products': {'$in': ['chl', 'rrs']}}),
+    ExplainQuery(DATASETS_COLLECTION_NAME, {'geohashes': {'$in': ['dr5', 'dr7']}}),
+    ExplainQuery(DATASETS_COLLECTION_NAME, {'location': {'$geoIntersects': {'$geometry': {
+        'type': 'Polygon', 'coordinates': [[[-77., 38.], [-76., 38.], [-76., 39.], [-77., 39.], [-77., 38.]]]}}}}),
+    ExplainQuery(DATASETS_COLLECTION_NAME, {'$text': {'$search': 'cruise'}}),
+    ExplainQuery(DATASETS_COLLECTION_NAME, {'$or': [{'user_id': 'user'}, {'status': 'PUBLISHED'}]}),
+    ExplainQuery(DATASETS_COLLECTION_NAME, {'submission_id': 'submission'}),
+    ExplainQuery(DATASETS_COLLECTION_NAME, {'content_hash': 'hash'}),
+    ExplainQuery(SUBMISSIONS_COLLECTION_NAME, {'submission_id': 'submission'}),
+    ExplainQuery(SUBMISSIONS_COLLECTION_NAME, {'user_id': 'user'}, sort=[('date', pymongo.DESCENDING)]),
+    ExplainQuery(SUBMISSIONS_COLLECTION_NAME, {}, sort=[('date', pymongo.DESCENDING), ('_id', pymongo.DESCENDING)]),
+    ExplainQuery(SUBMISSIONS_COLLECTION_NAME, {'status': 'VALIDATED'}),
+    ExplainQuery(SUBMISSIONS_COLLECTION_NAME, {'search_keys.path': re.compile('^cruise/')}),
+    ExplainQuery(SUBMISSIONS_COLLECTION_NAME, {'search_ngrams': {'$all': ['user_id:sco', 'user_id:cot']},
+                                               'search_keys.user_id': re.compile('scot')}),
+    ExplainQuery(SUBMISSIONS_COLLECTION_NAME, {}, sort=[('search_keys.submission_id', pymongo.ASCENDING),
+                                                        ('_id', pymongo.ASCENDING)]),
+    ExplainQuery(SUBMISSION_ISSUES_COLLECTION_NAME, {'submission_id': 'submission', 'index': 0},
+                 sort=[('position', pymongo.ASCENDING)]),
+    ExplainQuery(USERS_COLLECTION_NAME, {'name': 'user'}),
+    ExplainQuery(FIDRADDB_COLLECTION_NAME, {'filename': 'FILE.TXT'}),
+    ExplainQuery(FIDRADDB_COLLECTION_NAME, {'$or': [{'public': True}, {'user_name': 'user'}]}),
+]
+
+
+class IndexDiff:
+    """The differences between the live indexes of a collection and their specification."""
+
+    def __init__(self, collection_name: str):
+        self.collection_name = collection_name
+        self.missing: List[IndexSpec] = []
+        self.changed: List[IndexSpec] = []
+        self.obsolete: List[str] = []
+
+    @property
+    def is_empty(self) -> bool:
+        return not self.missing and not self.changed and not self.obsolete
+
+    def __str__(self):
+        lines = [f"{self.collection_name}: missing index {spec.name}" for spec in self.missing]
+        lines += [f"{self.collection_name}: index {spec.name} differs from spec" for spec in self.changed]
+        lines += [f"{self.collection_name}: index {name} not in spec" for name in self.obsolete]
+        return "\n".join(lines)
+
+
+def diff_indexes(collection_name: str, index_information: Dict[str, Dict[str, Any]],
+                 specs: Optional[Sequence[IndexSpec]] = None) -> IndexDiff:
+    """
+    Compare the live indexes of a collection with their specification.
+
+    :param collection_name: The collection name
+    :param index_information: The live indexes as returned by ``Collection.index_information()``
+    :param specs: The specification, taken from ``INDEX_SPECS`` if not given
+    :return: The differences
+    """
+    if specs is None:
+        specs = INDEX_SPECS.get(collection_name, [])
+    diff = IndexDiff(collection_name)
+    for spec in specs:
+        index_info = index_information.get(spec.name)
+        if index_info is None:
+            diff.missing.append(spec)
+        elif not spec.matches(index_info):
+            diff.changed.append(spec)
+    spec_names = {spec.name for spec in specs}
+    diff.obsolete = [name for name in index_information.keys() if name != '_id_' and name not in spec_names]
+    return diff
+
+
+def ensure_indexes(db: pymongo.database.Database) -> List[str]:
+    """
+    Create the indexes of the specification missing in the database *db*. Differing indexes are kept as they
+    are, as rebuilding them may take long, see ``ocdb-indexes --rebuild``.
+
+    :return: The names of the created indexes, qualified by collection name
+    """
+    created = []
+    for collection_name, specs in INDEX_SPECS.items():
+        collection = db[collection_name]
+        diff = diff_indexes(collection_name, collection.index_information(), specs)
+        for spec in diff.missing:
+            spec.create(collection)
+            created.append(f"{collection_name}.{spec.name}")
+    return created
+
+
+def find_collection_scans(plan: Any) -> List[str]:
+    """Find the stages scanning a whole collection in the ``explain()`` output *plan*."""
+    stages = []
+    if isinstance(plan, dict):
+        if plan.get('stage') == 'COLLSCAN':
+            stages.append(plan['stage'])
+        for name, value in plan.items():
+            # rejected plans are not executed
+            if name != 'rejectedPlans':
+                stages.extend(find_collection_scans(value))
+    elif isinstance(plan, list):
+        for value in plan:
+            stages.extend(find_collection_scans(value))
+    return stages
+
+
+def verify(db: pymongo.database.Database, rebuild: bool = False, drop_obsolete: bool = False,
+           explain: bool = True, log=print) -> bool:
+    """
+    Verify the indexes of the database *db* against their specification and create missing ones.
+
+    :param db: The OCDB database
+    :param rebuild: Whether to drop and recreate indexes differing from their spec
+    :param drop_obsolete: Whether to drop indexes not in the specification
+    :param explain: Whether to explain the representative queries
+    :param log: Callable receiving the messages
+    :return: True, if the indexes meet the specification and no query scans a whole collection
+    """
+    ok = True
+    for collection_name, specs in INDEX_SPECS.items():
+        collection = db[collection_name]
+        diff = diff_indexes(collection_name, collection.index_information(), specs)
+        if diff.is_empty:
+            continue
+        log(str(diff))
+        for spec in diff.missing:
+            spec.create(collection)
+            log(f"{collection_name}: created index {spec.name}")
+        for spec in diff.changed:
+            if rebuild:
+                collection.drop_index(spec.name)
+                spec.create(collection)
+                log(f"{collection_name}: rebuilt index {spec.name}")
+            else:
+                ok = False
+        if drop_obsolete:
+            for name in diff.obsolete:
+                collection.drop_index(name)
+                log(f"{collection_name}: dropped index {name}")
+
+    if explain:
+        for query in EXPLAIN_QUERIES:
+            if find_collection_scans(query.explain(db)['queryPlanner']['winningPlan']):
+                log(f"collection scan: {query}")
+                ok = False
+    return ok
+
+
+def main(args=None) -> int:
+    if args is None:
+        args = sys.argv[1:]
+
+    parser = argparse.ArgumentParser(description=DESCRIPTION)
+    parser.add_argument('--version', '-V', action='version', version=VERSION)
+    parser.add_argument('--url', '-u', dest='db_url', metavar='DB_URL', default=DEFAULT_DB_URL,
+                        help='MongoDB URL. '
+                             f'Defaults to {DEFAULT_DB_URL!r}.')
+    parser.add_argument('--rebuild', dest='rebuild', action='store_true',
+                        help='if given, indexes differing from their spec are dropped and created again')
+    parser.add_argument('--drop-obsolete', dest='drop_obsolete', action='store_true',
+                        help='if given, indexes not in the spec are dropped')
+    parser.add_argument('--no-explain', dest='explain', action='store_false',
+                        help='if given, the representative queries are not explained')
+
+    args_obj = parser.parse_args(args)
+
+    try:
+        client = pymongo.MongoClient(args_obj.db_url)
+        try:
+            ok = verify(client.ocdb, rebuild=args_obj.rebuild, drop_obsolete=args_obj.drop_obsolete,
+                        explain=args_obj.explain)
+        finally:
+            client.close()
+        if not ok:
+            return 2
+        print("indexes ok")
+        return 0
+    except Exception as e:
+        print('error: %s' % e)
+        return 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,398 @@
+# The MIT License (MIT)
+# Copyright (c) 2018 by EUMETSAT
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy of
+# this software and associated documentation files (the "Software"), to deal in
+# the Software without restriction, including without limitation the rights to
+# use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies
+# of the Software, and to permit persons to whom the Software is furnished to do
+# so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+
+"""
+Bulk ingestion of a directory tree of SeaBASS files into the MongoDB database.
+
+Files are parsed by a pool of worker processes and stored in batches. Every stored file is recorded in a
+checkpoint file, so that an interrupted run continues where it stopped, and files whose content hash is
+already known to the database are skipped.
+
+With ``--scan``, only the headers of the files are read and their rows counted, without parsing the records
+or storing anything, e.g. to check an archive before ingesting it.
+"""
+
+import argparse
+import collections
+import concurrent.futures
+import functools
+import hashlib
+import os
+import sys
+import time
+from typing import Callable, Iterator, List, Optional, Set
+
+from ocdb.core.file_helper import FileHelper
+from ocdb.core.models.qc_info import QC_STATUS_PUBLISHED
+from ocdb.core.seabass.sb_file_reader import SbFileHeader, SbFileReader, SbFormatError
+from ocdb.db.mongo_db_driver import MongoDbDriver
+# noinspection PyPep8Naming
+from ocdb.ws import __version__ as VERSION
+
+DESCRIPTION = "Ingests a directory tree of SeaBASS files into the OCDB database"
+
+DEFAULT_DB_URL = 'mongodb://localhost:27017'
+DEFAULT_BATCH_SIZE = 100
+DEFAULT_MAX_FILE_SIZE = 40 * 1024 * 1024
+DEFAULT_CHECKPOINT_FILE = os.path.abspath('ocdb-ingest.checkpoint')
+
+_BEGIN_HEADER_PREFIX_SIZE = 16
+_HASH_BLOCK_SIZE = 1024 * 1024
+
+# content hashes known to the database, set once per worker process
+_known_content_hashes = frozenset()
+
+
+class IngestFile:
+    """
+    The result of reading a single file. *dataset* is None if the file has been skipped, because its
+    content hash is already known, or if it could not be read, then *error* is set.
+    """
+
+    def __init__(self, path: str, size: int, content_hash: str = None, dataset=None, error: str = None):
+        self.path = path
+        self.size = size
+        self.content_hash = content_hash
+        self.dataset = dataset
+        self.error = error
+
+
+class IngestStats:
+    """Counters and throughput of an ingestion run."""
+
+    def __init__(self):
+        self.file_count = 0
+        self.skipped_count = 0
+        self.failed_count = 0
+        self.record_count = 0
+        self.byte_count = 0
+        self.start_time = time.perf_counter()
+
+    @property
+    def elapsed_time(self) -> float:
+        return time.perf_counter() - self.start_time
+
+    def __str__(self):
+        elapsed_time = max(self.elapsed_time, 1e-6)
+        mega_bytes = self.byte_count / (1024 * 1024)
+        return f"{self.file_count} files ({self.skipped_count} skipped, {self.failed_count} failed), " \
+               f"{self.record_count} records, {mega_bytes:.1f} MB in {elapsed_time:.1f} s: " \
+               f"{self.file_count / elapsed_time:.1f} files/s, " \
+               f"{self.record_count / elapsed_time:.1f} records/s, " \
+               f"{mega_bytes / elapsed_time:.2f} MB/s"
+
+
+def ingest(db_driver: MongoDbDriver,
+           input_dir: str,
+           archive_root_path: str = None,
+           checkpoint_path: Optional[str] = DEFAULT_CHECKPOINT_FILE,
+           batch_size: int = DEFAULT_BATCH_SIZE,
+           max_workers: Optional[int] = None,
+           max_file_size: int = DEFAULT_MAX_FILE_SIZE,
+           status: str = QC_STATUS_PUBLISHED,
+           log: Callable[[str], None] = print) -> IngestStats:
+    """
+    Ingest all SeaBASS files found in *input_dir*.
+
+    :param db_driver: The database driver
+    :param input_dir: The directory which is searched recursively for SeaBASS files
+    :param archive_root_path: The directory the stored dataset paths are relative to, defaults to *input_dir*
+    :param checkpoint_path: The checkpoint file, or None to neither read nor write a checkpoint
+    :param batch_size: The number of datasets stored at once
+    :param max_workers: The number of parser processes, the number of CPUs if None, 0 parses in this process
+    :param max_file_size: Larger files are skipped
+    :param status: The status of the stored datasets
+    :param log: Receives the progress messages
+    :return: The statistics of the run
+    """
+    if not os.path.isdir(input_dir):
+        raise IOError("input directory does not exist: " + input_dir)
+    if batch_size < 1:
+        raise ValueError("batch_size must be a positive number")
+    if archive_root_path is None:
+        archive_root_path = input_dir
+
+    ingested_paths = _read_checkpoint(checkpoint_path) if checkpoint_path else set()
+    known_content_hashes = db_driver.get_content_hashes()
+
+    stats = IngestStats()
+    file_paths = (path for path in find_files(input_dir, max_file_size=max_file_size, log=log)
+                  if path not in ingested_paths)
+
+    checkpoint_file = open(checkpoint_path, 'a') if checkpoint_path else None
+    try:
+        batch = []
+        batch_dataset_count = 0
+        seen_content_hashes = set()
+        for ingest_file in _read_files(file_paths, archive_root_path, status, known_content_hashes,
+                                       max_workers, max_pending=2 * batch_size):
+            if ingest_file is None:
+                # not a SeaBASS file
+                continue
+            stats.file_count += 1
+            stats.byte_count += ingest_file.size
+            if ingest_file.error is not None:
+                stats.failed_count += 1
+                log(f"FAILED - {ingest_file.path}: {ingest_file.error}")
+                continue
+            if ingest_file.dataset is None or ingest_file.content_hash in seen_content_hashes:
+                stats.skipped_count += 1
+                # recorded in the checkpoint together with the batch, not before the same content has been stored
+                ingest_file.dataset = None
+                batch.append(ingest_file)
+                continue
+
+            stats.record_count += ingest_file.dataset.record_count
+            batch.append(ingest_file)
+            batch_dataset_count += 1
+            seen_content_hashes.add(ingest_file.content_hash)
+            if batch_dataset_count >= batch_size:
+                _store_batch(db_driver, batch, checkpoint_file)
+                batch = []
+                batch_dataset_count = 0
+                log(str(stats))
+
+        _store_batch(db_driver, batch, checkpoint_file)
+    finally:
+        if checkpoint_file is not None:
+            checkpoint_file.close()
+
+    log(str(stats))
+    return stats
+
+
+def scan(input_dir: str,
+         max_file_size: int = DEFAULT_MAX_FILE_SIZE,
+         log: Callable[[str], None] = print) -> IngestStats:
+    """
+    Check the headers of all SeaBASS files found in *input_dir* and count their rows. The records are not
+    parsed and nothing is stored.
+
+    :param input_dir: The directory which is searched recursively for SeaBASS files
+    :param max_file_size: Larger files are skipped
+    :param log: Receives the progress messages
+    :return: The statistics of the scan, ``record_count`` is the number of data rows
+    """
+    if not os.path.isdir(input_dir):
+        raise IOError("input directory does not exist: " + input_dir)
+
+    stats = IngestStats()
+    for file_path in find_files(input_dir, max_file_size=max_file_size, log=log):
+        try:
+            header = read_file_header(file_path)
+        except SbFormatError as e:
+            stats.file_count += 1
+            stats.byte_count += os.path.getsize(file_path)
+            stats.failed_count += 1
+            log(f"FAILED - {file_path}: {e}")
+            continue
+        if header is None:
+            # not a SeaBASS file
+            continue
+        stats.file_count += 1
+        stats.byte_count += os.path.getsize(file_path)
+        stats.record_count += header.row_count
+
+    log(str(stats))
+    return stats
+
+
+def find_files(input_dir: str,
+               max_file_size: int = DEFAULT_MAX_FILE_SIZE,
+               log: Callable[[str], None] = print) -> Iterator[str]:
+    """
+    Get the paths of the candidate files in *input_dir* in a stable order, so that runs can be resumed.
+    Like in the SeaBASS archive, only directories with "archive" in their path are searched.
+    """
+    for root, dirs, files in os.walk(input_dir):
+        dirs.sort()
+        if 'archive' not in root:
+            continue
+        for name in sorted(files):
+            full_path = os.path.join(root, name)
+            if os.path.getsize(full_path) > max_file_size:
+                log("SKIPPING - too large: " + full_path)
+                continue
+            yield full_path
+
+
+def read_file(file_path: str, archive_root_path: str, status: str) -> Optional[IngestFile]:
+    """
+    Read the SeaBASS file at *file_path*. Runs in the worker processes.
+
+    :return: The result, or None if the file is not a SeaBASS file
+    """
+    with open(file_path, 'rb') as fp:
+        # binary files are recognized before anything is decoded
+        prefix = fp.read(_BEGIN_HEADER_PREFIX_SIZE)
+        if b'/begin_header' not in prefix:
+            return None
+        file_hash = hashlib.sha256(prefix)
+        size = len(prefix)
+        for block in iter(functools.partial(fp.read, _HASH_BLOCK_SIZE), b''):
+            file_hash.update(block)
+            size += len(block)
+
+    content_hash = file_hash.hexdigest()
+    if content_hash in _known_content_hashes:
+        return IngestFile(file_path, size, content_hash)
+
+    try:
+        # as before, the locale encoding is used and undecodable bytes are ignored
+        with open(file_path, errors='ignore') as fp:
+            dataset = SbFileReader().read(fp)
+    except SbFormatError as e:
+        return IngestFile(file_path, size, content_hash, error=str(e))
+
+    dataset.path = str(FileHelper.create_relative_path(archive_root_path, os.path.dirname(file_path)))
+    dataset.filename = os.path.basename(file_path)
+    dataset.status = status
+    return IngestFile(file_path, size, content_hash, dataset=dataset)
+
+
+def read_file_header(file_path: str) -> Optional[SbFileHeader]:
+    """
+    Read the header of the SeaBASS file at *file_path* and count its rows.
+
+    :return: The header, or None if the file is not a SeaBASS file
+    """
+    with open(file_path, 'rb') as fp:
+        # binary files are recognized before anything is decoded
+        if b'/begin_header' not in fp.read(_BEGIN_HEADER_PREFIX_SIZE):
+            return None
+
+    with open(file_path, errors='ignore') as fp:
+        return SbFileReader().read_header(fp, count_rows=True)
+
+
+def _read_files(file_paths: Iterator[str],
+                archive_root_path: str,
+                status: str,
+                known_content_hashes: Set[str],
+                max_workers: Optional[int],
+                max_pending: int) -> Iterator[Optional[IngestFile]]:
+    # yields the results in the order of file_paths, with at most max_pending files being read at once
+    if max_workers == 0:
+        _init_worker(known_content_hashes)
+        for file_path in file_paths:
+            yield read_file(file_path, archive_root_path, status)
+        return
+
+    with concurrent.futures.ProcessPoolExecutor(max_workers=max_workers,
+                                                initializer=_init_worker,
+                                                initargs=(frozenset(known_content_hashes),)) as executor:
+        pending = collections.deque()
+        for file_path in file_paths:
+            pending.append(executor.submit(read_file, file_path, archive_root_path, status))
+            if len(pending) >= max_pending:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+
+
+def _init_worker(known_content_hashes: Set[str]):
+    global _known_content_hashes
+    _known_content_hashes = frozenset(known_content_hashes)
+
+
+def _store_batch(db_driver: MongoDbDriver, batch: List[IngestFile], checkpoint_file):
+    ingest_files = [ingest_file for ingest_file in batch if ingest_file.dataset is not None]
+    db_driver.add_datasets([ingest_file.dataset for ingest_file in ingest_files],
+                           [ingest_file.content_hash for ingest_file in ingest_files])
+    if checkpoint_file is not None:
+        for ingest_file in batch:
+            checkpoint_file.write(ingest_file.path + '\n')
+        checkpoint_file.flush()
+
+
+def _read_checkpoint(checkpoint_path: str) -> Set[str]:
+    if not os.path.isfile(checkpoint_path):
+        return set()
+    with open(checkpoint_path) as fp:
+        return {line.rstrip('\n') for line in fp if line.strip()}
+
+
+def main(args=None) -> int:
+    if args is None:
+        args = sys.argv[1:]
+
+    parser = argparse.ArgumentParser(description=DESCRIPTION)
+    parser.add_argument('--version', '-V', action='version', version=VERSION)
+    parser.add_argument('input_dir', metavar='INPUT_DIR',
+                        help='Directory which is searched recursively for SeaBASS files.')
+    parser.add_argument('--url', '-u', dest='db_url', metavar='DB_URL', default=DEFAULT_DB_URL,
+                        help='MongoDB URL. '
+                             f'Defaults to {DEFAULT_DB_URL!r}.')
+    parser.add_argument('--archive-root', '-r', dest='archive_root_path', metavar='ARCHIVE_ROOT', default=None,
+                        help='Directory the stored dataset paths are relative to. '
+                             'Defaults to INPUT_DIR.')
+    parser.add_argument('--checkpoint', '-k', dest='checkpoint_path', metavar='CHECKPOINT_FILE',
+                        default=DEFAULT_CHECKPOINT_FILE,
+                        help='File recording the ingested files, so that an interrupted run can be resumed. '
+                             f'Defaults to {DEFAULT_CHECKPOINT_FILE!r}.')
+    parser.add_argument('--no-checkpoint', dest='checkpoint_path', action='store_const', const=None,
+                        help='Neither read nor write a checkpoint file.')
+    parser.add_argument('--batch-size', '-b', dest='batch_size', metavar='BATCH_SIZE', type=int,
+                        default=DEFAULT_BATCH_SIZE,
+                        help='Number of datasets stored at once. '
+                             f'Defaults to {DEFAULT_BATCH_SIZE}.')
+    parser.add_argument('--workers', '-w', dest='max_workers', metavar='WORKERS', type=int, default=None,
+                        help='Number of parser processes, 0 parses in the main process. '
+                             'Defaults to the number of CPUs.')
+    parser.add_argument('--status', '-s', dest='status', metavar='STATUS', default=QC_STATUS_PUBLISHED,
+                        help='Status of the stored datasets. '
+                             f'Defaults to {QC_STATUS_PUBLISHED!r}.')
+    parser.add_argument('--max-file-size', dest='max_file_size', metavar='BYTES', type=int,
+                        default=DEFAULT_MAX_FILE_SIZE,
+                        help='Larger files are skipped. '
+                             f'Defaults to {DEFAULT_MAX_FILE_SIZE}.')
+    parser.add_argument('--scan', dest='scan', action='store_true',
+                        help='Only check the file headers and count the rows, without storing anything.')
+
+    args_obj = parser.parse_args(args)
+
+    try:
+        if args_obj.scan:
+            stats = scan(args_obj.input_dir, max_file_size=args_obj.max_file_size)
+            return 1 if stats.failed_count else 0
+
+        db_driver = MongoDbDriver()
+        db_driver.init(url=args_obj.db_url)
+        try:
+            ingest(db_driver,
+                   args_obj.input_dir,
+                   archive_root_path=args_obj.archive_root_path,
+                   checkpoint_path=args_obj.checkpoint_path,
+                   batch_size=args_obj.batch_size,
+                   max_workers=args_obj.max_workers,
+                   max_file_size=args_obj.max_file_size,
+                   status=args_obj.status)
+        finally:
+            db_driver.close()
+        return 0
+    except Exception as e:
+        print('error: %s' % e)
+        return 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
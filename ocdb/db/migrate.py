@@ -0,0 +1,123 @@
+# The MIT License (MIT)
+# Copyright (c) 2018 by EUMETSAT
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy of
+# this software and associated documentation files (the "Software"), to deal in
+# the Software without restriction, including without limitation the rights to
+# use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies
+# of the Software, and to permit persons to whom the Software is furnished to do
+# so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+
+"""
+Migrations of the datasets and submissions stored by former versions of the OCDB server.
+
+* ``records``: converts pickled record blobs into the columnar record format
+* ``locations``: adds the GeoJSON location and the bounding box used by region searches
+* ``envelopes``: adds the time range, record count and geohash cells, must run after ``locations``
+* ``products``: adds the normalized product names searched by product and product group
+* ``submissions``: adds the lower-cased search keys and trigrams used by the filters of the submissions table
+* ``issues``: moves the validation issues of the submission files into their own collection, leaving their counts
+"""
+
+import argparse
+import sys
+
+from ocdb.db import record_format
+from ocdb.db.mongo_db_driver import MongoDbDriver, RECORDS_COMPRESSION_CONFIG_NAME
+# noinspection PyPep8Naming
+from ocdb.ws import __version__ as VERSION
+
+DESCRIPTION = "Migrates the datasets and submissions in the OCDB database stored by former versions"
+
+DEFAULT_DB_URL = 'mongodb://localhost:27017'
+
+
+def migrate_records(db_driver: MongoDbDriver, log) -> str:
+    converted_count, skipped_count = db_driver.migrate_records(log=log)
+    return f"converted {converted_count} datasets, {skipped_count} already in columnar format"
+
+
+def migrate_locations(db_driver: MongoDbDriver, log) -> str:
+    updated_count, no_location_count = db_driver.migrate_locations(log=log)
+    return f"added locations to {updated_count} datasets, {no_location_count} datasets without valid positions"
+
+
+def migrate_envelopes(db_driver: MongoDbDriver, log) -> str:
+    updated_count = db_driver.migrate_envelopes(log=log)
+    return f"added envelopes to {updated_count} datasets"
+
+
+def migrate_products(db_driver: MongoDbDriver, log) -> str:
+    updated_count = db_driver.migrate_products(log=log)
+    return f"added products to {updated_count} datasets"
+
+
+def migrate_submissions(db_driver: MongoDbDriver, log) -> str:
+    updated_count = db_driver.migrate_submission_search_keys(log=log)
+    return f"added search keys to {updated_count} submissions"
+
+
+def migrate_issues(db_driver: MongoDbDriver, log) -> str:
+    updated_count = db_driver.migrate_submission_issues(log=log)
+    return f"moved the issues of {updated_count} submissions"
+
+
+# in the order they must be run
+MIGRATIONS = {
+    'records': migrate_records,
+    'locations': migrate_locations,
+    'envelopes': migrate_envelopes,
+    'products': migrate_products,
+    'submissions': migrate_submissions,
+    'issues': migrate_issues,
+}
+
+
+def main(args=None) -> int:
+    if args is None:
+        args = sys.argv[1:]
+
+    parser = argparse.ArgumentParser(description=DESCRIPTION)
+    parser.add_argument('--version', '-V', action='version', version=VERSION)
+    parser.add_argument('migrations', metavar='MIGRATION', nargs='+', choices=sorted(MIGRATIONS.keys()),
+                        help=f'Migrations to run, one or more of {", ".join(MIGRATIONS.keys())}.')
+    parser.add_argument('--url', '-u', dest='db_url', metavar='DB_URL', default=DEFAULT_DB_URL,
+                        help='MongoDB URL. '
+                             f'Defaults to {DEFAULT_DB_URL!r}.')
+    parser.add_argument('--compression', '-z', dest='compression', choices=record_format.COMPRESSIONS,
+                        default=record_format.COMPRESSION_ZLIB,
+                        help='Compression of the column blocks written by the records migration. '
+                             f'Defaults to {record_format.COMPRESSION_ZLIB!r}.')
+    parser.add_argument('--verbose', '-v', dest='verbose', action='store_true',
+                        help='if given, the progress of each migration is reported')
+
+    args_obj = parser.parse_args(args)
+
+    try:
+        db_driver = MongoDbDriver()
+        db_driver.init(url=args_obj.db_url, **{RECORDS_COMPRESSION_CONFIG_NAME: args_obj.compression})
+        try:
+            for name in [name for name in MIGRATIONS.keys() if name in args_obj.migrations]:
+                print(f"{name}: " + MIGRATIONS[name](db_driver, print if args_obj.verbose else None))
+        finally:
+            db_driver.close()
+        return 0
+    except Exception as e:
+        print('error: %s' % e)
+        return 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
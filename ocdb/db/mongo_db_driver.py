@@ -1,39 +1,80 @@
+import math
 import pickle
 import re
 from datetime import datetime
-from typing import Any, Dict, Optional, List, Tuple, Union
+from typing import Any, Dict, Optional, List, Set, Tuple, Union
 
 import bson.objectid
 import numpy as np
 import pymongo
 import gridfs
+import gridfs.grid_file
 import pymongo.errors
 from bson import errors
 
 from ocdb.core.db.db_links import DbLinks
 from ocdb.core.db.db_user import DbUser
-from ..core import QueryParser
+from ..core import QueryParser, UNDEFINED
 from ..core.db.db_driver import DbDriver
 from ..core.db.db_submission import DbSubmission
-from ..db.static_data import get_products_from_product_groups
+from ..db.static_data import get_products_from_product_groups, get_product_names, get_product_name_pattern, \
+    is_wildcard_product
 from ..core.db.errors import OperationalError
 from ..core.models.dataset import Dataset
 from ..core.models.dataset_query import DatasetQuery
 from ..core.models.dataset_query_result import DatasetQueryResult
 from ..core.models.dataset_ref import DatasetRef
-from ..core.models.submission_file import SubmissionFile
+from ..core.models.issue import Issue
+from ..core.models.submission_file import SubmissionFile, ISSUE_COUNTS, count_issues
 from ..core.time_helper import TimeHelper
 from ..db.mongo_query_generator import MongoQueryGenerator
+from ..db import geohash
+from ..db import indexes
+from ..db import record_format
+from ..db.query_trace import QueryTracer, DEFAULT_SLOW_QUERY_MS
+from ..ws.defaults import TRACE_PERF
 
 RECORDS = 'records'
 
 GRID_FS_ID = 'grid_fs_id'
 
-LAT_INDEX_NAME = "_latitudes_"
-LON_INDEX_NAME = "_longitudes_"
-ATTRIBUTES_INDEX_NAME = "_attributes_"
-TIMES_INDEX_NAME = "_times_"
-USER_ID_INDEX_NAME = "_userid_"
+CONTENT_HASH = 'content_hash'
+
+# GeoJSON MultiPoint of the distinct valid positions of a dataset and their bounding box
+LOCATION = 'location'
+BBOX = 'bbox'
+
+# the spatio-temporal envelope of a dataset: time range, number of records and coarse geohash cells of the positions
+TIME_MIN = 'time_min'
+TIME_MAX = 'time_max'
+RECORD_COUNT = 'record_count'
+GEOHASHES = 'geohashes'
+
+# lower-cased product names of the attributes, with and without wavelength suffix
+PRODUCTS = 'products'
+
+# fields of the dataset documents which are derived at insert time and are not part of the Dataset model
+DERIVED_FIELDS = (CONTENT_HASH, LOCATION, BBOX, TIME_MIN, TIME_MAX, RECORD_COUNT, GEOHASHES, PRODUCTS)
+
+# the lower-cased values of the submission columns searched case-insensitively, and their trigrams prefixed by the
+# column name, which serve "contains" filters
+SEARCH_KEYS = 'search_keys'
+SEARCH_NGRAMS = 'search_ngrams'
+SEARCH_COLUMNS = ('submission_id', 'user_id', 'path')
+SEARCH_NGRAM_LENGTH = 3
+
+# fields of the submission documents which are derived at write time and are not part of the DbSubmission model
+SUBMISSION_DERIVED_FIELDS = (SEARCH_KEYS, SEARCH_NGRAMS)
+
+# the validation issues of the submission files are stored in their own collection, one document per issue, in the
+# order of the validation result. The results embedded in the submission documents only count them per issue type.
+ISSUE_POSITION = 'position'
+
+# driver parameters which are not passed to the MongoClient
+RECORDS_FORMAT_CONFIG_NAME = 'records_format'
+RECORDS_COMPRESSION_CONFIG_NAME = 'records_compression'
+TRACE_PERF_CONFIG_NAME = 'trace_perf'
+SLOW_QUERY_MS_CONFIG_NAME = 'slow_query_ms'
 
 
 def _collect_query(user_id: str = None, query_column: str = None,
@@ -47,14 +88,16 @@ def _collect_query(user_id: str = None, query_column: str = None,
         return query_dict
 
     if query_value is not None and query_column is not None:
-        if query_operator == 'contains':
-            regx = re.compile(rf"{query_value}", re.IGNORECASE)
+        if query_operator in ('contains', 'startsWith', 'endsWith') and query_column in SEARCH_COLUMNS:
+            query_dict.update(_collect_search_query(query_column, str(query_value), query_operator))
+        elif query_operator == 'contains':
+            regx = re.compile(re.escape(query_value), re.IGNORECASE)
             query_dict[query_column] = regx
         elif query_operator == 'startsWith':
-            regx = re.compile(rf"^{query_value}.*", re.IGNORECASE)
+            regx = re.compile(rf"^{re.escape(query_value)}", re.IGNORECASE)
             query_dict[query_column] = regx
         elif query_operator == 'endsWith':
-            regx = re.compile(rf".*{query_value}$", re.IGNORECASE)
+            regx = re.compile(rf"{re.escape(query_value)}$", re.IGNORECASE)
             query_dict[query_column] = regx
         elif query_operator == 'isEmpty':
             query_dict[query_column] = {"$exists": False, "$eq": ""}
@@ -80,6 +123,109 @@ def _collect_query(user_id: str = None, query_column: str = None,
     return query_dict
 
 
+def _collect_search_query(query_column: str, query_value: str, query_operator: str) -> Dict[str, Any]:
+    # a case-sensitive regex anchored at the start of the lower-cased value uses the index as a prefix range
+    value = query_value.lower()
+    key = f'{SEARCH_KEYS}.{query_column}'
+    if query_operator == 'startsWith':
+        return {key: re.compile(f"^{re.escape(value)}")}
+    if query_operator == 'endsWith':
+        return {key: re.compile(f"{re.escape(value)}$")}
+    query_dict = {key: re.compile(re.escape(value))}
+    ngrams = _get_search_ngrams(query_column, value)
+    if ngrams:
+        # the trigrams select the candidates by index, the regex removes those with the trigrams in another order
+        query_dict[SEARCH_NGRAMS] = {'$all': ngrams}
+    return query_dict
+
+
+def _get_search_ngrams(column: str, value: str) -> List[str]:
+    return sorted({f'{column}:{value[i:i + SEARCH_NGRAM_LENGTH]}'
+                   for i in range(len(value) - SEARCH_NGRAM_LENGTH + 1)})
+
+
+def _get_sort_field(sort_column: str) -> str:
+    # the searched columns sort case-insensitively
+    return f'{SEARCH_KEYS}.{sort_column}' if sort_column in SEARCH_COLUMNS else sort_column
+
+
+def _collect_after_query(anchor: Dict[str, Any], sort_column: Optional[str], order: int) -> Dict[str, Any]:
+    # the documents following the anchor document in the order of (sort_column, _id)
+    id_query = {'$gt' if order == 1 else '$lt': anchor['_id']}
+    if not sort_column:
+        return {'_id': id_query}
+    value = anchor
+    for name in sort_column.split('.'):
+        value = value.get(name) if isinstance(value, dict) else None
+    if value is None:
+        # missing values come first in ascending and last in descending order
+        after = [{sort_column: None, '_id': id_query}]
+        if order == 1:
+            after.append({sort_column: {'$ne': None}})
+    else:
+        after = [{sort_column: {'$gt' if order == 1 else '$lt': value}}, {sort_column: value, '_id': id_query}]
+        if order == -1:
+            after.append({sort_column: None})
+    return {'$or': after}
+
+
+def _to_location(longitudes: List[float], latitudes: List[float]) -> Tuple[Optional[dict], Optional[List[float]]]:
+    # positions outside the valid range, e.g. fill values, would be rejected by the 2dsphere index
+    points = dict.fromkeys((float(lon), float(lat)) for lon, lat in zip(longitudes, latitudes)
+                           if _is_valid_position(lon, lat))
+    if not points:
+        return None, None
+    lons = [point[0] for point in points]
+    lats = [point[1] for point in points]
+    location = {'type': 'MultiPoint', 'coordinates': [list(point) for point in points]}
+    return location, [min(lons), min(lats), max(lons), max(lats)]
+
+
+def _to_envelope(times: List[datetime], record_count: int, location: Optional[dict]) -> Dict[str, Any]:
+    envelope = {RECORD_COUNT: record_count,
+                GEOHASHES: geohash.get_cells(location['coordinates']) if location is not None else []}
+    times = [time for time in times if time is not None]
+    if times:
+        envelope[TIME_MIN] = min(times)
+        envelope[TIME_MAX] = max(times)
+    return envelope
+
+
+def _is_valid_position(lon: Any, lat: Any) -> bool:
+    return isinstance(lon, (int, float)) and isinstance(lat, (int, float)) \
+           and math.isfinite(lon) and math.isfinite(lat) \
+           and -180. <= lon <= 180. and -90. <= lat <= 90.
+
+
+# polygons of any size with counter-clockwise winding, see MongoDB's "big polygon" support
+_STRICT_WINDING_CRS = {'type': 'name', 'properties': {'name': 'urn:x-mongodb:crs:strictwinding:EPSG:4326'}}
+
+_POLYGON_STEP = 1.0
+
+_MIGRATION_LOG_INTERVAL = 1000
+
+_SUBMISSION_PROJECTION = {field: False for field in SUBMISSION_DERIVED_FIELDS}
+
+# fields of the submission documents which are not set by update_submission_fields()
+_SUBMISSION_FILE_DEPENDENT_FIELDS = ('_id', 'id', 'files', *SUBMISSION_DERIVED_FIELDS)
+
+_MAX_REGION_CELL_COUNT = 256
+
+DEFAULT_INSERT_CHUNK_SIZE = 100
+
+# fields which are stored in the record blob, or which the derived fields are computed from
+_RECORD_DEPENDENT_FIELDS = {'_id', 'id', RECORDS, GRID_FS_ID, 'attributes', 'times', 'longitudes', 'latitudes',
+                            *DERIVED_FIELDS}
+
+
+def _region_to_polygon(lon_min: float, lat_min: float, lon_max: float, lat_max: float) -> dict:
+    # Polygon edges are geodesics, so the edges along the parallels are approximated by steps of one degree
+    steps = max(1, int(math.ceil((lon_max - lon_min) / _POLYGON_STEP)))
+    lons = [lon_min + (lon_max - lon_min) * i / steps for i in range(steps + 1)]
+    ring = [[lon, lat_min] for lon in lons] + [[lon, lat_max] for lon in reversed(lons)] + [[lon_min, lat_min]]
+    return {'type': 'Polygon', 'coordinates': [ring], 'crs': _STRICT_WINDING_CRS}
+
+
 class MongoDbDriver(DbDriver):
 
     def add_dataset(self, dataset: Dataset) -> str:
@@ -88,13 +234,267 @@ class MongoDbDriver(DbDriver):
 
     def _add_dataset_dict(self, dateset_dict):
         converted_dict = MongoDbDriver._convert_times(dateset_dict)
+        MongoDbDriver._add_envelope(converted_dict)
+        MongoDbDriver._add_products(converted_dict)
         records = converted_dict.pop(RECORDS)
-        records_dumped = pickle.dumps(records)
+        records_dumped = self._dump_records(records, converted_dict.get('attributes'))
         grid_fs_id = self._fs.put(records_dumped)
         converted_dict[GRID_FS_ID] = grid_fs_id
         result = self._collection.insert_one(converted_dict)
         return str(result.inserted_id)
 
+    def add_datasets(self, datasets: List[Dataset], content_hashes: List[str] = None,
+                     chunk_size: int = DEFAULT_INSERT_CHUNK_SIZE) -> List[str]:
+        """
+        Add several datasets in chunks, with a single insert_many() for the dataset documents and one for the
+        GridFS chunks of all record blobs of a chunk. If adding a chunk fails, all datasets added before are
+        removed again, so that either all or none of the datasets are stored.
+
+        :param datasets: The datasets to add
+        :param content_hashes: Optional content hashes of the files the datasets have been read from
+        :param chunk_size: The number of datasets inserted at once
+        :return: The IDs of the added datasets, in the order of *datasets*
+        """
+        if content_hashes is not None and len(content_hashes) != len(datasets):
+            raise ValueError("Number of content hashes does not match number of datasets")
+
+        dataset_ids = []
+        grid_fs_ids = []
+        try:
+            for offset in range(0, len(datasets), chunk_size):
+                chunk = datasets[offset:offset + chunk_size]
+                dataset_dicts = [MongoDbDriver._add_products(MongoDbDriver._add_envelope(
+                    MongoDbDriver._convert_times(dataset.to_dict()))) for dataset in chunk]
+                records_dumped = [self._dump_records(dataset_dict.pop(RECORDS), dataset_dict.get('attributes'))
+                                  for dataset_dict in dataset_dicts]
+                # IDs assigned up front, so that a partially written chunk can be removed as well
+                chunk_grid_fs_ids = [bson.objectid.ObjectId() for _ in chunk]
+                grid_fs_ids.extend(chunk_grid_fs_ids)
+                for index, dataset_dict in enumerate(dataset_dicts):
+                    dataset_dict['_id'] = bson.objectid.ObjectId()
+                    dataset_dict[GRID_FS_ID] = chunk_grid_fs_ids[index]
+                    if content_hashes is not None:
+                        dataset_dict[CONTENT_HASH] = content_hashes[offset + index]
+                    dataset_ids.append(dataset_dict['_id'])
+                self._put_many(records_dumped, chunk_grid_fs_ids)
+                self._collection.insert_many(dataset_dicts)
+        except Exception:
+            self._collection.delete_many({'_id': {'$in': dataset_ids}})
+            self._delete_many_blobs(grid_fs_ids)
+            raise
+        return [str(dataset_id) for dataset_id in dataset_ids]
+
+    def get_content_hashes(self) -> Set[str]:
+        """Get the content hashes of the files all stored datasets have been read from, if known."""
+        return set(self._collection.distinct(CONTENT_HASH))
+
+    def _put_many(self, blobs: List[bytes], file_ids: List[bson.objectid.ObjectId]):
+        # writes the chunks and file documents GridFS.put() would write, but in bulk
+        chunk_size = gridfs.grid_file.DEFAULT_CHUNK_SIZE
+        upload_date = datetime.utcnow()
+        files = []
+        chunks = []
+        for blob, file_id in zip(blobs, file_ids):
+            for n, offset in enumerate(range(0, len(blob), chunk_size)):
+                chunks.append({"files_id": file_id, "n": n, "data": bson.Binary(blob[offset:offset + chunk_size])})
+            files.append({"_id": file_id, "length": len(blob), "chunkSize": chunk_size, "uploadDate": upload_date})
+        # file documents last, so that GridFS never sees a file with incomplete chunks
+        if chunks:
+            self._fs_db.fs.chunks.insert_many(chunks)
+        if files:
+            self._fs_db.fs.files.insert_many(files)
+
+    def _delete_many_blobs(self, file_ids: List[bson.objectid.ObjectId]):
+        # the bulk counterpart of GridFS.delete(), file documents first
+        if file_ids:
+            self._fs_db.fs.files.delete_many({"_id": {"$in": file_ids}})
+            self._fs_db.fs.chunks.delete_many({"files_id": {"$in": file_ids}})
+
+    def migrate_records(self, log=None) -> Tuple[int, int]:
+        """
+        Convert the record blobs of all datasets, which are still pickled, into the columnar format using the
+        configured compression. A new blob is written before the dataset refers to it and the old one is
+        deleted, so that an interrupted migration can simply be run again.
+
+        :param log: Optional callable receiving a message per converted dataset
+        :return: The number of converted datasets and the number of datasets already in the columnar format
+        """
+        converted_count = 0
+        skipped_count = 0
+        cursor = self._collection.find({GRID_FS_ID: {'$exists': True}}, projection={GRID_FS_ID: True,
+                                                                                   'attributes': True})
+        for dataset_dict in cursor:
+            grid_fs_id = dataset_dict[GRID_FS_ID]
+            grid_out = self._fs.get(grid_fs_id)
+            if record_format.is_columnar(grid_out.read(len(record_format.MAGIC))):
+                skipped_count += 1
+                continue
+            grid_out.seek(0)
+            records = pickle.loads(grid_out.read())
+            new_grid_fs_id = self._fs.put(record_format.encode_records(records,
+                                                                       dataset_dict.get('attributes'),
+                                                                       compression=self._records_compression))
+            self._collection.update_one({'_id': dataset_dict['_id']}, {'$set': {GRID_FS_ID: new_grid_fs_id}})
+            self._fs.delete(grid_fs_id)
+            converted_count += 1
+            if log is not None:
+                log(f"converted records of dataset {dataset_dict['_id']}")
+        return converted_count, skipped_count
+
+    def migrate_locations(self, log=None) -> Tuple[int, int]:
+        """
+        Add the GeoJSON location and the bounding box to all datasets stored by former versions.
+
+        :param log: Optional callable receiving a progress message every 1000 updated datasets
+        :return: The number of updated datasets and the number of datasets without valid positions
+        """
+        updated_count = 0
+        no_location_count = 0
+        cursor = self._collection.find({LOCATION: {'$exists': False}},
+                                       projection={'longitudes': True, 'latitudes': True})
+        for dataset_dict in cursor:
+            location, bbox = _to_location(dataset_dict.get('longitudes') or [], dataset_dict.get('latitudes') or [])
+            if location is None:
+                no_location_count += 1
+                continue
+            self._collection.update_one({'_id': dataset_dict['_id']}, {'$set': {LOCATION: location, BBOX: bbox}})
+            updated_count += 1
+            if log is not None and updated_count % _MIGRATION_LOG_INTERVAL == 0:
+                log(f"added locations to {updated_count} datasets")
+        return updated_count, no_location_count
+
+    def migrate_envelopes(self, log=None) -> int:
+        """
+        Add the spatio-temporal envelope to all datasets stored by former versions. The datasets should have got
+        their location by ``migrate_locations()`` before.
+
+        :param log: Optional callable receiving a progress message every 1000 updated datasets
+        :return: The number of updated datasets
+        """
+        updated_count = 0
+        cursor = self._collection.find({RECORD_COUNT: {'$exists': False}},
+                                       projection={'times': True, LOCATION: True, GRID_FS_ID: True})
+        for dataset_dict in cursor:
+            record_count = 0
+            if GRID_FS_ID in dataset_dict:
+                record_count = self._load_record_count(self._fs.get(dataset_dict[GRID_FS_ID]))
+            envelope = _to_envelope(dataset_dict.get('times') or [], record_count, dataset_dict.get(LOCATION))
+            self._collection.update_one({'_id': dataset_dict['_id']}, {'$set': envelope})
+            updated_count += 1
+            if log is not None and updated_count % _MIGRATION_LOG_INTERVAL == 0:
+                log(f"added envelopes to {updated_count} datasets")
+        return updated_count
+
+    def migrate_products(self, log=None) -> int:
+        """
+        Add the normalized product names to all datasets stored by former versions.
+
+        :param log: Optional callable receiving a progress message every 1000 updated datasets
+        :return: The number of updated datasets
+        """
+        updated_count = 0
+        cursor = self._collection.find({PRODUCTS: {'$exists': False}}, projection={'attributes': True})
+        for dataset_dict in cursor:
+            products = get_product_names(dataset_dict.get('attributes') or [])
+            self._collection.update_one({'_id': dataset_dict['_id']}, {'$set': {PRODUCTS: products}})
+            updated_count += 1
+            if log is not None and updated_count % _MIGRATION_LOG_INTERVAL == 0:
+                log(f"added products to {updated_count} datasets")
+        return updated_count
+
+    def migrate_submission_search_keys(self, log=None) -> int:
+        """
+        Add the lower-cased search keys and their trigrams to all submissions stored by former versions.
+
+        :param log: Optional callable receiving a progress message every 1000 updated submissions
+        :return: The number of updated submissions
+        """
+        updated_count = 0
+        cursor = self._submit_collection.find({SEARCH_KEYS: {'$exists': False}},
+                                              projection={column: True for column in SEARCH_COLUMNS})
+        for submission_dict in cursor:
+            self._add_search_keys(submission_dict)
+            self._submit_collection.update_one({'_id': submission_dict['_id']},
+                                               {'$set': {SEARCH_KEYS: submission_dict[SEARCH_KEYS],
+                                                         SEARCH_NGRAMS: submission_dict[SEARCH_NGRAMS]}})
+            updated_count += 1
+            if log is not None and updated_count % _MIGRATION_LOG_INTERVAL == 0:
+                log(f"added search keys to {updated_count} submissions")
+        return updated_count
+
+    def migrate_submission_issues(self, log=None) -> int:
+        """
+        Move the validation issues embedded in the submission files stored by former versions into the issues
+        collection, leaving their counts per issue type.
+
+        :param log: Optional callable receiving a progress message every 1000 updated submissions
+        :return: The number of updated submissions
+        """
+        updated_count = 0
+        cursor = self._submit_collection.find({'files.result.issues': {'$exists': True}},
+                                              projection={'submission_id': True, 'files.result': True})
+        for submission_dict in cursor:
+            update = dict()
+            for position, file_dict in enumerate(submission_dict['files']):
+                issues = self._split_issues(file_dict)
+                if issues is not None:
+                    self._replace_issues(submission_dict['submission_id'], position, issues)
+                    update[f'files.{position}.result'] = file_dict['result']
+            self._submit_collection.update_one({'_id': submission_dict['_id']}, {'$set': update})
+            updated_count += 1
+            if log is not None and updated_count % _MIGRATION_LOG_INTERVAL == 0:
+                log(f"moved the issues of {updated_count} submissions")
+        return updated_count
+
+    def _dump_records(self, records: List[List[Any]], attributes: Optional[List[str]]) -> bytes:
+        if self._records_format == record_format.RECORDS_FORMAT_COLUMNAR:
+            try:
+                return record_format.encode_records(records, attributes, compression=self._records_compression)
+            except ValueError:
+                # records of different lengths have no columnar representation
+                pass
+        return pickle.dumps(records)
+
+    @classmethod
+    def _load_record_count(cls, grid_out) -> int:
+        if record_format.is_columnar(grid_out.read(len(record_format.MAGIC))):
+            grid_out.seek(0)
+            return record_format.read_row_count(grid_out)
+        grid_out.seek(0)
+        return len(cls._load_records(grid_out))
+
+    @classmethod
+    def _load_projected_records(cls, grid_out, attributes: List[str], fields: List[str]) \
+            -> Tuple[List[str], List[List[Any]]]:
+        # the attributes are stored in lower case
+        fields = {field.lower() for field in fields}
+        indexes = [index for index, attribute in enumerate(attributes) if attribute in fields]
+        projected_attributes = [attributes[index] for index in indexes]
+        if not indexes:
+            return [], []
+
+        if record_format.is_columnar(grid_out.read(len(record_format.MAGIC))):
+            grid_out.seek(0)
+            # reads the blocks of the projected columns only
+            columns = record_format.decode_columns(grid_out, projected_attributes)
+            if len(columns) == len(projected_attributes):
+                return projected_attributes, [list(record) for record in
+                                              zip(*[columns[attribute] for attribute in projected_attributes])]
+
+        # pickled records, or the columns could not be identified by unique names
+        grid_out.seek(0)
+        records = cls._load_records(grid_out)
+        return projected_attributes, [[record[index] for index in indexes] for record in records]
+
+    @staticmethod
+    def _load_records(grid_out) -> List[List[Any]]:
+        prefix = grid_out.read(len(record_format.MAGIC))
+        if record_format.is_columnar(prefix):
+            grid_out.seek(0)
+            return record_format.decode_records(grid_out)
+        # written by former versions
+        return pickle.loads(prefix + grid_out.read())
+
     def update_dataset(self, dataset: Dataset) -> bool:
         obj_id = self._obj_id(dataset.id)
         if obj_id is None:
@@ -111,6 +511,28 @@ class MongoDbDriver(DbDriver):
         # result = self._collection.replace_one({"_id": obj_id}, dataset_dict, upsert=True)
         # return result.modified_count == 1
 
+    def update_dataset_metadata(self, dataset_id: str, patch: Dict[str, Any]) -> bool:
+        """
+        Set fields of a dataset by a single ``$set``, leaving its record blob untouched.
+
+        :param dataset_id: The dataset ID
+        :param patch: The new values by top-level or dotted field name, e.g. ``{"metadata.qc_info": {...}}``
+        :return: True, if the dataset exists
+        :raise ValueError: if the patch contains fields the records or the derived fields depend on
+        """
+        fields = {name.split('.')[0] for name in patch.keys()}
+        invalid_fields = sorted(fields.intersection(_RECORD_DEPENDENT_FIELDS))
+        if invalid_fields:
+            raise ValueError(f"Fields {', '.join(invalid_fields)} can only be changed by update_dataset()")
+        obj_id = self._obj_id(dataset_id)
+        if obj_id is None:
+            return False
+        if not patch:
+            return self._collection.count_documents({'_id': obj_id}, limit=1) == 1
+
+        result = self._collection.update_one({'_id': obj_id}, {'$set': patch})
+        return result.matched_count == 1
+
     def delete_dataset(self, dataset_id: str) -> bool:
         obj_id = self._obj_id(dataset_id)
         if obj_id is None:
@@ -125,7 +547,33 @@ class MongoDbDriver(DbDriver):
         result = self._collection.delete_one({'_id': obj_id})
         return result.deleted_count == 1
 
-    def get_dataset(self, dataset_id: str) -> Optional[Dataset]:
+    def delete_datasets_by_submission(self, submission_id: str, exclude_dataset_ids: List[str] = None) -> int:
+        """
+        Delete all datasets of a submission together with their record blobs, using one query for the IDs and
+        bulk deletes for the documents and the blobs.
+
+        :param submission_id: The submission ID
+        :param exclude_dataset_ids: Optional IDs of datasets of the submission to keep, e.g. republished ones
+        :return: The number of deleted datasets
+        """
+        query = {'submission_id': submission_id}
+        if exclude_dataset_ids:
+            query['_id'] = {'$nin': [self._obj_id(dataset_id) for dataset_id in exclude_dataset_ids]}
+        dataset_ids = []
+        grid_fs_ids = []
+        for dataset_dict in self._collection.find(query, projection={GRID_FS_ID: True}):
+            dataset_ids.append(dataset_dict['_id'])
+            if GRID_FS_ID in dataset_dict:
+                grid_fs_ids.append(dataset_dict[GRID_FS_ID])
+        if not dataset_ids:
+            return 0
+
+        # the documents first, so that no dataset refers to a deleted blob
+        result = self._collection.delete_many({'_id': {'$in': dataset_ids}})
+        self._delete_many_blobs(grid_fs_ids)
+        return result.deleted_count
+
+    def get_dataset(self, dataset_id: str, fields: Optional[List[str]] = None) -> Optional[Dataset]:
         obj_id = self._obj_id(dataset_id)
         if obj_id is None:
             return None
@@ -136,9 +584,16 @@ class MongoDbDriver(DbDriver):
             if grid_fs_id is not None:
                 del dataset_dict[GRID_FS_ID]
                 fs_get = self._fs.get(grid_fs_id)
-                fs_get_read = fs_get.read()
-                records_from_grid_fs = pickle.loads(fs_get_read)
+                if fields is None:
+                    records_from_grid_fs = self._load_records(fs_get)
+                else:
+                    attributes, records_from_grid_fs = self._load_projected_records(fs_get,
+                                                                                    dataset_dict.get('attributes', []),
+                                                                                    fields)
+                    dataset_dict['attributes'] = attributes
                 dataset_dict[RECORDS] = records_from_grid_fs
+            for field in DERIVED_FIELDS:
+                dataset_dict.pop(field, None)
             del dataset_dict["_id"]
             dataset_dict["id"] = dataset_id
             return Dataset.from_dict(dataset_dict)
@@ -149,23 +604,56 @@ class MongoDbDriver(DbDriver):
 
         query_dict = self._query_converter.to_dict(query)
 
+        # the page and the total count in a single round trip, so that the query is evaluated once
+        total_pipeline = [{'$count': 'count'}]
+        if query.max_total_count is not None:
+            total_pipeline.insert(0, {'$limit': query.max_total_count})
+        facets = {'total': total_pipeline}
+        if query.count != 0 and count > 0:
+            facets['datasets'] = [{'$skip': start_index},
+                                  {'$limit': count},
+                                  {'$project': {'path': True, 'filename': True}}]
+
         # Line 330: self._collection = self._client.ocdb.sb_datasets
-        cursor = self._collection.find(query_dict, skip=start_index, limit=count)
-        total_num_results = self._collection.count_documents(query_dict)
+        facet_result = next(self._collection.aggregate([{'$match': query_dict}, {'$facet': facets}]))
+        total = facet_result['total']
+        total_num_results = total[0]['count'] if total else 0
+        total_count_exact = query.max_total_count is None or total_num_results < query.max_total_count
 
         if query.count == 0:
-            return DatasetQueryResult({}, total_num_results, [], query)
+            return DatasetQueryResult({}, total_num_results, [], query, total_count_exact=total_count_exact)
         else:
+            if 'datasets' in facet_result:
+                dataset_dicts = facet_result['datasets']
+            else:
+                # an unlimited page is fetched by a cursor, it could exceed the maximum size of the $facet result
+                dataset_dicts = list(self._collection.find(query_dict, projection={'path': True, 'filename': True},
+                                                           skip=start_index))
+            if query.geojson:
+                dataset_dicts = self._add_locations(dataset_dicts)
+
             dataset_refs = []
             locations = {}
-            for dataset_dict in cursor:
+            for dataset_dict in dataset_dicts:
                 ds_ref, points = self._to_dataset_ref(dataset_dict, query.geojson)
                 dataset_refs.append(ds_ref)
                 if points is not None:
                     feature_collection = self._to_geojson(points)
                     locations.update({ds_ref.id: feature_collection})
 
-            return DatasetQueryResult(locations, total_num_results, dataset_refs, query)
+            return DatasetQueryResult(locations, total_num_results, dataset_refs, query,
+                                      total_count_exact=total_count_exact)
+
+    def _add_locations(self, dataset_dicts: List[dict]) -> List[dict]:
+        # the locations are fetched separately, they could exceed the maximum size of the $facet result document
+        ids = [dataset_dict['_id'] for dataset_dict in dataset_dicts]
+        cursor = self._collection.find({'_id': {'$in': ids}}, projection={'longitudes': True, 'latitudes': True})
+        locations = {location_dict['_id']: location_dict for location_dict in cursor}
+        for dataset_dict in dataset_dicts:
+            location_dict = locations.get(dataset_dict['_id'], {})
+            dataset_dict['longitudes'] = location_dict.get('longitudes', [])
+            dataset_dict['latitudes'] = location_dict.get('latitudes', [])
+        return dataset_dicts
 
     def add_cal_char_file(self, cal_char_info: dict):
         result = self._fidraddb_collection.insert_one(cal_char_info)
@@ -190,63 +678,92 @@ class MongoDbDriver(DbDriver):
         fidraddb.delete_many({'filename': filename})
 
     def add_submission(self, submission: DbSubmission):
-        sf_dict = submission.to_dict()
+        sf_dict = self._add_search_keys(submission.to_dict())
+        files_issues = [self._split_issues(file_dict) for file_dict in sf_dict.get('files', [])]
         result = self._submit_collection.insert_one(sf_dict)
+        self._replace_files_issues(submission.submission_id, files_issues)
         return str(result.inserted_id)
 
     def get_submission_file(self, submission_id: str, index: int) -> Optional[SubmissionFile]:
-        subm_dict = self._submit_collection.find_one({"submission_id": submission_id})
-        if subm_dict is None:
+        if index < 0:
             return None
-
-        del subm_dict["_id"]
-        db_submission = DbSubmission.from_dict(subm_dict)
-
-        num_files = len(db_submission.files)
-        if index < 0 or index >= num_files:
+        # only the requested file is read and converted
+        subm_dict = self._submit_collection.find_one({"submission_id": submission_id},
+                                                     projection={'_id': False, 'submission_id': True,
+                                                                 'files': {'$slice': [index, 1]}})
+        if subm_dict is None or not subm_dict['files']:
             return None
-
-        return db_submission.files[index]
+        return SubmissionFile.from_dict(subm_dict['files'][0])
 
     def get_submission_file_by_filename(self, submission_id: str, file_name: str) -> Optional[SubmissionFile]:
-        subm_dict = self._submit_collection.find_one({"submission_id": submission_id})
-        if subm_dict is None:
+        subm_dict = self._submit_collection.find_one({"submission_id": submission_id},
+                                                     projection={'_id': False, 'submission_id': True,
+                                                                 'files': {'$elemMatch': {'filename': file_name}}})
+        if subm_dict is None or not subm_dict.get('files'):
             return None
-
-        del subm_dict["_id"]
-        db_submission = DbSubmission.from_dict(subm_dict)
-
-        for f in db_submission.files:
-            if file_name == f.filename:
-                return f
-
-        return None
+        return SubmissionFile.from_dict(subm_dict['files'][0])
+
+    def get_submission_file_issues(self, submission_id: str, index: int, offset: int = None,
+                                   count: int = None) -> Tuple[List[Issue], int]:
+        """
+        Get a page of the validation issues of a submission file, in the order of its validation result, and the
+        total number of its issues.
+        """
+        query_dict = {'submission_id': submission_id, 'index': index}
+        tot_ct = self._issues_collection.count_documents(query_dict)
+        cursor = self._issues_collection.find(query_dict, projection={'_id': False, 'type': True, 'description': True})
+        cursor = cursor.sort(ISSUE_POSITION, pymongo.ASCENDING)
+        if count is not None:
+            cursor = cursor.skip(offset or 0).limit(count)
+        return [Issue.from_dict(issue_dict) for issue_dict in cursor], tot_ct
 
     def get_submissions(self, offset: int = None, count: int = None, user_id: str = None, query_column: str = None,
                         query_value: Union[str, datetime, bool] = None, query_operator: str = None,
-                        sort_column: str = None, sort_order: str = None) -> \
+                        sort_column: str = None, sort_order: str = None, after_submission_id: str = None) -> \
             Tuple[List[DbSubmission], int]:
+        """
+        Get a page of the submissions matching the query, and the total number of matching submissions. The
+        validation results of their files only count the issues.
+
+        The page either starts at *offset*, or, if *after_submission_id* is given, right after that submission
+        in the sort order. The latter is a keyset query on (*sort_column*, _id), which stays cheap for deep pages.
+        """
         submissions: List[DbSubmission] = list()
 
         query_dict = _collect_query(user_id=user_id, query_column=query_column, query_value=query_value,
                                     query_operator=query_operator)
 
-        tot_ct = len(list(self._submit_collection.find(query_dict)))
-
-        if sort_column and sort_order:
-            order = -1 if sort_order == "desc" else 1
-            if offset is not None and count is not None:
-                cursor = self._submit_collection.find(query_dict, skip=offset, limit=count).sort(sort_column, order)
-            else:
-                cursor = self._submit_collection.find(query_dict).sort(sort_column, order)
-        else:
-            if offset is not None and count is not None:
-                cursor = self._submit_collection.find(query_dict, skip=offset, limit=count)
-            else:
-                cursor = self._submit_collection.find(query_dict)
+        tot_ct = self._submit_collection.count_documents(query_dict)
+
+        order = -1 if sort_order == "desc" else 1
+        if not (sort_column and sort_order):
+            sort_column = None
+        sort_field = _get_sort_field(sort_column) if sort_column else None
+        sort = [(sort_field, order), ('_id', order)] if sort_field else None
+
+        if after_submission_id is not None:
+            anchor = self._submit_collection.find_one({"submission_id": after_submission_id},
+                                                      projection={sort_field or '_id': True})
+            if anchor is None:
+                return submissions, tot_ct
+            after_query = _collect_after_query(anchor, sort_field, order)
+            query_dict = {'$and': [query_dict, after_query]} if query_dict else after_query
+            sort = sort or [('_id', order)]
+            offset = None
+
+        # the issues of submissions not migrated yet are left out as well
+        cursor = self._submit_collection.find(query_dict, projection=dict(_SUBMISSION_PROJECTION,
+                                                                          **{'files.result.issues': False}))
+        if sort:
+            cursor = cursor.sort(sort)
+        if count is not None:
+            cursor = cursor.skip(offset or 0).limit(count)
 
         for subm_dict in cursor:
             del subm_dict["_id"]
+            for file_dict in subm_dict["files"]:
+                # results of None may be dropped along with the excluded issues
+                file_dict.setdefault("result", None)
             subm = DbSubmission.from_dict(subm_dict)
             submissions.append(subm)
 
@@ -255,9 +772,10 @@ class MongoDbDriver(DbDriver):
     def get_submissions_for_user(self, user_id: str, offset: int = None, count: int = None) -> List[DbSubmission]:
         submissions = []
         if offset is not None and count is not None:
-            cursor = self._submit_collection.find({"user_id": user_id}, skip=offset, limit=count)
+            cursor = self._submit_collection.find({"user_id": user_id}, projection=_SUBMISSION_PROJECTION,
+                                                  skip=offset, limit=count)
         else:
-            cursor = self._submit_collection.find({"user_id": user_id})
+            cursor = self._submit_collection.find({"user_id": user_id}, projection=_SUBMISSION_PROJECTION)
 
         for subm_dict in cursor:
             del subm_dict["_id"]
@@ -266,10 +784,13 @@ class MongoDbDriver(DbDriver):
 
         return submissions
 
-    def get_submission(self, submission_id: str) -> Optional[DbSubmission]:
-        subm_dict = self._submit_collection.find_one({"submission_id": submission_id})
+    def get_submission(self, submission_id: str, include_files: bool = True) -> Optional[DbSubmission]:
+        projection = _SUBMISSION_PROJECTION if include_files else dict(_SUBMISSION_PROJECTION, files=False)
+        subm_dict = self._submit_collection.find_one({"submission_id": submission_id}, projection=projection)
 
         if subm_dict is not None:
+            if not include_files:
+                subm_dict["files"] = []
             sf_id = subm_dict["_id"]
             del subm_dict["_id"]
             subm_dict["id"] = str(sf_id)
@@ -281,21 +802,145 @@ class MongoDbDriver(DbDriver):
         if obj_id is None:
             return False
 
-        submission_dict = submission.to_dict()
+        submission_dict = self._add_search_keys(submission.to_dict())
         if "id" in submission_dict:
             submission_dict["id"] = None
+        files_issues = [self._split_issues(file_dict) for file_dict in submission_dict['files']]
 
         result = self._submit_collection.replace_one({"_id": obj_id}, submission_dict, upsert=True)
+        self._replace_files_issues(submission.submission_id, files_issues)
+        self._issues_collection.delete_many({'submission_id': submission.submission_id,
+                                             'index': {'$gte': len(files_issues)}})
         return result.modified_count == 1
 
+    def update_submission_fields(self, submission_id: str, fields: Dict[str, Any]) -> bool:
+        """
+        Set top-level fields of a submission with a single ``$set``, leaving its files untouched. The search
+        keys are updated along with the searched columns.
+
+        :param submission_id: The submission ID
+        :param fields: The new field values by field name, must not contain the files
+        :return: Whether the submission exists
+        """
+        invalid_fields = [name for name in fields if name.split('.')[0] in _SUBMISSION_FILE_DEPENDENT_FIELDS]
+        if invalid_fields:
+            raise ValueError(f"Fields {', '.join(invalid_fields)} cannot be set, use the file operations instead")
+        update = dict(fields)
+        if any(column in fields for column in SEARCH_COLUMNS):
+            submission_dict = self._submit_collection.find_one({"submission_id": submission_id},
+                                                               projection={column: True for column in SEARCH_COLUMNS})
+            if submission_dict is None:
+                return False
+            submission_dict.update(fields)
+            self._add_search_keys(submission_dict)
+            update[SEARCH_KEYS] = submission_dict[SEARCH_KEYS]
+            update[SEARCH_NGRAMS] = submission_dict[SEARCH_NGRAMS]
+        if not update:
+            return self._submit_collection.count_documents({"submission_id": submission_id}, limit=1) == 1
+        result = self._submit_collection.update_one({"submission_id": submission_id}, {'$set': update})
+        if result.matched_count == 1 and fields.get('submission_id', submission_id) != submission_id:
+            self._issues_collection.update_many({'submission_id': submission_id},
+                                                {'$set': {'submission_id': fields['submission_id']}})
+        return result.matched_count == 1
+
+    def set_submission_status(self, submission_id: str, status: str, publication_date=UNDEFINED) -> bool:
+        fields = {'status': status}
+        if publication_date is not UNDEFINED:
+            fields['publication_date'] = publication_date
+        return self.update_submission_fields(submission_id, fields)
+
+    def set_submission_file_status(self, submission_id: str, index: int, status: str) -> bool:
+        return self._update_submission_file(submission_id, index, {'$set': {f'files.{index}.status': status}})
+
+    def set_submission_file(self, submission_id: str, index: int, file: SubmissionFile, status: str = None) -> bool:
+        file_dict = file.to_dict()
+        issues = self._split_issues(file_dict)
+        update = {f'files.{index}': file_dict}
+        if status is not None:
+            update['status'] = status
+        if not self._update_submission_file(submission_id, index, {'$set': update}):
+            return False
+        if issues is not None:
+            self._replace_issues(submission_id, index, issues)
+        return True
+
+    def push_submission_file(self, submission_id: str, file: SubmissionFile, status: str = None) -> bool:
+        file_dict = file.to_dict()
+        issues = self._split_issues(file_dict)
+        update = {'$push': {'files': file_dict}}
+        if status is not None:
+            update['$set'] = {'status': status}
+        result = self._submit_collection.update_one({"submission_id": submission_id}, update)
+        if result.matched_count == 1 and issues is not None:
+            self._replace_issues(submission_id, file.index, issues)
+        return result.matched_count == 1
+
+    def pull_submission_file(self, submission_id: str, index: int) -> bool:
+        """
+        Remove the file at position *index* of a submission. The ``index`` fields of the following files and of
+        their issues are renumbered, so that they keep matching their positions.
+        """
+        if index < 0:
+            return False
+        submission_dict = self._submit_collection.find_one({"submission_id": submission_id},
+                                                           projection={'files.index': True})
+        if submission_dict is None or index >= len(submission_dict['files']):
+            return False
+        file_count = len(submission_dict['files'])
+        # a file cannot be pulled by position, but by its index field
+        self._submit_collection.update_one({'_id': submission_dict['_id']},
+                                           {'$pull': {'files': {'index': submission_dict['files'][index]['index']}}})
+        renumbered = {f'files.{position}.index': position for position in range(index, file_count - 1)}
+        if renumbered:
+            self._submit_collection.update_one({'_id': submission_dict['_id']}, {'$set': renumbered})
+        self._issues_collection.delete_many({'submission_id': submission_id, 'index': index})
+        self._issues_collection.update_many({'submission_id': submission_id, 'index': {'$gt': index}},
+                                            {'$inc': {'index': -1}})
+        return True
+
+    def _update_submission_file(self, submission_id: str, index: int, update: Dict[str, Any]) -> bool:
+        if index < 0:
+            return False
+        result = self._submit_collection.update_one({"submission_id": submission_id,
+                                                     f'files.{index}': {'$exists': True}}, update)
+        return result.matched_count == 1
+
     def delete_submission(self, submission_id: str) -> bool:
         subm_dict = self._submit_collection.find_one({"submission_id": submission_id})
         if subm_dict is None:
             return False
 
         result = self._submit_collection.delete_one(subm_dict)
+        self._issues_collection.delete_many({'submission_id': submission_id})
         return result.deleted_count == 1
 
+    @staticmethod
+    def _split_issues(file_dict: Dict[str, Any]) -> Optional[List[Dict[str, Any]]]:
+        """
+        Replace the issues of the validation result of a submission *file_dict* by their counts per issue type.
+
+        :return: The removed issues, None if the file has no result or its issues have been split off already
+        """
+        result = file_dict.get('result')
+        if not result or 'issues' not in result:
+            return None
+        issues = result.pop('issues')
+        result[ISSUE_COUNTS] = count_issues(issues)
+        return issues
+
+    def _replace_issues(self, submission_id: str, index: int, issues: List[Dict[str, Any]]):
+        self._issues_collection.delete_many({'submission_id': submission_id, 'index': index})
+        if issues:
+            self._issues_collection.insert_many([{'submission_id': submission_id, 'index': index,
+                                                  ISSUE_POSITION: position,
+                                                  'type': issue['type'], 'description': issue['description']}
+                                                 for position, issue in enumerate(issues)])
+
+    def _replace_files_issues(self, submission_id: str, files_issues: List[Optional[List[Dict[str, Any]]]]):
+        for index, issues in enumerate(files_issues):
+            if issues is not None:
+                self._replace_issues(submission_id, index, issues)
+
     def add_user(self, user: DbUser):
         user_dict = user.to_dict()
         result = self._user_collection.insert_one(user_dict)
@@ -381,6 +1026,21 @@ class MongoDbDriver(DbDriver):
 
         return True
 
+    def get_query_stats(self, limit: int = 20, explain: bool = False) -> Optional[List[Dict[str, Any]]]:
+        """
+        Get the statistics of the slowest query shapes, if queries are traced, see the "trace_perf" config.
+
+        :param limit: The maximum number of query shapes
+        :param explain: Whether to add the plan and execution stats of the last query of each shape
+        :return: The statistics, slowest first, or None if queries are not traced
+        """
+        if self._query_tracer is None:
+            return None
+        return self._query_tracer.get_slowest_shapes(limit, explain=self._explain_command if explain else None)
+
+    def _explain_command(self, database_name: str, command: Dict[str, Any]) -> Dict[str, Any]:
+        return self._client[database_name].command('explain', command, verbosity='executionStats')
+
     @staticmethod
     def _get_start_index_and_count(query) -> (int, int):
         if query.offset is None:
@@ -407,13 +1067,19 @@ class MongoDbDriver(DbDriver):
     def __init__(self):
         self._db = None
         self._fs = None
+        self._fs_db = None
         self._client = None
+        self.__test_grid_fs_client = None
         self._collection = None
         self._submit_collection = None
+        self._issues_collection = None
         self._user_collection = None
         self._links_collection = None
         self._fidraddb_collection = None
         self._config = None
+        self._records_format = record_format.RECORDS_FORMAT_COLUMNAR
+        self._records_compression = record_format.COMPRESSION_ZLIB
+        self._query_tracer = None
         self._query_converter = MongoDbDriver.QueryConverter()
 
     def init(self, **config):
@@ -438,7 +1104,8 @@ class MongoDbDriver(DbDriver):
             import mongomock
             self._client = mongomock.MongoClient()
         else:
-            self._client = pymongo.MongoClient(**self._config)
+            event_listeners = [self._query_tracer] if self._query_tracer is not None else []
+            self._client = pymongo.MongoClient(event_listeners=event_listeners, **self._config)
             try:
                 # @trello: Resolve call hanging when requesting MongoDb server up
                 # The ismaster command is cheap and does not require auth.
@@ -446,21 +1113,26 @@ class MongoDbDriver(DbDriver):
             except pymongo.errors.ConnectionFailure as e:
                 raise RuntimeError("Database connection failure") from e
 
+        # mongomock does not implement geospatial queries
+        self._query_converter = MongoDbDriver.QueryConverter(geo_index=not is_mocking_case)
+
         # Create database "ocdb"
         self._db = self._client.ocdb
         if is_mocking_case:
             self.__test_grid_fs_client = pymongo.MongoClient()
             self.__test_grid_fs_mock_db = self.__test_grid_fs_client.ocdb_grid_fs_mock
-            self._fs = gridfs.GridFS(self.__test_grid_fs_mock_db)
+            self._fs_db = self.__test_grid_fs_mock_db
         else:
-            self._fs = gridfs.GridFS(self._db)
+            self._fs_db = self._db
+        self._fs = gridfs.GridFS(self._fs_db)
         # Create collection "ocdb.sb_datasets"
         self._collection = self._client.ocdb.sb_datasets
         self._submit_collection = self._client.ocdb.submission_files
+        self._issues_collection = self._client.ocdb.submission_issues
         self._user_collection = self._client.ocdb.users
         self._links_collection = self._client.ocdb.links
         self._fidraddb_collection = self._client.ocdb.fidraddb
-        self._ensure_indices()
+        indexes.ensure_indexes(self._db)
 
     def close(self):
         if self._client is not None:
@@ -472,11 +1144,25 @@ class MongoDbDriver(DbDriver):
         if self._client is not None:
             self._collection.drop()
             self._submit_collection.drop()
+            self._issues_collection.drop()
         if self.__test_grid_fs_client is not None:
             self.__test_grid_fs_mock_db['fs.chunks'].drop()
             self.__test_grid_fs_mock_db['fs.files'].drop()
 
     def _set_config(self, config: Dict[str, Any]):
+        config = dict(config)
+        records_format = config.pop(RECORDS_FORMAT_CONFIG_NAME, record_format.RECORDS_FORMAT_COLUMNAR)
+        if records_format not in record_format.RECORDS_FORMATS:
+            raise ValueError(f"Unknown records format {records_format!r}, "
+                             f"must be one of {', '.join(record_format.RECORDS_FORMATS)}")
+        records_compression = config.pop(RECORDS_COMPRESSION_CONFIG_NAME, record_format.COMPRESSION_ZLIB)
+        record_format.check_compression(records_compression)
+        self._records_format = records_format
+        self._records_compression = records_compression
+        trace_perf = config.pop(TRACE_PERF_CONFIG_NAME, TRACE_PERF)
+        slow_query_ms = config.pop(SLOW_QUERY_MS_CONFIG_NAME, DEFAULT_SLOW_QUERY_MS)
+        self._query_tracer = QueryTracer(slow_query_ms=slow_query_ms) if trace_perf else None
+
         for key in ("url", "uri"):
             uri = config.get(key)
             if uri:
@@ -510,32 +1196,39 @@ class MongoDbDriver(DbDriver):
             points = None
         return ds_ref, points
 
+    @staticmethod
+    def _add_envelope(dataset_dict: dict) -> dict:
+        location, bbox = _to_location(dataset_dict.get('longitudes') or [], dataset_dict.get('latitudes') or [])
+        if location is not None:
+            dataset_dict[LOCATION] = location
+            dataset_dict[BBOX] = bbox
+        dataset_dict.update(_to_envelope(dataset_dict.get('times') or [], len(dataset_dict[RECORDS]), location))
+        return dataset_dict
+
+    @staticmethod
+    def _add_search_keys(submission_dict: dict) -> dict:
+        search_keys = {column: str(submission_dict.get(column) or '').lower() for column in SEARCH_COLUMNS}
+        submission_dict[SEARCH_KEYS] = search_keys
+        submission_dict[SEARCH_NGRAMS] = [ngram for column, value in search_keys.items()
+                                          for ngram in _get_search_ngrams(column, value)]
+        return submission_dict
+
+    @staticmethod
+    def _add_products(dataset_dict: dict) -> dict:
+        dataset_dict[PRODUCTS] = get_product_names(dataset_dict.get('attributes') or [])
+        return dataset_dict
+
     @staticmethod
     def _convert_times(dataset_dict) -> dict:
         times_array = dataset_dict["times"]
-        converted_times = []
-        for time in times_array:
-            converted_times.append(TimeHelper.parse_datetime(time))
+        try:
+            # all times at once, rather than one NumPy conversion per time
+            converted_times = np.array(times_array, dtype='datetime64[us]').tolist() if len(times_array) > 0 else []
+        except (TypeError, ValueError):
+            converted_times = [TimeHelper.parse_datetime(time) for time in times_array]
         dataset_dict["times"] = converted_times
         return dataset_dict
 
-    def _ensure_indices(self):
-        # the main collection
-        index_information = self._collection.index_information()
-        if LON_INDEX_NAME not in index_information:
-            self._collection.create_index("longitude", name=LON_INDEX_NAME, background=True)
-        if LAT_INDEX_NAME not in index_information:
-            self._collection.create_index("latitude", name=LAT_INDEX_NAME, background=True)
-        if ATTRIBUTES_INDEX_NAME not in index_information:
-            self._collection.create_index("attributes", name=ATTRIBUTES_INDEX_NAME, background=True)
-        if TIMES_INDEX_NAME not in index_information:
-            self._collection.create_index("times", name=TIMES_INDEX_NAME, background=True)
-
-        # the quarantane collection
-        index_information = self._submit_collection.index_information()
-        if USER_ID_INDEX_NAME not in index_information:
-            self._submit_collection.create_index("user_id", name=USER_ID_INDEX_NAME, background=True)
-
     @staticmethod
     def _parse_datetime(time_string) -> datetime:
         np_datetime = np.datetime64(time_string)
@@ -561,6 +1254,16 @@ class MongoDbDriver(DbDriver):
         return geojson
 
     class QueryConverter:
+        """
+        Converts a DatasetQuery into a MongoDB filter.
+
+        :param geo_index: Whether regions are matched using the 2dsphere index. Otherwise, the positions are
+            compared one by one, e.g. for mongomock, which does not implement geospatial queries.
+        """
+
+        def __init__(self, geo_index: bool = True):
+            self._geo_index = geo_index
+
         # noinspection PyMethodMayBeStatic
         def to_dict(self, query: DatasetQuery) -> dict:
             query_dict = {}
@@ -582,8 +1285,7 @@ class MongoDbDriver(DbDriver):
                     query.user_id = None
 
             if query.region is not None:
-                query_dict["longitudes"] = {'$gte': query.region[0], '$lte': query.region[2]}
-                query_dict["latitudes"] = {'$gte': query.region[1], '$lte': query.region[3]}
+                query_dict.update(self._region_to_dict(query.region))
 
             if query.time is not None:
                 start_date = None
@@ -597,13 +1299,12 @@ class MongoDbDriver(DbDriver):
                 if start_date is None and end_date is None:
                     raise ValueError("Both time values are none.")
 
-                times_dict = {}
+                # a dataset with a time at or after the start and a time at or before the end, i.e. its time range
+                # overlaps the query's
                 if start_date is not None:
-                    times_dict.update({'$gte': start_date})
+                    query_dict[TIME_MAX] = {'$gte': start_date}
                 if end_date is not None:
-                    times_dict.update({'$lte': end_date})
-
-                query_dict["times"] = times_dict
+                    query_dict[TIME_MIN] = {'$lte': end_date}
 
             if query.submission_id is not None:
                 query_dict.update({'submission_id': query.submission_id})
@@ -612,8 +1313,11 @@ class MongoDbDriver(DbDriver):
                 query.pname = get_products_from_product_groups(query.pgroup)
 
             if query.pname is not None:
-                compiled = [re.compile("^" + pn + r"_?\d*\.?\d*$", re.IGNORECASE) for pn in query.pname]
-                query_dict.update({'attributes': {'$in': compiled}})
+                # exact names, or prefix-anchored case-sensitive expressions for the wildcards of product groups,
+                # can both be looked up in the products index
+                products = [re.compile(get_product_name_pattern(pn)) if is_wildcard_product(pn) else pn.lower()
+                            for pn in query.pname]
+                query_dict.update({PRODUCTS: {'$in': products}})
 
             if query.wdepth is not None:
                 wd_from = query.wdepth[0]
@@ -635,3 +1339,19 @@ class MongoDbDriver(DbDriver):
                 query_dict.update({'wavelength_option': query.wlmode})
 
             return query_dict
+
+        def _region_to_dict(self, region: List[float]) -> dict:
+            # a dataset matches, if one of its positions is inside the region
+            lon_min, lat_min, lon_max, lat_max = region
+            region_dict = {}
+            # the geohash cells narrow the candidates down, unless the region is too large for a short $in list
+            if geohash.get_region_cell_count(lon_min, lat_min, lon_max, lat_max) <= _MAX_REGION_CELL_COUNT:
+                region_dict[GEOHASHES] = {'$in': sorted(geohash.get_region_cells(lon_min, lat_min,
+                                                                                  lon_max, lat_max))}
+            if not self._geo_index:
+                region_dict[LOCATION + '.coordinates'] = {'$elemMatch': {'0': {'$gte': lon_min, '$lte': lon_max},
+                                                                         '1': {'$gte': lat_min, '$lte': lat_max}}}
+            else:
+                region_dict[LOCATION] = {'$geoIntersects': {'$geometry': _region_to_polygon(lon_min, lat_min,
+                                                                                              lon_max, lat_max)}}
+            return region_dict
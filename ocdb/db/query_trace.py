@@ -0,0 +1,260 @@
+# The MIT License (MIT)
+# Copyright (c) 2018 by EUMETSAT
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy of
+# this software and associated documentation files (the "Software"), to deal in
+# the Software without restriction, including without limitation the rights to
+# use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies
+# of the Software, and to permit persons to whom the Software is furnished to do
+# so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+
+"""
+Tracing of the commands the MongoDB driver sends, to find slow queries.
+
+A ``QueryTracer`` is registered as command listener of the MongoClient. It records operation, normalized query
+shape, duration and number of returned documents of each command in a ring buffer, aggregates them per shape
+and writes them to the ``ocdb.perf`` log.
+"""
+
+import collections
+import json
+import logging
+import threading
+import time
+from typing import Any, Callable, Deque, Dict, List, Optional
+
+import pymongo.errors
+import pymongo.monitoring
+
+_LOG = logging.getLogger('ocdb.perf')
+
+DEFAULT_SLOW_QUERY_MS = 100.
+DEFAULT_BUFFER_SIZE = 1000
+
+# the parts of a command which make up its shape, the values within are replaced by "?"
+_SHAPE_FIELDS = {
+    'find': ('filter', 'sort', 'projection'),
+    'aggregate': ('pipeline',),
+    'count': ('query',),
+    'distinct': ('key', 'query'),
+    'update': ('updates',),
+    'delete': ('deletes',),
+    'findAndModify': ('query', 'sort'),
+    'insert': (),
+    'getMore': (),
+}
+
+# commands which can be explained
+_EXPLAINABLE_COMMANDS = ('find', 'aggregate', 'count', 'distinct')
+
+_PLACEHOLDER = '?'
+
+
+def get_query_shape(value: Any) -> Any:
+    """
+    Normalize a query by replacing all values by "?", keeping field names and operators. Lists of values
+    collapse into a single "?", so that queries differing only by their values have the same shape.
+    """
+    if isinstance(value, dict):
+        return {key: get_query_shape(item) if key not in ('$sort', 'sort') else item
+                for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        shapes = [get_query_shape(item) for item in value]
+        if all(shape == _PLACEHOLDER for shape in shapes):
+            return _PLACEHOLDER
+        return shapes
+    return _PLACEHOLDER
+
+
+class QueryTrace:
+    """A traced command."""
+
+    def __init__(self, operation: str, shape: str, duration_ms: float, doc_count: Optional[int],
+                 timestamp: float):
+        self.operation = operation
+        self.shape = shape
+        self.duration_ms = duration_ms
+        self.doc_count = doc_count
+        self.timestamp = timestamp
+
+    def to_dict(self) -> Dict[str, Any]:
+        return dict(operation=self.operation, shape=self.shape, duration_ms=self.duration_ms,
+                    doc_count=self.doc_count, timestamp=self.timestamp)
+
+
+class QueryShapeStats:
+    """The statistics of all traced commands of the same operation and shape."""
+
+    def __init__(self, operation: str, shape: str, database_name: str, command: Optional[dict]):
+        self.operation = operation
+        self.shape = shape
+        self.count = 0
+        self.total_ms = 0.
+        self.max_ms = 0.
+        self.doc_count = 0
+        # the last command of this shape, explained on request
+        self.database_name = database_name
+        self.command = command
+        self.explain: Optional[Dict[str, Any]] = None
+
+    def add(self, trace: QueryTrace):
+        self.count += 1
+        self.total_ms += trace.duration_ms
+        self.max_ms = max(self.max_ms, trace.duration_ms)
+        self.doc_count += trace.doc_count or 0
+
+    def to_dict(self) -> Dict[str, Any]:
+        return dict(operation=self.operation,
+                    shape=self.shape,
+                    count=self.count,
+                    total_ms=self.total_ms,
+                    mean_ms=self.total_ms / self.count if self.count else 0.,
+                    max_ms=self.max_ms,
+                    mean_doc_count=self.doc_count / self.count if self.count else 0.,
+                    explain=self.explain)
+
+
+class QueryTracer(pymongo.monitoring.CommandListener):
+    """
+    Records the commands of a MongoClient.
+
+    :param slow_query_ms: Commands taking at least this long are logged as warnings, the others at debug level
+    :param buffer_size: The number of the most recent commands kept
+    """
+
+    def __init__(self, slow_query_ms: float = DEFAULT_SLOW_QUERY_MS, buffer_size: int = DEFAULT_BUFFER_SIZE):
+        self._slow_query_ms = slow_query_ms
+        self._lock = threading.Lock()
+        self._started: Dict[Any, pymongo.monitoring.CommandStartedEvent] = {}
+        self._traces: Deque[QueryTrace] = collections.deque(maxlen=buffer_size)
+        self._shape_stats: Dict[str, QueryShapeStats] = {}
+
+    def started(self, event: pymongo.monitoring.CommandStartedEvent):
+        if event.command_name in _SHAPE_FIELDS:
+            with self._lock:
+                self._started[(event.connection_id, event.request_id)] = event
+
+    def succeeded(self, event: pymongo.monitoring.CommandSucceededEvent):
+        with self._lock:
+            started_event = self._started.pop((event.connection_id, event.request_id), None)
+        if started_event is not None:
+            self._record(started_event, event.duration_micros / 1000., _get_doc_count(event.reply))
+
+    def failed(self, event: pymongo.monitoring.CommandFailedEvent):
+        with self._lock:
+            started_event = self._started.pop((event.connection_id, event.request_id), None)
+        if started_event is not None:
+            self._record(started_event, event.duration_micros / 1000., None)
+
+    @property
+    def traces(self) -> List[QueryTrace]:
+        """The most recent traced commands."""
+        with self._lock:
+            return list(self._traces)
+
+    def get_slowest_shapes(self, limit: int = 20,
+                           explain: Optional[Callable[[str, dict], Dict[str, Any]]] = None) -> List[Dict[str, Any]]:
+        """
+        Get the statistics of the query shapes with the longest total duration.
+
+        :param limit: The maximum number of shapes
+        :param explain: Optional callable explaining the command of a shape in the given database. Each shape is
+            explained once, using the last command traced before. Commands which cannot be explained get the
+            error message instead.
+        :return: The statistics, slowest first
+        """
+        with self._lock:
+            shape_stats = sorted(self._shape_stats.values(), key=lambda stats: stats.total_ms, reverse=True)[:limit]
+        if explain is not None:
+            for stats in shape_stats:
+                if stats.explain is None and stats.command is not None:
+                    try:
+                        stats.explain = _summarize_explain(explain(stats.database_name, stats.command))
+                    except pymongo.errors.OperationFailure as e:
+                        # reported instead, the command is not explained again
+                        _LOG.warning(f"cannot explain {stats.operation}: {e}")
+                        stats.explain = dict(error=str(e))
+        return [stats.to_dict() for stats in shape_stats]
+
+    def clear(self):
+        with self._lock:
+            self._traces.clear()
+            self._shape_stats.clear()
+
+    def _record(self, event: pymongo.monitoring.CommandStartedEvent, duration_ms: float, doc_count: Optional[int]):
+        command = event.command
+        operation = f"{event.database_name}.{command.get(event.command_name)}.{event.command_name}" \
+            if event.command_name != 'getMore' else f"{event.database_name}.{command.get('collection')}.getMore"
+        shape = json.dumps({name: get_query_shape(command[name])
+                            for name in _SHAPE_FIELDS[event.command_name] if name in command},
+                           sort_keys=True, default=str)
+        trace = QueryTrace(operation, shape, duration_ms, doc_count, time.time())
+        key = operation + shape
+        with self._lock:
+            self._traces.append(trace)
+            stats = self._shape_stats.get(key)
+            if stats is None:
+                stats = QueryShapeStats(operation, shape, event.database_name, None)
+                self._shape_stats[key] = stats
+            if event.command_name in _EXPLAINABLE_COMMANDS:
+                stats.command = {name: value for name, value in command.items()
+                                 if name not in ('lsid', '$db', '$clusterTime', '$readPreference', 'txnNumber',
+                                                 'readConcern', 'writeConcern')}
+            stats.add(trace)
+
+        if duration_ms >= self._slow_query_ms:
+            _LOG.warning(f"slow query: {operation} {shape} took {duration_ms:.1f} ms, {doc_count} documents")
+        elif _LOG.isEnabledFor(logging.DEBUG):
+            _LOG.debug(f"query: {operation} {shape} took {duration_ms:.1f} ms, {doc_count} documents")
+
+
+def _get_doc_count(reply: Dict[str, Any]) -> Optional[int]:
+    cursor = reply.get('cursor')
+    if isinstance(cursor, dict):
+        batch = cursor.get('firstBatch', cursor.get('nextBatch'))
+        return len(batch) if batch is not None else None
+    if 'values' in reply:
+        return len(reply['values'])
+    if 'n' in reply:
+        return reply['n']
+    return None
+
+
+def _summarize_explain(explain_result: Dict[str, Any]) -> Dict[str, Any]:
+    if 'stages' in explain_result:
+        # aggregations report the plan of their first stage
+        explain_result = explain_result['stages'][0].get('$cursor', {})
+    query_planner = explain_result.get('queryPlanner', {})
+    execution_stats = explain_result.get('executionStats', {})
+    return dict(stages=_get_stages(query_planner.get('winningPlan', {})),
+                docs_examined=execution_stats.get('totalDocsExamined'),
+                keys_examined=execution_stats.get('totalKeysExamined'),
+                execution_ms=execution_stats.get('executionTimeMillis'))
+
+
+def _get_stages(plan: Dict[str, Any]) -> List[str]:
+    # the stages of the winning plan from the top, index scans with their index name
+    stages = []
+    while plan:
+        stage = plan.get('stage', '?')
+        if 'indexName' in plan:
+            stage += ' ' + plan['indexName']
+        stages.append(stage)
+        input_stages = plan.get('inputStages')
+        if input_stages:
+            stages.extend(stage for input_stage in input_stages for stage in _get_stages(input_stage))
+            break
+        plan = plan.get('inputStage') or plan.get('queryPlan')
+    return stages
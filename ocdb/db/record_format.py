@@ -0,0 +1,215 @@
+"""
+Columnar binary format of the records of a dataset, as stored in GridFS.
+
+A record blob consists of
+
+* the magic bytes ``OCDBCOL`` followed by the format version (one byte),
+* the size of the column directory (unsigned 32 bit, little endian),
+* the column directory, a UTF-8 encoded JSON object with the compression, the row count and, per column,
+  its name, type, and the offset and size of its block relative to the end of the directory,
+* the column blocks, each compressed separately.
+
+Columns of floats and integers are stored as little endian 64 bit arrays, columns of strings as an array of
+the UTF-8 encoded lengths followed by the concatenated strings. Columns mixing floats and integers, e.g. with
+integer fill values like -9999, are stored as floats, if the integers are exactly representable. Columns of
+mixed or other types are stored as JSON. Blobs written by the former driver versions are pickled lists of records instead and can be told
+apart by ``is_columnar()``.
+"""
+
+import json
+import struct
+import zlib
+from typing import Any, BinaryIO, Dict, List, Optional, Sequence
+
+import numpy as np
+
+RECORDS_FORMAT_PICKLE = 'pickle'
+RECORDS_FORMAT_COLUMNAR = 'columnar'
+RECORDS_FORMATS = (RECORDS_FORMAT_PICKLE, RECORDS_FORMAT_COLUMNAR)
+
+COMPRESSION_NONE = 'none'
+COMPRESSION_ZLIB = 'zlib'
+COMPRESSION_LZ4 = 'lz4'
+COMPRESSIONS = (COMPRESSION_NONE, COMPRESSION_ZLIB, COMPRESSION_LZ4)
+
+FORMAT_VERSION = 1
+
+MAGIC = b'OCDBCOL'
+
+COLUMN_TYPE_FLOAT = 'f8'
+COLUMN_TYPE_INT = 'i8'
+COLUMN_TYPE_STR = 'str'
+COLUMN_TYPE_JSON = 'json'
+
+_PREFIX = struct.Struct('<7sBI')
+
+# the largest magnitude up to which all integers are exactly representable as 64 bit floats
+_MAX_EXACT_FLOAT_INT = 2 ** 53
+
+
+def is_columnar(prefix: bytes) -> bool:
+    """Test whether a record blob starting with *prefix* is in the columnar format."""
+    return prefix[:len(MAGIC)] == MAGIC
+
+
+def check_compression(compression: str):
+    """Raise a ValueError if the *compression* is unknown or its module is not installed."""
+    if compression not in COMPRESSIONS:
+        raise ValueError(f"Unknown records compression {compression!r}, must be one of {', '.join(COMPRESSIONS)}")
+    if compression == COMPRESSION_LZ4:
+        _get_lz4()
+
+
+def encode_records(records: Sequence[Sequence[Any]],
+                   names: Optional[Sequence[str]] = None,
+                   compression: str = COMPRESSION_ZLIB) -> bytes:
+    """
+    Encode the *records* in the columnar format.
+
+    :param records: The records, all of the same length
+    :param names: The column names, the column indexes are used if not given
+    :param compression: The compression applied to each column block
+    :return: The record blob
+    """
+    check_compression(compression)
+    column_count = len(records[0]) if len(records) > 0 else len(names or [])
+    if any(len(record) != column_count for record in records):
+        raise ValueError("Records must all have the same length")
+    if names is None or len(names) != column_count:
+        names = [str(index) for index in range(column_count)]
+
+    directory = dict(compression=compression, row_count=len(records), columns=[])
+    blocks = []
+    offset = 0
+    for index, name in enumerate(names):
+        column_type, block = _encode_column([record[index] for record in records])
+        block = _compress(block, compression)
+        directory['columns'].append(dict(name=name, type=column_type, offset=offset, size=len(block)))
+        blocks.append(block)
+        offset += len(block)
+
+    directory_bytes = json.dumps(directory).encode('utf-8')
+    return b''.join([_PREFIX.pack(MAGIC, FORMAT_VERSION, len(directory_bytes)), directory_bytes] + blocks)
+
+
+def decode_records(fp: BinaryIO) -> List[List[Any]]:
+    """
+    Decode all records of the record blob read from the file-like object *fp*.
+
+    :param fp: Positioned at the start of the blob
+    :return: The records
+    """
+    directory, data_offset = _read_directory(fp)
+    columns = [_read_column(fp, directory, data_offset, column) for column in directory['columns']]
+    if not columns:
+        return [[] for _ in range(directory['row_count'])]
+    return [list(record) for record in zip(*columns)]
+
+
+def decode_columns(fp: BinaryIO, names: Optional[Sequence[str]] = None) -> Dict[str, List[Any]]:
+    """
+    Decode the columns of the record blob read from the seekable file-like object *fp*. Only the blocks of
+    the requested columns are read.
+
+    :param fp: Positioned at the start of the blob
+    :param names: The names of the columns to decode, all columns if not given. Unknown names are ignored.
+    :return: The column values by column name, in the order of the blob
+    """
+    directory, data_offset = _read_directory(fp)
+    return {column['name']: _read_column(fp, directory, data_offset, column)
+            for column in directory['columns']
+            if names is None or column['name'] in names}
+
+
+def read_row_count(fp: BinaryIO) -> int:
+    """Read the number of records of the record blob read from the file-like object *fp*, without decoding them."""
+    directory, _ = _read_directory(fp)
+    return directory['row_count']
+
+
+def _read_directory(fp: BinaryIO) -> (dict, int):
+    start = fp.tell()
+    magic, version, directory_size = _PREFIX.unpack(fp.read(_PREFIX.size))
+    if magic != MAGIC:
+        raise ValueError("Not a columnar record blob")
+    if version != FORMAT_VERSION:
+        raise ValueError(f"Unsupported columnar record format version {version}")
+    directory = json.loads(fp.read(directory_size).decode('utf-8'))
+    return directory, start + _PREFIX.size + directory_size
+
+
+def _read_column(fp: BinaryIO, directory: dict, data_offset: int, column: dict) -> List[Any]:
+    fp.seek(data_offset + column['offset'])
+    block = _decompress(fp.read(column['size']), directory['compression'])
+    return _decode_column(column['type'], block, directory['row_count'])
+
+
+def _encode_column(values: List[Any]) -> (str, bytes):
+    if all(_is_float(value) for value in values):
+        return COLUMN_TYPE_FLOAT, np.array(values, dtype='<f8').tobytes()
+    if all(_is_int(value) for value in values):
+        try:
+            return COLUMN_TYPE_INT, np.array(values, dtype='<i8').tobytes()
+        except OverflowError:
+            pass
+    elif all(_is_float(value) or (_is_int(value) and abs(value) <= _MAX_EXACT_FLOAT_INT) for value in values):
+        # integers mixed into a float column, mostly fill values, are stored as floats
+        return COLUMN_TYPE_FLOAT, np.array(values, dtype='<f8').tobytes()
+    elif all(isinstance(value, str) for value in values):
+        encoded = [value.encode('utf-8') for value in values]
+        lengths = np.array([len(value) for value in encoded], dtype='<u4')
+        return COLUMN_TYPE_STR, lengths.tobytes() + b''.join(encoded)
+    return COLUMN_TYPE_JSON, json.dumps([_to_json_value(value) for value in values]).encode('utf-8')
+
+
+def _is_float(value: Any) -> bool:
+    return type(value) is float or isinstance(value, np.floating)
+
+
+def _is_int(value: Any) -> bool:
+    return isinstance(value, (int, np.integer)) and not isinstance(value, (bool, np.bool_))
+
+
+def _decode_column(column_type: str, block: bytes, row_count: int) -> List[Any]:
+    if column_type == COLUMN_TYPE_FLOAT:
+        return np.frombuffer(block, dtype='<f8').tolist()
+    if column_type == COLUMN_TYPE_INT:
+        return np.frombuffer(block, dtype='<i8').tolist()
+    if column_type == COLUMN_TYPE_STR:
+        lengths = np.frombuffer(block, dtype='<u4', count=row_count)
+        ends = (np.cumsum(lengths) + lengths.nbytes).tolist()
+        starts = [lengths.nbytes] + ends[:-1]
+        return [block[start:end].decode('utf-8') for start, end in zip(starts, ends)]
+    if column_type == COLUMN_TYPE_JSON:
+        return json.loads(block.decode('utf-8'))
+    raise ValueError(f"Unknown column type {column_type!r}")
+
+
+def _to_json_value(value: Any) -> Any:
+    return value.item() if isinstance(value, np.generic) else value
+
+
+def _compress(block: bytes, compression: str) -> bytes:
+    if compression == COMPRESSION_ZLIB:
+        return zlib.compress(block)
+    if compression == COMPRESSION_LZ4:
+        return _get_lz4().compress(block)
+    return block
+
+
+def _decompress(block: bytes, compression: str) -> bytes:
+    if compression == COMPRESSION_ZLIB:
+        return zlib.decompress(block)
+    if compression == COMPRESSION_LZ4:
+        return _get_lz4().decompress(block)
+    if compression == COMPRESSION_NONE:
+        return block
+    raise ValueError(f"Unknown records compression {compression!r}")
+
+
+def _get_lz4():
+    try:
+        import lz4.frame
+    except ImportError as e:
+        raise ValueError("Records compression 'lz4' requires the lz4 package to be installed") from e
+    return lz4.frame
@@ -2,6 +2,7 @@ import csv
 import fnmatch
 import json
 import os
+import re
 from typing import List, Any, Dict
 
 Field = Dict[str, Any]
@@ -20,6 +21,8 @@ _NON_PRODUCT_FIELD_NAMES = {
     "year",
 }
 
+_VAR_NAME_PATTERN = re.compile(r"\w*[a-zA-Z]\w*[\d.]+$")
+
 _FIELDS = None
 _PRODUCT_GROUPS = None
 __last_time_PRODUCT_GROUPS = None
@@ -81,6 +84,48 @@ def get_products_from_product_groups(group_names) -> List[str]:
     return products
 
 
+def strip_wavelength(variable: str) -> str:
+    """
+    Strip the wavelength suffix from a variable name, e.g. ``Rrs412.5`` becomes ``Rrs``.
+    Names without such a suffix are returned unchanged.
+    """
+    if _VAR_NAME_PATTERN.match(variable):
+        for i in reversed(range(0, len(variable))):
+            var_i = variable[i]
+            if var_i.isdigit() or var_i == "." or var_i == ",":
+                continue
+
+            return variable[0:i + 1]
+
+    return variable
+
+
+def get_product_names(attributes: List[str]) -> List[str]:
+    """
+    Return the sorted, lower-cased product names of the given dataset attributes, each as is and, if it
+    has got one, with its wavelength suffix stripped. ``Rrs_412`` yields ``rrs`` and ``rrs_412``.
+    """
+    names = set()
+    for attribute in attributes:
+        name = attribute.lower()
+        names.add(name)
+        names.add(strip_wavelength(name).rstrip("_") or name)
+    return sorted(names)
+
+
+def get_product_name_pattern(product: str) -> str:
+    """
+    Return the anchored regular expression matching the product names of the given product wildcard,
+    where ``*`` matches any sequence and ``?`` any single character.
+    """
+    pattern = re.escape(product.lower()).replace("\\*", ".*").replace("\\?", ".")
+    return "^" + pattern + "$"
+
+
+def is_wildcard_product(product: str) -> bool:
+    return "*" in product or "?" in product
+
+
 def _load_product_to_group_map():
     global _PRODUCT_TO_GROUP
     _PRODUCT_TO_GROUP = {}
@@ -91,7 +136,7 @@ def _load_product_to_group_map():
     product_groups = get_product_groups()
     for product_group in product_groups:
         for product in product_group["products"]:
-            if "*" in product or "?" in product:
+            if is_wildcard_product(product):
                 if not product in _WILDCARD_PRODUCT_TO_GROUP:
                     _WILDCARD_PRODUCT_TO_GROUP.update({product: [product_group["name"]]})
                 else:
@@ -21,10 +21,12 @@
 
 import concurrent.futures
 import logging
+import multiprocessing
 import os
 from typing import Any, Dict, Sequence, Optional
 
-from .defaults import DEFAULT_SERVER_NAME, DEFAULT_MAX_THREAD_COUNT
+from .defaults import DEFAULT_SERVER_NAME, DEFAULT_MAX_THREAD_COUNT, DEFAULT_MAX_PROCESS_COUNT, \
+    DEFAULT_MAX_UPLOAD_SIZE
 from ..core.db.db_driver import DbDriver
 from ..core.db.db_user import DbUser
 from ..core.service import ServiceRegistry
@@ -39,10 +41,15 @@ DEFAULT_STORE_PATH = "~/.ocdb/store"
 DEFAULT_UPLOAD_PATH = "~/.ocdb/store"
 
 DB_DRIVERS_CONFIG_NAME = "databases"
+MAX_PROCESS_COUNT_CONFIG_NAME = "max_process_count"
+MAX_UPLOAD_SIZE_CONFIG_NAME = "max_upload_size"
 
 FIDRADDB_DIR_NAME = "fidraddb"
 DATASETS_DIR_NAME = "archive"
 DOC_FILES_DIR_NAME = "documents"
+# the parsed uploaded datasets, named after their content hashes. The directories of the submissions in the upload
+# space are named "<user>_<submission id>", so they cannot collide with it.
+PARSED_FILES_DIR_NAME = ".parsed"
 
 
 class WsContext:
@@ -54,11 +61,39 @@ class WsContext:
         self._db_drivers = ServiceRegistry()
         self._thread_pool = concurrent.futures.ThreadPoolExecutor(max_workers=DEFAULT_MAX_THREAD_COUNT,
                                                                   thread_name_prefix=DEFAULT_SERVER_NAME)
+        self._process_pool = None
 
     @property
     def config(self) -> Config:
         return self._config
 
+    @property
+    def thread_pool(self) -> concurrent.futures.Executor:
+        return self._thread_pool
+
+    @property
+    def process_pool(self) -> concurrent.futures.Executor:
+        """
+        Executor for CPU-bound tasks such as parsing and validating uploaded datasets. Its number of worker
+        processes is given by the configuration value "max_process_count". If the value is 0, tasks are run
+        in the calling thread.
+        """
+        if self._process_pool is None:
+            max_workers = self._config.get(MAX_PROCESS_COUNT_CONFIG_NAME, DEFAULT_MAX_PROCESS_COUNT)
+            if max_workers == 0:
+                self._process_pool = _CallerExecutor()
+            else:
+                # worker processes are spawned, forking a multi-threaded server is unsafe
+                self._process_pool = concurrent.futures.ProcessPoolExecutor(
+                    max_workers=max_workers,
+                    mp_context=multiprocessing.get_context("spawn"))
+        return self._process_pool
+
+    @property
+    def max_upload_size(self) -> int:
+        """The maximum size of a multipart/form-data request body in bytes, "max_upload_size" in the configuration."""
+        return int(self._config.get(MAX_UPLOAD_SIZE_CONFIG_NAME, DEFAULT_MAX_UPLOAD_SIZE))
+
     @property
     def base_dir(self) -> str:
         return self._base_dir
@@ -123,6 +158,10 @@ class WsContext:
     def get_doc_files_upload_path(self, sub_path: str) -> str:
         return os.path.join(self.upload_path, sub_path, DOC_FILES_DIR_NAME)
 
+    @property
+    def parsed_files_path(self) -> str:
+        return os.path.join(self.upload_path, PARSED_FILES_DIR_NAME)
+
     def configure(self, new_config: Config):
         old_config = self._config
         new_config = new_config or {}
@@ -132,10 +171,19 @@ class WsContext:
         if old_db_drivers != new_db_drivers:
             self._db_drivers.update(new_db_drivers)
 
+        if old_config.get(MAX_PROCESS_COUNT_CONFIG_NAME) != new_config.get(MAX_PROCESS_COUNT_CONFIG_NAME):
+            self._shutdown_process_pool()
+
         self._config = dict(new_config)
 
     def dispose(self):
         self._db_drivers.dispose()
+        self._shutdown_process_pool()
+
+    def _shutdown_process_pool(self):
+        if self._process_pool is not None:
+            self._process_pool.shutdown(wait=False)
+            self._process_pool = None
 
     def get_user(self, user_name: str, password: str = None) -> Optional[DbUser]:
         return self.db_driver.get_user(user_name=user_name, password=password)
@@ -146,3 +194,15 @@ class WsContext:
         if not os.path.isabs(path):
             path = os.path.join(self.base_dir, path)
         return path
+
+
+class _CallerExecutor(concurrent.futures.Executor):
+    """An executor running the submitted tasks immediately in the calling thread."""
+
+    def submit(self, fn, *args, **kwargs) -> concurrent.futures.Future:
+        future = concurrent.futures.Future()
+        try:
+            future.set_result(fn(*args, **kwargs))
+        except Exception as e:
+            future.set_exception(e)
+        return future
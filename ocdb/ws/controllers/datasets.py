@@ -54,12 +54,15 @@ def find_datasets(ctx: WsContext,
                   geojson: bool = False,
                   offset: int = 1,
                   user_id: str = None,
-                  count: int = 1000) -> DatasetQueryResult:
-    """Find datasets."""
+                  count: int = 1000,
+                  max_total_count: int = None) -> DatasetQueryResult:
+    """Find datasets. If *max_total_count* is given, the total number of results is counted up to it only."""
     assert_one_of(shallow, ['no', 'yes', 'exclusively'], name='shallow')
     assert_one_of(pmode, ['contains', 'same_cruise', 'dont_apply'], name='pmode')
     if pgroup is not None:
         assert_instance(pgroup, [])
+    if max_total_count is not None and max_total_count < 1:
+        raise WsBadRequestError("max_total_count must be a positive number")
 
     # Ensuring that the search  uses lower case pnames
     if pname:
@@ -81,12 +84,14 @@ def find_datasets(ctx: WsContext,
     query.geojson = geojson
     query.offset = offset
     query.count = count
+    query.max_total_count = max_total_count
     query.user_id = user_id
 
     result = DatasetQueryResult({}, 0, [], query)
     for driver in ctx.db_drivers:
         result_part = driver.instance().find_datasets(query)
         result.total_count += result_part.total_count
+        result.total_count_exact = result.total_count_exact and result_part.total_count_exact
         result.datasets += result_part.datasets
         result.dataset_ids += result_part.dataset_ids
         result.locations.update(result_part.locations)
@@ -135,11 +140,19 @@ def delete_dataset(ctx: WsContext,
     return deleted
 
 
+def delete_datasets_by_submission(ctx: WsContext,
+                                  submission_id: str) -> int:
+    """Delete all datasets of a submission and return their number."""
+    assert_not_none(submission_id, name='submission_id')
+    return ctx.db_driver.instance().delete_datasets_by_submission(submission_id)
+
+
 def get_dataset_by_id_strict(ctx: WsContext,
-                             dataset_id: str) -> Dataset:
-    """Get dataset by ID."""
+                             dataset_id: str,
+                             fields: List[str] = None) -> Dataset:
+    """Get dataset by ID, with the values of the given fields only, if any."""
     assert_not_none(dataset_id, name='dataset_id')
-    dataset = ctx.db_driver.instance().get_dataset(dataset_id)
+    dataset = ctx.db_driver.instance().get_dataset(dataset_id, fields=fields)
     if dataset is not None:
         return dataset
     raise WsResourceNotFoundError(f"Dataset with ID {dataset_id} not found")
@@ -198,6 +211,6 @@ def set_dataset_qc_info(ctx: WsContext,
                         dataset_id: str,
                         qc_info: QcInfo):
     assert_not_none(dataset_id, name='dataset_id')
-    dataset = ctx.db_driver.get_dataset(dataset_id)
-    dataset.metadata["qc_info"] = qc_info.to_dict()
-    ctx.db_driver.update_dataset(dataset)
+    updated = ctx.db_driver.update_dataset_metadata(dataset_id, {"metadata.qc_info": qc_info.to_dict()})
+    if not updated:
+        raise WsResourceNotFoundError(f"Dataset with ID {dataset_id} not found")
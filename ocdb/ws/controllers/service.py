@@ -26,6 +26,7 @@ from typing import Dict
 import yaml
 
 from ..context import WsContext
+from ..errors import WsBadRequestError
 
 
 # noinspection PyUnusedLocal
@@ -33,3 +34,10 @@ def get_service_info(ctx: WsContext) -> Dict:
     file = os.path.join(os.path.dirname(__file__), "..", "res", "openapi.yml")
     with open(file) as fp:
         return yaml.safe_load(fp)
+
+
+def get_query_stats(ctx: WsContext, limit: int = 20, explain: bool = False) -> Dict:
+    if limit < 1:
+        raise WsBadRequestError(f"Limit must be at least 1, was {limit}")
+    shapes = ctx.db_driver.instance().get_query_stats(limit=limit, explain=explain)
+    return dict(enabled=shapes is not None, shapes=shapes or [])
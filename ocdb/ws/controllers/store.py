@@ -18,19 +18,25 @@
 # LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
 # OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
 # SOFTWARE.
+import codecs
+import concurrent.futures
 import datetime
 import io
+import itertools
 import json
+import locale
 import os
+import shutil
 import tempfile
 import time
 import zipfile
 import chardet
-from typing import Dict, List, Optional, Union, Tuple
+from typing import Dict, List, Optional, Union, Tuple, TextIO
 
 from ..context import WsContext, _LOG
-from ..utils import ensure_valid_path, ensure_valid_submission_id
+from ..utils import ensure_valid_path, ensure_valid_submission_id, ensure_valid_file_name
 from ...core.asserts import assert_not_none
+from ...core.db.db_dataset import DbDataset
 from ...core.db.db_submission import DbSubmission
 from ...core.models import DatasetRef, DatasetQueryResult, DatasetQuery, DATASET_VALIDATION_RESULT_STATUS_OK, \
     DATASET_VALIDATION_RESULT_STATUS_WARNING, QC_STATUS_SUBMITTED, QC_STATUS_VALIDATED, \
@@ -40,11 +46,13 @@ from ...core.models.issue import Issue, ISSUE_TYPE_ERROR
 from ...core.models.submission import Submission, TYPE_MEASUREMENT, TYPE_DOCUMENT
 from ...core.models.submission_file import SubmissionFile
 from ...core.models.uploaded_file import UploadedFile
+from ...core.seabass import sb_parsed_file
 from ...core.seabass.sb_file_reader import SbFileReader, SbFormatError
 from ...core.val import validator
 from ...db.static_data import get_product_groups, get_products
-from ...ws.controllers.datasets import find_datasets, get_dataset_by_id, delete_dataset
+from ...ws.controllers.datasets import find_datasets, get_dataset_by_id
 from ...ws.errors import WsBadRequestError
+from ...ws.multipart import StreamedFile
 
 
 # noinspection PyUnusedLocal
@@ -57,11 +65,16 @@ def upload_submission_files(ctx: WsContext,
                             store_user_path: str,
                             submission_id: str,
                             user_name: str,
-                            dataset_files: List[UploadedFile],
+                            dataset_files: List[Union[UploadedFile, StreamedFile]],
                             publication_date: Union[datetime.datetime, type(None)],
                             allow_publication: bool,
-                            doc_files: List[UploadedFile]) -> Dict[str, DatasetValidationResult]:
-    """ Return a dictionary mapping dataset file names to DatasetValidationResult."""
+                            doc_files: List[Union[UploadedFile, StreamedFile]]) -> Dict[str, DatasetValidationResult]:
+    """
+    Return a dictionary mapping dataset file names to DatasetValidationResult.
+
+    The files are either held in memory or, if received by a streaming upload, have been spooled to disk. In the
+    latter case, the spooled files are moved into the upload space.
+    """
     assert_not_none(submission_id)
     assert_not_none(path)
     assert_not_none(store_user_path)
@@ -71,6 +84,8 @@ def upload_submission_files(ctx: WsContext,
     assert_not_none(doc_files)
     ensure_valid_path(path)
     ensure_valid_submission_id(submission_id)
+    for file in itertools.chain(dataset_files, doc_files):
+        ensure_valid_file_name(file.filename)
 
     result = ctx.db_driver.get_submission(submission_id)
     if result is not None:
@@ -79,66 +94,40 @@ def upload_submission_files(ctx: WsContext,
     if len(dataset_files) < 1:
         raise WsBadRequestError(f"Please provide at least one dataset.")
 
-    datasets = dict()
-    validation_results = dict()
-    data_source = ''
-
-    # Read dataset files and make sure their format is ok.
-    for file in dataset_files:
-        txt_encoding = chardet.detect(file.body)['encoding']
-        try:
-            text = file.body.decode(txt_encoding)
-        except UnicodeDecodeError as e:
-            raise WsBadRequestError("Decoding error for file: " + file.filename + '.\n' + str(e))
-
-        try:
-            fobj = text.split('\n')
-            first_line = fobj[0]
-
-            if '/begin_header' in first_line.lower():
-                dataset = SbFileReader().read(io.StringIO(text))
-                data_source = 'SEABASS'
-            else:
-                raise IOError('Unknown file format.')
-
-        except SbFormatError as e:
-            dataset = None
-            validation_results[file.filename] = DatasetValidationResult(DATASET_VALIDATION_RESULT_STATUS_ERROR,
-                                                                        [Issue(ISSUE_TYPE_ERROR,
-                                                                               f"Invalid format: {e}")])
-
-        except OSError as e:
-            dataset = None
-            validation_results[file.filename] = DatasetValidationResult(DATASET_VALIDATION_RESULT_STATUS_ERROR,
-                                                                        [Issue(ISSUE_TYPE_ERROR, f"OSError: {e}")])
-        if dataset is not None:
-            # Save well-formatted datasets
-            datasets[file.filename] = dataset
-
-    for file in dataset_files:
-        # Validate the datasets that could be successfully parsed:
-        if file.filename in datasets and data_source == 'SEABASS':
-            dataset = datasets[file.filename]
-            dataset_validation_result = validator.validate_dataset(dataset, ctx.config)
-            validation_results[file.filename] = dataset_validation_result
-
-    # Write dataset files into upload space and record as submission files
-    submission_files = []
-    index = 0
     datasets_dir_path = ctx.get_datasets_upload_path(os.path.join(store_user_path, path))
     os.makedirs(datasets_dir_path, exist_ok=True)
+
+    # Read, validate and write the dataset files in parallel, files of streaming uploads may be in progress already
+    futures = []
     for file in dataset_files:
-        file_path = os.path.join(datasets_dir_path, file.filename)
-        with open(file_path, "w") as fp:
-            txt_encoding = chardet.detect(file.body)['encoding']
+        if isinstance(file, StreamedFile):
+            future = file.future or _submit_ingest_streamed_dataset_file(ctx, file)
+        else:
+            future = ctx.process_pool.submit(_ingest_dataset_file, file.body, None,
+                                             os.path.join(datasets_dir_path, file.filename), None,
+                                             ctx.parsed_files_path, ctx.config)
+        futures.append(future)
+
+    validation_results = dict()
+    try:
+        for file, future in zip(dataset_files, futures):
             try:
-                text = file.body.decode(txt_encoding)
-            # TEST!!!
+                validation_results[file.filename] = future.result()
             except UnicodeDecodeError as e:
                 raise WsBadRequestError("Decoding error for file: " + file.filename + '.\n' + str(e))
-
-            fp.write(text)
-
+            if isinstance(file, StreamedFile):
+                _move_streamed_dataset_file(file, os.path.join(datasets_dir_path, file.filename))
+    except Exception:
+        # no submission is created, so remove the files written by the other tasks, also if a worker failed
+        concurrent.futures.wait(futures)
+        for file in dataset_files:
+            _remove_dataset_file(ctx, os.path.join(datasets_dir_path, file.filename))
+        raise
+
+    # Record dataset files as submission files
+    submission_files = []
+    index = 0
+    for file in dataset_files:
         result = validation_results[file.filename]
         submission_files.append(SubmissionFile(index=index,
                                                submission_id=submission_id,
@@ -153,8 +142,11 @@ def upload_submission_files(ctx: WsContext,
     os.makedirs(docs_dir_path, exist_ok=True)
     for file in doc_files:
         file_path = os.path.join(docs_dir_path, file.filename)
-        with open(file_path, "wb") as fp:
-            fp.write(file.body)
+        if isinstance(file, StreamedFile):
+            shutil.move(file.path, file_path)
+        else:
+            with open(file_path, "wb") as fp:
+                fp.write(file.body)
         submission_files.append(SubmissionFile(index=index,
                                                submission_id=submission_id,
                                                filename=file.filename,
@@ -190,10 +182,7 @@ def delete_submission(ctx: WsContext, submission_id: str) -> bool:
     # for file in submission.files:
     #    _delete_submission_file(ctx=ctx, file_to_delete=file, submission=submission)
 
-    result = find_datasets(ctx=ctx, submission_id=submission_id)
-
-    for ds in result.datasets:
-        delete_dataset(ctx=ctx, dataset_id=ds.id)
+    ctx.db_driver.delete_datasets_by_submission(submission_id)
 
     return ctx.db_driver.delete_submission(submission_id)
 
@@ -212,21 +201,18 @@ def update_submission(ctx: WsContext, submission: DbSubmission, status: str, pub
 
     if status == QC_STATUS_PUBLISHED or status == QC_STATUS_PROCESSED or status == QC_STATUS_VALIDATED:
         submission.publication_date = publication_date
-        result = find_datasets(ctx=ctx, submission_id=submission.submission_id)
 
-        for ds in result.datasets:
-            delete_dataset(ctx=ctx, dataset_id=ds.id)
+        # the datasets published before are kept if publishing fails
+        dataset_ids = _publish_submission(ctx, submission, status)
 
-        _publish_submission(ctx, submission, status)
+        ctx.db_driver.delete_datasets_by_submission(submission.submission_id, exclude_dataset_ids=dataset_ids)
 
     if status == QC_STATUS_CANCELED:
         submission.publication_date = None
-        result = find_datasets(ctx=ctx, submission_id=submission.submission_id)
-
-        for ds in result.datasets:
-            delete_dataset(ctx=ctx, dataset_id=ds.id)
+        ctx.db_driver.delete_datasets_by_submission(submission.submission_id)
 
-    return ctx.db_driver.update_submission(submission)
+    return ctx.db_driver.set_submission_status(submission.submission_id, submission.status,
+                                               publication_date=submission.publication_date)
 
 
 def get_submissions(ctx: WsContext, user_id: str = None, offset: int = None, count: int = None,
@@ -234,7 +220,8 @@ def get_submissions(ctx: WsContext, user_id: str = None, offset: int = None, cou
                     query_value: Union[str, datetime.datetime, bool] = None,
                     query_operator: str = None,
                     sort_column: str = None,
-                    sort_order: str = None) \
+                    sort_order: str = None,
+                    after_submission_id: str = None) \
         -> Tuple[List[Submission], int]:
     result, tot_count = ctx.db_driver.get_submissions(offset=offset,
                                                       count=count,
@@ -243,7 +230,8 @@ def get_submissions(ctx: WsContext, user_id: str = None, offset: int = None, cou
                                                       query_value=query_value,
                                                       query_operator=query_operator,
                                                       sort_column=sort_column,
-                                                      sort_order=sort_order)
+                                                      sort_order=sort_order,
+                                                      after_submission_id=after_submission_id)
 
     submissions = []
     for db_submission in result:
@@ -253,8 +241,8 @@ def get_submissions(ctx: WsContext, user_id: str = None, offset: int = None, cou
     return submissions, tot_count
 
 
-def get_submission(ctx: WsContext, submission_id: str) -> Optional[DbSubmission]:
-    return ctx.db_driver.get_submission(submission_id)
+def get_submission(ctx: WsContext, submission_id: str, include_files: bool = True) -> Optional[DbSubmission]:
+    return ctx.db_driver.get_submission(submission_id, include_files=include_files)
 
 
 def get_submission_file(ctx: WsContext,
@@ -264,6 +252,15 @@ def get_submission_file(ctx: WsContext,
     return result
 
 
+def get_submission_file_issues(ctx: WsContext,
+                               submission_id: str,
+                               index: int,
+                               offset: int = None,
+                               count: int = None) -> Tuple[List[Issue], int]:
+    return ctx.db_driver.get_submission_file_issues(submission_id=submission_id, index=index, offset=offset,
+                                                    count=count)
+
+
 def get_submission_file_by_filename(ctx: WsContext,
                                     submission_id: str,
                                     file_name: str):
@@ -296,7 +293,6 @@ def update_submission_files(ctx: WsContext,
     old_path = submission.path.split('/')
     new_path = path.split('/')
 
-    import shutil
     if old_path[0] != new_path[0]:
         shutil.move(os.path.join(submission_path, old_path[0]), os.path.join(submission_path, new_path[0]))
 
@@ -314,8 +310,11 @@ def update_submission_files(ctx: WsContext,
     submission.publication_date = publication_date
     submission.allow_publication = allow_publication
 
-    ctx.db_driver.delete_submission(submission_id)
-    ctx.db_driver.add_submission(submission)
+    ctx.db_driver.update_submission_fields(submission_id, {'submission_id': new_submission_id,
+                                                           'path': path,
+                                                           'store_sub_path': store_user_path,
+                                                           'publication_date': publication_date,
+                                                           'allow_publication': allow_publication})
 
     return True
 
@@ -332,6 +331,7 @@ def add_submission_file(ctx: WsContext, submission: DbSubmission, file: Uploaded
 def update_submission_file(ctx: WsContext, submission: DbSubmission,
                            index: int, file: UploadedFile, typ: str, mode: str = None) -> \
         Optional[DatasetValidationResult]:
+    ensure_valid_file_name(file.filename)
     validation_result = None
 
     if mode != 'add':
@@ -339,9 +339,10 @@ def update_submission_file(ctx: WsContext, submission: DbSubmission,
         _delete_submission_file(ctx, file_to_delete, submission)
 
     if typ == TYPE_MEASUREMENT:
-        text = file.body.decode("utf-8")
+        dataset = None
         try:
-            dataset = SbFileReader().read(io.StringIO(text))
+            with _open_text(file.body, "utf-8") as text:
+                dataset = SbFileReader().read(text)
             validation_result = validator.validate_dataset(dataset, ctx.config)
         except SbFormatError as e:
             validation_result = DatasetValidationResult(DATASET_VALIDATION_RESULT_STATUS_ERROR,
@@ -354,9 +355,10 @@ def update_submission_file(ctx: WsContext, submission: DbSubmission,
         write_path = ctx.get_datasets_upload_path(os.path.join(submission.store_sub_path, submission.path))
         os.makedirs(write_path, exist_ok=True)
         file_path = os.path.join(write_path, file.filename)
-        with open(file_path, "w") as fp:
-            text = file.body.decode("utf-8")
-            fp.write(text)
+        with open(file_path, "w") as fp, _open_text(file.body, "utf-8") as text:
+            shutil.copyfileobj(text, fp)
+        if dataset is not None:
+            _write_parsed_file(dataset, file_path, ctx.parsed_files_path)
     else:
         write_path = ctx.get_doc_files_upload_path(os.path.join(submission.store_sub_path, submission.path))
         os.makedirs(write_path, exist_ok=True)
@@ -389,7 +391,12 @@ def update_submission_file(ctx: WsContext, submission: DbSubmission,
 
     _update_validation_status(submission)
 
-    result = ctx.db_driver.update_submission(submission)
+    if mode == 'add':
+        result = ctx.db_driver.push_submission_file(submission.submission_id, submission.files[-1],
+                                                    status=submission.status)
+    else:
+        result = ctx.db_driver.set_submission_file(submission.submission_id, index, submission.files[index],
+                                                   status=submission.status)
     if not result:
         return DatasetValidationResult(DATASET_VALIDATION_RESULT_STATUS_ERROR,
                                        [Issue(ISSUE_TYPE_ERROR, "Database access error")])
@@ -408,7 +415,7 @@ def delete_submission_file(ctx: WsContext, submission: DbSubmission, index: int)
         file_ref.index = new_index
         new_index += 1
 
-    return ctx.db_driver.update_submission(submission)
+    return ctx.db_driver.pull_submission_file(submission.submission_id, index)
 
 
 def _delete_submission_file(ctx, file_to_delete, submission):
@@ -418,13 +425,126 @@ def _delete_submission_file(ctx, file_to_delete, submission):
         root_path = ctx.get_doc_files_upload_path(os.path.join(submission.store_sub_path, submission.path))
     file_path = os.path.join(root_path, file_to_delete.filename)
     if os.path.isfile(file_path):
+        if file_to_delete.filetype == TYPE_MEASUREMENT:
+            _delete_parsed_file(ctx, file_path)
         os.remove(file_path)
     else:
         _LOG.warning("File to delete des not exist: " + file_path)
 
 
+def start_reading_dataset_file(ctx: WsContext, file: StreamedFile):
+    """
+    Start reading and validating a dataset *file* received by a streaming upload, while the rest of the
+    request body is still being received. The result is picked up by upload_submission_files().
+    """
+    file.future = _submit_ingest_streamed_dataset_file(ctx, file)
+
+
+def _submit_ingest_streamed_dataset_file(ctx: WsContext, file: StreamedFile) -> concurrent.futures.Future:
+    # the spooled file is read in place, its parsed file is found by the content hash after the file has been moved
+    return ctx.process_pool.submit(_ingest_dataset_file, file.path, file.encoding, file.path, file.content_hash,
+                                   ctx.parsed_files_path, ctx.config)
+
+
+def _ingest_dataset_file(source: Union[bytes, str],
+                         encoding: Optional[str],
+                         file_path: str,
+                         content_hash: Optional[str],
+                         parsed_files_path: str,
+                         config: Dict) -> DatasetValidationResult:
+    """
+    Read and validate a dataset file. Runs in a worker of the WsContext's process pool.
+
+    :param source: The content of an uploaded file, or the path of a file spooled to disk
+    :param encoding: The text encoding of the content, detected if not given
+    :param file_path: The path of the dataset file in the upload space. The content is written there, if *source*
+        is not a path.
+    :param content_hash: The content hash of the file at *file_path*, if known
+    :param parsed_files_path: The directory the parsed dataset is stored in
+    :param config: The server configuration
+    :return: The validation result
+    """
+    if isinstance(source, bytes):
+        if encoding is None:
+            encoding = chardet.detect(source)['encoding']
+        # the body is decoded once, for both writing and parsing
+        with _open_text(source, encoding) as text_io:
+            text = text_io.read()
+        with open(file_path, "w") as fp:
+            fp.write(text)
+
+    try:
+        if isinstance(source, bytes):
+            dataset = _read_dataset_text(io.StringIO(text))
+        else:
+            with open(source, "r", encoding=encoding, newline='\n') as text_io:
+                dataset = _read_dataset_text(text_io)
+
+    except SbFormatError as e:
+        return DatasetValidationResult(DATASET_VALIDATION_RESULT_STATUS_ERROR,
+                                       [Issue(ISSUE_TYPE_ERROR, f"Invalid format: {e}")])
+
+    except OSError as e:
+        return DatasetValidationResult(DATASET_VALIDATION_RESULT_STATUS_ERROR,
+                                       [Issue(ISSUE_TYPE_ERROR, f"OSError: {e}")])
+
+    validation_result = validator.validate_dataset(dataset, config)
+    _write_parsed_file(dataset, file_path, parsed_files_path, content_hash)
+    return validation_result
+
+
+def _read_dataset_text(text: TextIO) -> DbDataset:
+    first_line = text.readline()
+
+    if '/begin_header' in first_line.lower():
+        return SbFileReader().read(itertools.chain([first_line], text))
+    else:
+        raise IOError('Unknown file format.')
+
+
+def _move_streamed_dataset_file(file: StreamedFile, file_path: str):
+    if _is_utf8_compatible(file.encoding):
+        # the received bytes equal the text to be written, so the spooled file is used as is
+        shutil.move(file.path, file_path)
+    else:
+        with open(file_path, "w") as fp, file.open_text() as text:
+            shutil.copyfileobj(text, fp)
+
+
+def _remove_dataset_file(ctx: WsContext, file_path: str):
+    if os.path.isfile(file_path):
+        _delete_parsed_file(ctx, file_path)
+        os.remove(file_path)
+
+
+def _is_utf8_compatible(encoding: Optional[str]) -> bool:
+    if encoding is None or codecs.lookup(locale.getpreferredencoding(False)).name != 'utf-8':
+        return False
+    return codecs.lookup(encoding).name in ('ascii', 'utf-8')
+
+
+def _write_parsed_file(dataset, file_path: str, parsed_files_path: str, content_hash: str = None):
+    # The parsed file only saves re-parsing on publication, so failing to write it must not fail the upload
+    try:
+        sb_parsed_file.write_parsed_file(dataset, file_path, parsed_files_path, content_hash)
+    except OSError as e:
+        _LOG.warning("Error writing parsed file for " + file_path + ": " + str(e))
+
+
+def _delete_parsed_file(ctx: WsContext, file_path: str):
+    # parsed files are shared by uploads of the same content, another one is parsed again on publication at worst
+    try:
+        sb_parsed_file.delete_parsed_file(ctx.parsed_files_path, sb_parsed_file.compute_content_hash(file_path))
+    except OSError as e:
+        _LOG.warning("Error deleting parsed file for " + file_path + ": " + str(e))
+
+
 def _delete_submission(ctx, submission):
-    import shutil
+    datasets_path = ctx.get_datasets_upload_path(os.path.join(submission.store_sub_path, submission.path))
+    for file in submission.files:
+        file_path = os.path.join(datasets_path, file.filename)
+        if file.filetype == TYPE_MEASUREMENT and os.path.isfile(file_path):
+            _delete_parsed_file(ctx, file_path)
     path = ctx.get_submission_path(submission.store_sub_path)
     shutil.rmtree(path, ignore_errors=True)
 
@@ -432,7 +552,7 @@ def _delete_submission(ctx, submission):
 def update_submission_file_status(ctx: WsContext, submission: DbSubmission, index: int, status: str) -> bool:
     submission.files[index].status = status
 
-    return ctx.db_driver.update_submission(submission)
+    return ctx.db_driver.set_submission_file_status(submission.submission_id, index, status)
 
 
 # noinspection PyTypeChecker
@@ -490,12 +610,14 @@ def download_store_files_by_id(ctx: WsContext,
 def download_submission_file_by_id(ctx: WsContext,
                                    submission_id: str = None,
                                    index: int = None) -> zipfile.ZipFile:
-    submission = get_submission(ctx, submission_id)
+    submission = get_submission(ctx, submission_id, include_files=False)
 
     if not submission:
         return None
 
     submission_file = get_submission_file(ctx, submission_id, index)
+    if submission_file is None:
+        return None
 
     path = os.path.join(submission.store_sub_path, submission.path)
     if submission_file.filetype == TYPE_MEASUREMENT:
@@ -595,6 +717,14 @@ def _get_summary_validation_status(validation_results: dict) -> str:
     return DATASET_VALIDATION_RESULT_STATUS_OK
 
 
+def _open_text(body: bytes, encoding: str) -> TextIO:
+    """
+    Open the uploaded *body* as text stream. Decoding happens lazily while lines are consumed,
+    so no decoded copy of the whole body is created.
+    """
+    return io.TextIOWrapper(io.BytesIO(body), encoding=encoding, newline='\n')
+
+
 def _update_validation_status(submission: DbSubmission):
     errors = 0
     for file in submission.files:
@@ -607,7 +737,7 @@ def _update_validation_status(submission: DbSubmission):
         submission.status = QC_STATUS_VALIDATED
 
 
-def _publish_submission(ctx: WsContext, submission: DbSubmission, status) -> bool:
+def _publish_submission(ctx: WsContext, submission: DbSubmission, status) -> List[str]:
     submission_path = os.path.join(submission.store_sub_path, submission.path)
     source_meas_path = os.path.join(ctx.get_datasets_upload_path(submission_path))
     source_docs_path = os.path.join(ctx.get_doc_files_upload_path(submission_path))
@@ -627,7 +757,7 @@ def _publish_submission(ctx: WsContext, submission: DbSubmission, status) -> boo
 
         if file.filetype == TYPE_MEASUREMENT:
             try:
-                dataset = SbFileReader().read(source_path)
+                dataset = sb_parsed_file.read_dataset(source_path, ctx.parsed_files_path)
             except (SbFormatError, OSError) as e:
                 _LOG.warning("Error reading dataset: " + str(e))
                 raise e
@@ -641,7 +771,4 @@ def _publish_submission(ctx: WsContext, submission: DbSubmission, status) -> boo
 
             datasets.append(dataset)
 
-    for dataset in datasets:
-        ctx.db_driver.add_dataset(dataset)
-
-    return True
+    return ctx.db_driver.add_datasets(datasets)
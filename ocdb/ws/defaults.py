@@ -31,5 +31,8 @@ DEFAULT_CONFIG_FILE = os.path.abspath(DEFAULT_SERVER_NAME + '.yml')
 DEFAULT_LOG_PREFIX = os.path.abspath(DEFAULT_SERVER_NAME + '.log')
 
 DEFAULT_MAX_THREAD_COUNT = None
+DEFAULT_MAX_PROCESS_COUNT = None
+
+DEFAULT_MAX_UPLOAD_SIZE = 4 * 1024 ** 3
 
 TRACE_PERF = False
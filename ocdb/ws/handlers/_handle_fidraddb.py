@@ -2,6 +2,7 @@ import functools
 import logging
 import os.path
 import datetime
+import shutil
 from mimetypes import guess_type
 
 import tornado.httputil
@@ -11,7 +12,7 @@ from collections import deque
 from ocdb.core.fidraddb.validator import CalCharValidator
 from ocdb.ws.handlers._handlers import _login_required, _admin_required, _submission_send_authorization_required, \
     _ensure_string_argument
-from ocdb.ws.webservice import WsRequestHandler, _LOG_FidRadDb
+from ocdb.ws.webservice import WsRequestHandler, WsStreamingRequestHandler, _LOG_FidRadDb
 from ocdb.ws.controllers.store import *
 
 _DATA_DIR_NAME = "cal_char"
@@ -118,7 +119,10 @@ class FidRadDbRequestHandler(WsRequestHandler):
 
 
 # noinspection PyAbstractClass
-class HandleCalCharUpload(FidRadDbRequestHandler):
+class HandleCalCharUpload(FidRadDbRequestHandler, WsStreamingRequestHandler):
+
+    def may_send_body(self) -> bool:
+        return self.has_fidrad_rights() or self.has_admin_rights()
 
     @_login_required
     @_fidrad_submit_authorization_required
@@ -126,17 +130,10 @@ class HandleCalCharUpload(FidRadDbRequestHandler):
         """Provide API operation uploadStoreFiles()."""
         log = self.logger
         log.info("upload start")
-        arguments = dict()
-        files = dict()
         # transform body with mime-type multipart/form-data into arguments and files Dict
-        tornado.httputil.parse_body_arguments(self.request.headers.get("Content-Type"),
-                                              self.request.body,
-                                              arguments,
-                                              files)
+        arguments, files = self.get_body_arguments_and_files()
 
-        cal_char_files = []
-        for file in files.get("cal_char_files", []):
-            cal_char_files.append(UploadedFile.from_dict(file))
+        cal_char_files = files.get("cal_char_files", [])
 
         disagree_publication = arguments.get("disagree_publication")
         disagree_publication = _ensure_string_argument(disagree_publication, "disagree_publication")
@@ -158,7 +155,7 @@ class HandleCalCharUpload(FidRadDbRequestHandler):
         log.info("upload stop")
 
     def upload_cal_char_files(self,
-                              cal_char_files: List[UploadedFile],
+                              cal_char_files: List[Union[UploadedFile, StreamedFile]],
                               disagree_publication: bool) -> Dict[str, any]:
         """ Return a dictionary mapping dataset file names to DatasetValidationResult."""
         assert_not_none(cal_char_files)
@@ -203,22 +200,30 @@ class HandleCalCharUpload(FidRadDbRequestHandler):
                 log.warning(f"File '{filename_upper}' already exists. Upload cal/char file aborted.")
                 results[key_already_existing_files].append(filename_upper)
                 continue
-            validation_result = cal_char_validator.validate(filename_upper, file.body, log)
+            if isinstance(file, StreamedFile):
+                # the spooled file is validated line by line and moved, it is not read into memory at once
+                with open(file.path, encoding=file.encoding, newline='') as text_io:
+                    validation_result = cal_char_validator.validate(filename_upper, text_io, log)
+            else:
+                validation_result = cal_char_validator.validate(filename_upper, file.body, log)
             if validation_result:
                 log.warning(f"File '{filename_upper}' not valid. Upload cal/char file aborted. "
                             + validation_result.get(filename_upper))
                 results[key_file_not_valid].update(validation_result)
                 continue
-            with open(file_path, "wb") as fp:
-                fp.write(file.body)
-                results[key_upload_count] = results[key_upload_count] + 1
-                log.info(f"file: {filename_upper} successfully uploaded.")
-                user_name = self.get_current_user()
-                utc_time = datetime.datetime.now(datetime.timezone.utc)
-                ctx.db_driver.add_cal_char_file({"filename": filename_upper,
-                                                 "user_name": user_name,
-                                                 "public": not disagree_publication,
-                                                 "utc_upload_time": str(utc_time)})
+            if isinstance(file, StreamedFile):
+                shutil.move(file.path, file_path)
+            else:
+                with open(file_path, "wb") as fp:
+                    fp.write(file.body)
+            results[key_upload_count] = results[key_upload_count] + 1
+            log.info(f"file: {filename_upper} successfully uploaded.")
+            user_name = self.get_current_user()
+            utc_time = datetime.datetime.now(datetime.timezone.utc)
+            ctx.db_driver.add_cal_char_file({"filename": filename_upper,
+                                             "user_name": user_name,
+                                             "public": not disagree_publication,
+                                             "utc_upload_time": str(utc_time)})
 
         if len(results[key_invalid_filename]) == 0:
             results.pop(key_invalid_filename)
@@ -19,6 +19,7 @@
 # OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
 # SOFTWARE.
 import functools
+import inspect
 from time import strptime
 
 import tornado.escape
@@ -30,7 +31,8 @@ from ..controllers.service import *
 from ..controllers.store import *
 from ..controllers.users import *
 from ..utils import ensure_valid_submission_id, ensure_valid_path
-from ..webservice import WsRequestHandler
+from ..multipart import StreamedFile
+from ..webservice import WsRequestHandler, WsStreamingRequestHandler
 from ...core.models.dataset_ids import DatasetIds
 
 MTYPE_DEFAULT = 'all'
@@ -58,36 +60,44 @@ class StoreInfo(WsRequestHandler):
         self.finish(tornado.escape.json_encode(result))
 
 
+async def _call_handler_method(func, handler, *args, **kwargs):
+    # decorated handler methods may be plain methods or coroutines
+    result = func(handler, *args, **kwargs)
+    if inspect.isawaitable(result):
+        await result
+
+
 def _login_required(func):
     @functools.wraps(func)
-    def wrapper(self, *args, **kwargs):
-        current_user_name = self.get_current_user()
-        current_user = self.ws_context.get_user(current_user_name)
+    async def wrapper(self, *args, **kwargs):
+        current_user = await self.get_current_db_user()
 
         if current_user is None:
             self.set_status(status_code=403, reason='Please login.')
             return
 
-        func(self, *args, **kwargs)
+        await _call_handler_method(func, self, *args, **kwargs)
 
     return wrapper
 
 
 def _admin_required(func):
     @functools.wraps(func)
-    def wrapper(self, *args, **kwargs):
+    async def wrapper(self, *args, **kwargs):
+        await self.get_current_db_user()
         if not self.has_admin_rights():
             self.set_status(status_code=403, reason='Not enough access rights to perform operation.')
             return
 
-        func(self, *args, **kwargs)
+        await _call_handler_method(func, self, *args, **kwargs)
 
     return wrapper
 
 
 def _submission_send_authorization_required(func):
     @functools.wraps(func)
-    def wrapper(self, *args, **kwargs):
+    async def wrapper(self, *args, **kwargs):
+        await self.get_current_db_user()
         allowed = False
         if self.has_admin_rights() or self.has_submit_rights():
             allowed = True
@@ -96,23 +106,25 @@ def _submission_send_authorization_required(func):
             self.set_status(status_code=403, reason='Not enough access rights to perform a submission')
             return
 
-        func(self, *args, **kwargs)
+        await _call_handler_method(func, self, *args, **kwargs)
 
     return wrapper
 
 
 def _submission_authorization_required(func):
     @functools.wraps(func)
-    def wrapper(self, *args, **kwargs):
+    async def wrapper(self, *args, **kwargs):
         current_user_name = self.get_current_user()
 
         submission_id = kwargs['submission_id'] if 'submission_id' in kwargs else None
 
+        await self.get_current_db_user()
         authorized = False
         if self.has_admin_rights():
             authorized = True
         elif self.has_submit_rights():
-            submission = get_submission(ctx=self.ws_context, submission_id=submission_id)
+            submission = await self.run_in_thread(get_submission, ctx=self.ws_context, submission_id=submission_id,
+                                                  include_files=False)
             if not submission:
                 self.set_status(status_code=404, reason=f'{submission_id} not found.')
                 return
@@ -125,27 +137,43 @@ def _submission_authorization_required(func):
                                                     f'{submission_id}.')
             return
 
-        func(self, *args, **kwargs)
+        await _call_handler_method(func, self, *args, **kwargs)
 
     return wrapper
 
 
+# noinspection PyAbstractClass
+class QueryStats(WsRequestHandler):
+
+    @_admin_required
+    async def get(self):
+        """Provide API operation getQueryStats()."""
+        limit = self.query.get_param_int('limit', default=20)
+        explain = self.query.get_param_bool('explain', default=False)
+        # explaining re-executes the slowest queries
+        result = await self.run_in_thread(get_query_stats, self.ws_context, limit=limit, explain=explain)
+        self.set_header('Content-Type', 'application/json')
+        self.finish(tornado.escape.json_encode(result))
+
+
 # noinspection PyAbstractClass,PyShadowingBuiltins
-class HandleSubmission(WsRequestHandler):
+class HandleSubmission(WsStreamingRequestHandler):
+
+    def may_send_body(self) -> bool:
+        return self.has_admin_rights() or self.has_submit_rights()
+
+    def on_file_received(self, file: StreamedFile):
+        if file.name == "datasetfiles":
+            start_reading_dataset_file(self.ws_context, file)
 
     @_login_required
     @_submission_send_authorization_required
-    def post(self):
+    async def post(self):
         """Provide API operation uploadStoreFiles()."""
         user_name = self.get_current_user()
 
-        arguments = dict()
-        files = dict()
         # transform body with mime-type multipart/form-data into arguments and files Dict
-        tornado.httputil.parse_body_arguments(self.request.headers.get("Content-Type"),
-                                              self.request.body,
-                                              arguments,
-                                              files)
+        arguments, files = self.get_body_arguments_and_files()
 
         submission_id = arguments.get("submissionid")
         submission_id = _ensure_string_argument(submission_id, "submissionid")
@@ -171,35 +199,26 @@ class HandleSubmission(WsRequestHandler):
         else:
             allow_publication = False
 
-        dataset_files = []
-        for file in files.get("datasetfiles", []):
-            dataset_files.append(UploadedFile.from_dict(file))
-
-        doc_files = []
-        for file in files.get("docfiles", []):
-            doc_files.append(UploadedFile.from_dict(file))
-
-        result = upload_submission_files(ctx=self.ws_context,
-                                         path=path,
-                                         store_user_path=store_user_path,
-                                         submission_id=submission_id,
-                                         user_name=user_name,
-                                         publication_date=publication_date,
-                                         allow_publication=allow_publication,
-                                         dataset_files=dataset_files,
-                                         doc_files=doc_files)
+        dataset_files = files.get("datasetfiles", [])
+        doc_files = files.get("docfiles", [])
+
+        result = await self.run_in_thread(upload_submission_files, ctx=self.ws_context, path=path,
+                                          store_user_path=store_user_path, submission_id=submission_id,
+                                          user_name=user_name, publication_date=publication_date,
+                                          allow_publication=allow_publication, dataset_files=dataset_files,
+                                          doc_files=doc_files)
         # Note, result is a Dict[filename, DatasetValidationResult]
         self.finish(tornado.escape.json_encode({k: v.to_dict() for k, v in result.items()}))
 
     @_login_required
     @_submission_authorization_required
-    def delete(self, submission_id: str):
-        submission = get_submission(ctx=self.ws_context, submission_id=submission_id)
+    async def delete(self, submission_id: str):
+        submission = await self.run_in_thread(get_submission, ctx=self.ws_context, submission_id=submission_id)
         if submission is None:
             self.set_status(404, reason="Submission not found")
             return
 
-        success = delete_submission(ctx=self.ws_context, submission_id=submission_id)
+        success = await self.run_in_thread(delete_submission, ctx=self.ws_context, submission_id=submission_id)
         if not success:
             self.set_status(400, reason="Error deleting submission")
 
@@ -208,8 +227,8 @@ class HandleSubmission(WsRequestHandler):
 
     @_login_required
     @_submission_authorization_required
-    def get(self, submission_id: str):
-        submission = get_submission(ctx=self.ws_context, submission_id=submission_id)
+    async def get(self, submission_id: str):
+        submission = await self.run_in_thread(get_submission, ctx=self.ws_context, submission_id=submission_id)
 
         if submission is None:
             self.set_status(404, reason="Submission not found")
@@ -230,22 +249,21 @@ class HandleSubmission(WsRequestHandler):
 
     @_login_required
     @_submission_authorization_required
-    def put(self, submission_id: str):
-        user_name = self.get_current_user()
-        user = self.ws_context.get_user(user_name)
+    async def put(self, submission_id: str):
+        user = await self.get_current_db_user()
 
         if user is not None:
             user_name = user.name
         else:
             user_name = 0
 
-        submission = get_submission(ctx=self.ws_context, submission_id=submission_id)
+        submission = await self.run_in_thread(get_submission, ctx=self.ws_context, submission_id=submission_id)
 
         if submission is None:
             self.set_status(404, reason="Submission not found")
             return
 
-        body_dict = tornado.escape.json_decode(self.request.body)
+        body_dict = tornado.escape.json_decode(self.get_body())
         new_submission_id = body_dict["submissionid"]
         new_submission_id = _ensure_string_argument(new_submission_id, "submissionid")
         ensure_valid_submission_id(new_submission_id)
@@ -265,13 +283,10 @@ class HandleSubmission(WsRequestHandler):
         # if not allow_publication:
         #    publication_date = None
 
-        update_submission_files(ctx=self.ws_context,
-                                path=path,
-                                store_user_path=temp_area_path,
-                                new_submission_id=new_submission_id,
-                                submission_id=submission_id,
-                                publication_date=publication_date,
-                                allow_publication=allow_publication)
+        await self.run_in_thread(update_submission_files, ctx=self.ws_context, path=path,
+                                 store_user_path=temp_area_path, new_submission_id=new_submission_id,
+                                 submission_id=submission_id, publication_date=publication_date,
+                                 allow_publication=allow_publication)
 
         self.set_header('Content-Type', 'application/json')
         self.finish(tornado.escape.json_encode({'message': f'Submission {submission_id} updated'}))
@@ -281,34 +296,37 @@ class HandleSubmission(WsRequestHandler):
 class DownloadSubmissionFile(WsRequestHandler):
     @_login_required
     @_submission_authorization_required
-    def get(self, submission_id: str, index: str):
+    async def get(self, submission_id: str, index: str):
         index = int(index)
 
-        result = download_submission_file_by_id(self.ws_context, submission_id=submission_id, index=index)
+        result = await self.run_in_thread(download_submission_file_by_id, self.ws_context, submission_id=submission_id,
+                                          index=index)
 
         if not result:
             self.set_status(400, reason="Submission File not found")
 
-        self._return_zip_file(result)
+        await self._return_zip_file(result)
         self.finish()
 
-    def _return_zip_file(self, result):
+    async def _return_zip_file(self, result):
         if result is None:
             return
 
         self.set_header('Content-Type', 'application/zip')
         path, filename = os.path.split(result.filename)
         self.set_header("Content-Disposition", "attachment; filename=%s" % filename)
-        self._stream_file_content(result)
+        await self._stream_file_content(result)
         os.remove(result.filename)
 
-    def _stream_file_content(self, result):
+    async def _stream_file_content(self, result):
         with open(result.filename, 'rb') as f:
             while True:
                 data = f.read(32768)
                 if not data:
                     break
                 self.write(data)
+                # sent chunk by chunk, the ZIP file is not buffered in memory
+                await self.flush()
 
 
 # Todo: The class UpdateSubmissionStatus is misleading and should be refactored to
@@ -324,9 +342,9 @@ class DownloadSubmissionFile(WsRequestHandler):
 class UpdateSubmissionStatus(WsRequestHandler):
     @_login_required
     @_submission_authorization_required
-    def put(self, submission_id: str):
+    async def put(self, submission_id: str):
 
-        submission = get_submission(ctx=self.ws_context, submission_id=submission_id)
+        submission = await self.run_in_thread(get_submission, ctx=self.ws_context, submission_id=submission_id)
 
         if submission is None:
             self.set_status(404, reason="Submission not found")
@@ -355,8 +373,8 @@ class UpdateSubmissionStatus(WsRequestHandler):
             new_status = submission['status']
 
         try:
-            success = update_submission(ctx=self.ws_context, submission=submission, status=new_status,
-                                        publication_date=new_publication_date)
+            success = await self.run_in_thread(update_submission, ctx=self.ws_context, submission=submission,
+                                               status=new_status, publication_date=new_publication_date)
             if not success:
                 self.set_status(400, reason="Error updating submission details (" + str(submission_id) + '/' +
                                             new_status + '/' + str(new_publication_date) + ')'
@@ -380,7 +398,7 @@ class UpdateSubmissionStatus(WsRequestHandler):
 class GetSubmissions(WsRequestHandler):
     @_login_required
     # @_submission_authorization_required
-    def get(self, user_name: str = None):
+    async def get(self, user_name: str = None):
         offset = self.query.get_param_int('offset', default=None)
         count = self.query.get_param_int('count', default=None)
         query_column = self.query.get_param('query-column', default=None)
@@ -396,11 +414,14 @@ class GetSubmissions(WsRequestHandler):
 
         sort_column = self.query.get_param('sort-column', default=None)
         sort_order = self.query.get_param('sort-order', default=None)
+        # keyset pagination, an alternative to offset
+        after_submission_id = self.query.get_param('after', default=None)
 
         current_user_name = self.get_current_user()
         if current_user_name != user_name:
             raise WsUnauthorizedError('User not allowed.')
 
+        await self.get_current_db_user()
         if self.has_admin_rights():
             user_id = None
         elif self.has_submit_rights():
@@ -408,15 +429,11 @@ class GetSubmissions(WsRequestHandler):
         else:
             raise WsUnauthorizedError('You are not allowed querying submissions.')
 
-        result, tot_count = get_submissions(ctx=self.ws_context,
-                                            user_id=user_id,
-                                            offset=offset,
-                                            count=count,
-                                            query_column=query_column,
-                                            query_value=query_value,
-                                            query_operator=query_operator,
-                                            sort_column=sort_column,
-                                            sort_order=sort_order)
+        result, tot_count = await self.run_in_thread(get_submissions, ctx=self.ws_context, user_id=user_id,
+                                                     offset=offset, count=count, query_column=query_column,
+                                                     query_value=query_value, query_operator=query_operator,
+                                                     sort_column=sort_column, sort_order=sort_order,
+                                                     after_submission_id=after_submission_id)
 
         result_list = []
         for submission in result:
@@ -443,10 +460,11 @@ class GetSubmissions(WsRequestHandler):
 class HandleSubmissionFile(WsRequestHandler):
     @_login_required
     @_submission_authorization_required
-    def get(self, submission_id: str, index: str):
+    async def get(self, submission_id: str, index: str):
         index = int(index)
 
-        submission_file = get_submission_file(ctx=self.ws_context, submission_id=submission_id, index=index)
+        submission_file = await self.run_in_thread(get_submission_file, ctx=self.ws_context,
+                                                   submission_id=submission_id, index=index)
 
         if submission_file is not None:
             submission_file = submission_file.to_dict()
@@ -459,8 +477,8 @@ class HandleSubmissionFile(WsRequestHandler):
 
     @_login_required
     @_submission_authorization_required
-    def post(self, submission_id: str, typ: str):
-        submission = get_submission(ctx=self.ws_context, submission_id=submission_id)
+    async def post(self, submission_id: str, typ: str):
+        submission = await self.run_in_thread(get_submission, ctx=self.ws_context, submission_id=submission_id)
 
         if submission is None:
             self.set_status(404, reason="Submission not found")
@@ -480,11 +498,12 @@ class HandleSubmissionFile(WsRequestHandler):
             self.set_status(400, reason="Invalid number of files supplied")
             return
 
-        submission_file = get_submission_file_by_filename(ctx=self.ws_context, submission_id=submission_id,
-                                                          file_name=files[0].filename)
+        submission_file = await self.run_in_thread(get_submission_file_by_filename, ctx=self.ws_context,
+                                                   submission_id=submission_id, file_name=files[0].filename)
 
         if not submission_file:
-            add_submission_file(ctx=self.ws_context, submission=submission, file=files[0], typ=typ)
+            await self.run_in_thread(add_submission_file, ctx=self.ws_context, submission=submission, file=files[0],
+                                     typ=typ)
         else:
             self.set_status(400,
                             reason=f"File name {files[0].filename} "
@@ -498,8 +517,8 @@ class HandleSubmissionFile(WsRequestHandler):
 
     @_login_required
     @_submission_authorization_required
-    def put(self, submission_id: str, index: str):
-        submission = get_submission(ctx=self.ws_context, submission_id=submission_id)
+    async def put(self, submission_id: str, index: str):
+        submission = await self.run_in_thread(get_submission, ctx=self.ws_context, submission_id=submission_id)
         if submission is None:
             self.set_status(404, reason="Submission not found")
             return
@@ -510,7 +529,8 @@ class HandleSubmissionFile(WsRequestHandler):
             self.set_status(400, reason="Invalid submission file index")
             return
 
-        sb_file = get_submission_file(ctx=self.ws_context, submission_id=submission_id, index=index)
+        sb_file = await self.run_in_thread(get_submission_file, ctx=self.ws_context, submission_id=submission_id,
+                                           index=index)
 
         arguments = dict()
         files = dict()
@@ -526,8 +546,8 @@ class HandleSubmissionFile(WsRequestHandler):
             self.set_status(400, reason="Invalid number of files supplied")
             return
 
-        result = update_submission_file(ctx=self.ws_context, submission=submission, index=index, file=files[0],
-                                        typ=sb_file.filetype)
+        result = await self.run_in_thread(update_submission_file, ctx=self.ws_context, submission=submission,
+                                          index=index, file=files[0], typ=sb_file.filetype)
         if result is None:
             return
 
@@ -536,8 +556,8 @@ class HandleSubmissionFile(WsRequestHandler):
 
     @_login_required
     @_submission_authorization_required
-    def delete(self, submission_id: str, index: str):
-        submission = get_submission(ctx=self.ws_context, submission_id=submission_id)
+    async def delete(self, submission_id: str, index: str):
+        submission = await self.run_in_thread(get_submission, ctx=self.ws_context, submission_id=submission_id)
         if submission is None:
             self.set_status(404, reason="Submission not found")
             return
@@ -547,13 +567,33 @@ class HandleSubmissionFile(WsRequestHandler):
             self.set_status(400, reason="Invalid submission file index")
             return
 
-        result = delete_submission_file(ctx=self.ws_context, submission=submission, index=index)
+        result = await self.run_in_thread(delete_submission_file, ctx=self.ws_context, submission=submission,
+                                          index=index)
         if result:
             self.set_status(200, reason="OK")
         else:
             self.set_status(400, reason="Database error")
 
 
+# noinspection PyAbstractClass
+class GetSubmissionFileIssues(WsRequestHandler):
+    @_login_required
+    @_submission_authorization_required
+    async def get(self, submission_id: str, index: str):
+        index = int(index)
+        offset = self.query.get_param_int('offset', default=None)
+        count = self.query.get_param_int('count', default=None)
+
+        issues, tot_count = await self.run_in_thread(get_submission_file_issues, ctx=self.ws_context,
+                                                     submission_id=submission_id, index=index, offset=offset,
+                                                     count=count)
+
+        self.set_header('Content-Type', 'application/json')
+        self.finish(tornado.escape.json_encode(
+            {'issues': [issue.to_dict() for issue in issues], 'tot_count': tot_count}
+        ))
+
+
 class Handledecode(WsRequestHandler):
     # def options(self):
     #    print('Hello')
@@ -567,8 +607,8 @@ class Handledecode(WsRequestHandler):
 class UpdateSubmissionFileStatus(WsRequestHandler):
     @_login_required
     @_submission_authorization_required
-    def get(self, submission_id: str, index: str, status: str):
-        submission = get_submission(ctx=self.ws_context, submission_id=submission_id)
+    async def get(self, submission_id: str, index: str, status: str):
+        submission = await self.run_in_thread(get_submission, ctx=self.ws_context, submission_id=submission_id)
         if submission is None:
             self.set_status(404, reason="Submission not found")
             return
@@ -578,7 +618,8 @@ class UpdateSubmissionFileStatus(WsRequestHandler):
             self.set_status(400, reason="Invalid submission file index")
             return
 
-        result = update_submission_file_status(ctx=self.ws_context, submission=submission, index=index, status=status)
+        result = await self.run_in_thread(update_submission_file_status, ctx=self.ws_context, submission=submission,
+                                          index=index, status=status)
         if result:
             self.set_status(200, reason="OK")
         else:
@@ -587,7 +628,7 @@ class UpdateSubmissionFileStatus(WsRequestHandler):
 
 # noinspection PyAbstractClass,PyShadowingBuiltins
 class StoreDownload(WsRequestHandler):
-    def get(self):
+    async def get(self):
         """Provide API operation downloadStoreFiles()."""
         # noinspection PyBroadException,PyUnusedLocal
         # For details see: https://ocdb.readthedocs.io/en/latest/ocdb-api-cli.html
@@ -609,59 +650,62 @@ class StoreDownload(WsRequestHandler):
         pname = self.query.get_param_list('pname', default=None)              # Parameter (Variable): Looks for files containing only the specified variables. A complete list of queryable variables are available [here](ocdb-standard-field-unit.md)
         docs = self.query.get_param_bool('docs', default=None)                # Shall documents be downloaded as well?
 
-        result = download_store_files(self.ws_context, expr=expr, region=region, s_time=s_time, wdepth=wdepth,
-                                      mtype=mtype, wlmode=wlmode, shallow=shallow, pmode=pmode, pgroup=pgroup,
-                                      pname=pname, docs=docs)
+        result = await self.run_in_thread(download_store_files, self.ws_context, expr=expr, region=region,
+                                          s_time=s_time, wdepth=wdepth, mtype=mtype, wlmode=wlmode, shallow=shallow,
+                                          pmode=pmode, pgroup=pgroup, pname=pname, docs=docs)
 
-        self._return_zip_file(result)
+        await self._return_zip_file(result)
         self.finish(tornado.escape.json_encode({'message': 'File downloaded'}))
 
-    def post(self):
+    async def post(self):
         id_list_dict = tornado.escape.json_decode(self.request.body)
         dataset_ids = DatasetIds.from_dict(id_list_dict)
-        result = download_store_files_by_id(self.ws_context, dataset_ids=dataset_ids.id_list, docs=dataset_ids.docs)
+        result = await self.run_in_thread(download_store_files_by_id, self.ws_context,
+                                          dataset_ids=dataset_ids.id_list, docs=dataset_ids.docs)
 
-        self._return_zip_file(result)
+        await self._return_zip_file(result)
         self.finish()
 
-    def _return_zip_file(self, result):
+    async def _return_zip_file(self, result):
         if result is None:
             return
 
         self.set_header('Content-Type', 'application/zip')
         path, filename = os.path.split(result.filename)
         self.set_header("Content-Disposition", "attachment; filename=%s" % filename)
-        self._stream_file_content(result)
+        await self._stream_file_content(result)
         os.remove(result.filename)
 
-    def _stream_file_content(self, result):
+    async def _stream_file_content(self, result):
         with open(result.filename, 'rb') as f:
             while True:
                 data = f.read(32768)
                 if not data:
                     break
                 self.write(data)
+                # sent chunk by chunk, the ZIP file is not buffered in memory
+                await self.flush()
 
 
 # noinspection PyAbstractClass
 class ValidateSubmission(WsRequestHandler):
     @_login_required
-    def post(self):
+    async def post(self):
         """Provide API operation validateDataset()."""
         # transform body with mime-type application/json into a Dataset
         data_dict = tornado.escape.json_decode(self.request.body)
         self.set_header('Content-Type', 'application/json')
 
-        dataset = SbFileReader().read(io.StringIO(data_dict['data']))
+        dataset = await self.run_in_thread(SbFileReader().read, io.StringIO(data_dict['data']))
         # dataset = Dataset.from_dict(data_dict)
-        result = validate_dataset(self.ws_context, dataset=dataset)
+        result = await self.run_in_thread(validate_dataset, self.ws_context, dataset=dataset)
         # transform result of type DatasetValidationResult into response with mime-type application/json
         self.finish(tornado.escape.json_encode(result.to_dict()))
 
 
 # noinspection PyAbstractClass
 class Datasets(WsRequestHandler):
-    def get(self):
+    async def get(self):
         """Provide API operation findDatasets()."""
         # noinspection PyBroadException,PyUnusedLocal
         expr = self.query.get_param('expr', default=None)
@@ -679,8 +723,10 @@ class Datasets(WsRequestHandler):
         geojson = self.query.get_param_bool('geojson', default=False)
         offset = self.query.get_param_int('offset', default=None)
         count = self.query.get_param_int('count', default=None)
+        max_total_count = self.query.get_param_int('max_total_count', default=None)
         user_id = self.query.get_param('user_id', default=None)
 
+        await self.get_current_db_user()
         if self.has_admin_rights():
             status = None
             user_id = None
@@ -688,10 +734,11 @@ class Datasets(WsRequestHandler):
             status = 'PUBLISHED'
 
         try:
-            result = find_datasets(self.ws_context, expr=expr, region=region, time=tim, wdepth=wdepth, mtype=mtype,
-                                   wlmode=wlmode, shallow=shallow, pmode=pmode, pgroup=pgroup, pname=pname,
-                                   submission_id=submission_id, status=status,
-                                   offset=offset, count=count, geojson=geojson, user_id=user_id)
+            result = await self.run_in_thread(find_datasets, self.ws_context, expr=expr, region=region, time=tim,
+                                              wdepth=wdepth, mtype=mtype, wlmode=wlmode, shallow=shallow, pmode=pmode,
+                                              pgroup=pgroup, pname=pname, submission_id=submission_id, status=status,
+                                              offset=offset, count=count, max_total_count=max_total_count,
+                                              geojson=geojson, user_id=user_id)
         except Exception as e:
             self.set_status(status_code=403, reason=str(e))
             return
@@ -718,53 +765,57 @@ class Datasets(WsRequestHandler):
 # noinspection PyAbstractClass,PyShadowingBuiltins
 class GetDatasetsById(WsRequestHandler):
 
-    def get(self, id: str):
+    async def get(self, id: str):
         """Provide API operation getDatasetById()."""
         dataset_id = id
-        result = get_dataset_by_id_strict(self.ws_context, dataset_id=dataset_id)
+        fields = self.query.get_param('fields', default=None)
+        fields = self.query.to_list('fields', fields) if fields else None
+        result = await self.run_in_thread(get_dataset_by_id_strict, self.ws_context, dataset_id=dataset_id,
+                                          fields=fields)
         # transform result of type Dataset into response with mime-type application/json
         self.set_header('Content-Type', 'application/json')
         self.finish(tornado.escape.json_encode(result.to_dict()))
 
-    def delete(self, id: str):
+    async def delete(self, id: str):
         """Provide API operation deleteDataset()."""
+        await self.get_current_db_user()
         if not self.has_admin_rights():
             self.set_status(status_code=403, reason='Not enough access rights to perform operation.')
             return
 
         dataset_id = id
-        delete_dataset(self.ws_context, dataset_id=dataset_id, )
+        await self.run_in_thread(delete_dataset, self.ws_context, dataset_id=dataset_id)
         self.finish()
 
 
 # noinspection PyAbstractClass,PyShadowingBuiltins
 class GetDatasetsBySubmissionId(WsRequestHandler):
 
-    def get(self, submission_id: str):
+    async def get(self, submission_id: str):
         """Provide API operation getDatasetById()."""
-        result = find_datasets(self.ws_context, submission_id=submission_id)
+        result = await self.run_in_thread(find_datasets, self.ws_context, submission_id=submission_id)
         self.set_header('Content-Type', 'application/json')
         self.finish(tornado.escape.json_encode(result.to_dict()))
 
     @_login_required
     @_admin_required
-    def delete(self, submission_id: str):
+    async def delete(self, submission_id: str):
         """Provide API operation deleteDatasets by submission ID()."""
-        result = find_datasets(self.ws_context, submission_id=submission_id)
-        for ds in result.datasets:
-            delete_dataset(ctx=self.ws_context, dataset_id=ds.id)
+        deleted_count = await self.run_in_thread(delete_datasets_by_submission, self.ws_context,
+                                                 submission_id=submission_id)
 
         self.finish(tornado.escape.json_encode(
-            {'message': f'{result.total_count} Datasets for {submission_id} deleted'})
+            {'message': f'{deleted_count} Datasets for {submission_id} deleted'})
         )
 
 
 # noinspection PyAbstractClass,PyShadowingBuiltins
 class DatasetsAffilProjectCruise(WsRequestHandler):
 
-    def get(self, affil: str, project: str, cruise: str):
+    async def get(self, affil: str, project: str, cruise: str):
         """Provide API operation getDatasetsInBucket()."""
-        result = get_datasets_in_path(self.ws_context, affil=affil, project=project, cruise=cruise)
+        result = await self.run_in_thread(get_datasets_in_path, self.ws_context, affil=affil, project=project,
+                                          cruise=cruise)
         # transform result of type List[DatasetRef] into response with mime-type application/json
         self.set_header('Content-Type', 'application/json')
         self.finish(tornado.escape.json_encode([item.to_dict() for item in result]))
@@ -773,9 +824,10 @@ class DatasetsAffilProjectCruise(WsRequestHandler):
 # noinspection PyAbstractClass,PyShadowingBuiltins
 class DatasetsAffilProjectCruiseName(WsRequestHandler):
 
-    def get(self, affil: str, project: str, cruise: str, name: str):
+    async def get(self, affil: str, project: str, cruise: str, name: str):
         """Provide API operation getDatasetByBucketAndName()."""
-        result = get_dataset_by_name(self.ws_context, affil=affil, project=project, cruise=cruise, name=name)
+        result = await self.run_in_thread(get_dataset_by_name, self.ws_context, affil=affil, project=project,
+                                          cruise=cruise, name=name)
         # transform result of type str into response with mime-type text/plain
         self.set_header('Content-Type', 'text/plain')
         self.finish(result)
@@ -784,16 +836,17 @@ class DatasetsAffilProjectCruiseName(WsRequestHandler):
 # noinspection PyAbstractClass,PyShadowingBuiltins
 class DatasetsIdQcinfo(WsRequestHandler):
 
-    def get(self, id: str):
+    async def get(self, id: str):
         """Provide API operation getDatasetQcInfo()."""
         dataset_id = id
-        result = get_dataset_qc_info(self.ws_context, dataset_id=dataset_id)
+        result = await self.run_in_thread(get_dataset_qc_info, self.ws_context, dataset_id=dataset_id)
         # transform result of type QcInfo into response with mime-type application/json
         self.set_header('Content-Type', 'application/json')
         self.finish(tornado.escape.json_encode(result.to_dict()))
 
-    def post(self, id: str):
+    async def post(self, id: str):
         """Provide API operation setDatasetQcInfo()."""
+        await self.get_current_db_user()
         if not self.has_admin_rights():
             self.set_status(status_code=403, reason='Not enough access rights to perform operation.')
             return
@@ -802,7 +855,7 @@ class DatasetsIdQcinfo(WsRequestHandler):
         # transform body with mime-type application/json into a QcInfo
         data_dict = tornado.escape.json_decode(self.request.body)
         qc_info = QcInfo.from_dict(data_dict)
-        set_dataset_qc_info(self.ws_context, dataset_id=dataset_id, qc_info=qc_info)
+        await self.run_in_thread(set_dataset_qc_info, self.ws_context, dataset_id=dataset_id, qc_info=qc_info)
         self.finish()
 
 
@@ -31,6 +31,7 @@ API_URL_PREFIX = f"/ocdb/api/{API_VERSION_TAG}"
 
 MAPPINGS = [
     (url_pattern(API_URL_PREFIX + '/service/info'), ServiceInfo),
+    (url_pattern(API_URL_PREFIX + '/service/queries'), QueryStats),
     (url_pattern(API_URL_PREFIX + '/store/info'), StoreInfo),
     (url_pattern(API_URL_PREFIX + '/store/FidRadDB/upload/cal_char'), HandleCalCharUpload),
     (url_pattern(API_URL_PREFIX + '/store/FidRadDB/history/search/{search_string}/{max_num_lines}'),
@@ -46,6 +47,8 @@ MAPPINGS = [
     (url_pattern(API_URL_PREFIX + '/store/upload/user/{user_name}'), GetSubmissions),
     (url_pattern(API_URL_PREFIX + '/store/add/submissionfile/{submission_id}/{typ}'), HandleSubmissionFile),
     (url_pattern(API_URL_PREFIX + '/store/upload/submissionfile/{submission_id}/{index}'), HandleSubmissionFile),
+    (url_pattern(API_URL_PREFIX + '/store/issues/submissionfile/{submission_id}/{index}'),
+     GetSubmissionFileIssues),
     (url_pattern(API_URL_PREFIX + '/store/download/submissionfile/{submission_id}/{index}'),
      DownloadSubmissionFile),
     (url_pattern(API_URL_PREFIX + '/store/status/submissionfile/{submission_id}/{index}/{status}'),
@@ -0,0 +1,236 @@
+# The MIT License (MIT)
+# Copyright (c) 2018 by EUMETSAT
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy of
+# this software and associated documentation files (the "Software"), to deal in
+# the Software without restriction, including without limitation the rights to
+# use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies
+# of the Software, and to permit persons to whom the Software is furnished to do
+# so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+"""
+Incremental parser for multipart/form-data request bodies.
+
+The body is fed chunk by chunk as it is received. Form fields are collected in memory, file parts are
+written to a spool directory while they arrive, so that the memory consumption does not depend on the
+size of the uploaded files.
+"""
+
+import concurrent.futures
+import email.parser
+import hashlib
+import os
+from typing import Callable, Dict, List, Optional, TextIO
+
+from chardet import UniversalDetector
+
+from .errors import WsBadRequestError
+
+
+class StreamedFile:
+    """
+    A file received as part of a multipart/form-data body and stored at *path*.
+
+    Provides the same ``filename``, ``content_type`` and ``body`` properties as an UploadedFile, plus the
+    SHA-256 hex digest and the detected text encoding of the content, which are computed while receiving.
+    """
+
+    def __init__(self, name: str, filename: str, content_type: str, path: str):
+        self.name = name
+        self.filename = filename
+        self.content_type = content_type
+        self.path = path
+        self.size = 0
+        self.content_hash = None
+        self.encoding = None
+        # optional processing of the file which has been started as soon as the file was received
+        self.future: Optional[concurrent.futures.Future] = None
+        self._hash = hashlib.sha256()
+        self._detector = UniversalDetector()
+        self._fp = open(path, 'wb')
+
+    @property
+    def body(self) -> bytes:
+        with open(self.path, 'rb') as fp:
+            return fp.read()
+
+    def open_text(self) -> TextIO:
+        """Open the file in text mode using the detected encoding."""
+        return open(self.path, 'r', encoding=self.encoding, newline='\n')
+
+    def write(self, data: bytes):
+        self._fp.write(data)
+        self._hash.update(data)
+        if not self._detector.done:
+            self._detector.feed(data)
+        self.size += len(data)
+
+    def close(self):
+        if self._fp.closed:
+            return
+        self._fp.close()
+        self.content_hash = self._hash.hexdigest()
+        self.encoding = self._detector.close()['encoding']
+
+
+class MultipartStreamParser:
+    """
+    Parser for a multipart/form-data body, which is passed to ``data_received()`` in chunks of any size.
+
+    :param content_type: The value of the request's Content-Type header
+    :param spool_dir_path: The directory in which the received files are stored
+    :param on_file_received: Optional callback invoked with each StreamedFile once it has been received completely
+    """
+
+    def __init__(self,
+                 content_type: str,
+                 spool_dir_path: str,
+                 on_file_received: Callable[[StreamedFile], None] = None):
+        self._delimiter = b'--' + get_boundary(content_type)
+        self._spool_dir_path = spool_dir_path
+        self._on_file_received = on_file_received
+        self._buffer = bytearray()
+        self._state = _PREAMBLE
+        self._part_name = None
+        self._field_value = None
+        self._file = None
+        self._file_count = 0
+        self.arguments: Dict[str, List[bytes]] = dict()
+        self.files: Dict[str, List[StreamedFile]] = dict()
+
+    def data_received(self, chunk: bytes):
+        self._buffer.extend(chunk)
+        while self._state != _EPILOGUE:
+            if self._state == _PREAMBLE:
+                progress = self._parse_preamble()
+            elif self._state == _DELIMITER_END:
+                progress = self._parse_delimiter_end()
+            elif self._state == _HEADERS:
+                progress = self._parse_headers()
+            else:
+                progress = self._parse_body()
+            if not progress:
+                break
+
+    def finish(self):
+        """Must be called after the last chunk has been received."""
+        if self._state != _EPILOGUE:
+            self.close()
+            raise WsBadRequestError("Invalid multipart/form-data: body incomplete")
+
+    def close(self):
+        """Close the file currently being received, e.g. if the request has been aborted."""
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def _parse_preamble(self) -> bool:
+        index = self._buffer.find(self._delimiter)
+        if index < 0:
+            # keep a possibly incomplete delimiter only
+            del self._buffer[:max(0, len(self._buffer) - len(self._delimiter))]
+            return False
+        del self._buffer[:index + len(self._delimiter)]
+        self._state = _DELIMITER_END
+        return True
+
+    def _parse_delimiter_end(self) -> bool:
+        if len(self._buffer) < 2:
+            return False
+        if self._buffer[:2] == b'--':
+            self._state = _EPILOGUE
+            self._buffer.clear()
+            return False
+        if self._buffer[:2] != b'\r\n':
+            raise WsBadRequestError("Invalid multipart/form-data: malformed boundary")
+        del self._buffer[:2]
+        self._state = _HEADERS
+        return True
+
+    def _parse_headers(self) -> bool:
+        index = self._buffer.find(b'\r\n\r\n')
+        if index < 0:
+            if len(self._buffer) > _MAX_HEADERS_SIZE:
+                raise WsBadRequestError("Invalid multipart/form-data: part headers too large")
+            return False
+        headers = email.parser.HeaderParser().parsestr(self._buffer[:index].decode('utf-8'))
+        del self._buffer[:index + 4]
+
+        if headers.get_content_disposition() != 'form-data':
+            raise WsBadRequestError("Invalid multipart/form-data: Content-Disposition missing")
+        self._part_name = headers.get_param('name', header='content-disposition')
+        filename = headers.get_filename()
+        if filename is not None:
+            content_type = headers.get('Content-Type', 'application/unknown')
+            # never use the client's file name for the path of the spooled file
+            path = os.path.join(self._spool_dir_path, f'part-{self._file_count}')
+            self._file = StreamedFile(self._part_name, filename, content_type, path)
+            self._file_count += 1
+        else:
+            self._field_value = bytearray()
+        self._state = _BODY
+        return True
+
+    def _parse_body(self) -> bool:
+        delimiter = b'\r\n' + self._delimiter
+        index = self._buffer.find(delimiter)
+        if index < 0:
+            # everything but a possibly incomplete delimiter at the end belongs to the part
+            self._write_part_data(len(self._buffer) - len(delimiter) + 1)
+            return False
+
+        self._write_part_data(index)
+        del self._buffer[:len(delimiter)]
+
+        if self._file is not None:
+            file = self._file
+            self._file = None
+            file.close()
+            self.files.setdefault(file.name, []).append(file)
+            if self._on_file_received is not None:
+                self._on_file_received(file)
+        else:
+            self.arguments.setdefault(self._part_name, []).append(bytes(self._field_value))
+            self._field_value = None
+
+        self._state = _DELIMITER_END
+        return True
+
+    def _write_part_data(self, size: int):
+        if size <= 0:
+            return
+        if self._file is not None:
+            self._file.write(bytes(self._buffer[:size]))
+        else:
+            self._field_value.extend(self._buffer[:size])
+        del self._buffer[:size]
+
+
+def get_boundary(content_type: str) -> bytes:
+    for field in content_type.split(';'):
+        key, sep, value = field.strip().partition('=')
+        if key == 'boundary' and value:
+            if value.startswith('"') and value.endswith('"'):
+                value = value[1:-1]
+            return value.encode('latin1')
+    raise WsBadRequestError("Invalid multipart/form-data: no boundary")
+
+
+_MAX_HEADERS_SIZE = 64 * 1024
+
+_PREAMBLE = 'preamble'
+_DELIMITER_END = 'delimiter_end'
+_HEADERS = 'headers'
+_BODY = 'body'
+_EPILOGUE = 'epilogue'
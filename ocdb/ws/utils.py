@@ -1,5 +1,6 @@
 import re
 
+from ocdb.core.seabass.sb_parsed_file import PARSED_FILE_SUFFIX
 from ocdb.ws.errors import WsBadRequestError
 
 # Pattern to ensure string contain at least one letter
@@ -23,3 +24,10 @@ def ensure_valid_path(path: str) -> bool:
         raise WsBadRequestError("Provide the path as follows: name/name/name (AFFILIATION/EXPERIMENT/CRUISE). "
                                 "Each name must contain at least one letter. Use characters, numbers, minus and "
                                 "underscores only.")
+
+
+def ensure_valid_file_name(file_name: str) -> bool:
+    # reserved for the parsed datasets
+    if file_name.endswith(PARSED_FILE_SUFFIX):
+        raise WsBadRequestError(f"File names must not end with '{PARSED_FILE_SUFFIX}': {file_name}")
+    return True
@@ -20,31 +20,40 @@
 # SOFTWARE.
 
 import asyncio
+import concurrent.futures
+import functools
 import json
 import logging
+import logging.handlers
 import os
+import shutil
 import signal
 import sys
+import tempfile
 import time
 import traceback
 from datetime import datetime
-from typing import Optional, List
+from typing import Any, Callable, Optional, List, Dict, Tuple, Union
 
+import tornado.httputil
 import tornado.options
 import yaml
 from tornado.ioloop import IOLoop
 from tornado.log import enable_pretty_logging
-from tornado.web import RequestHandler, Application
+from tornado.web import RequestHandler, Application, stream_request_body
 
+from ocdb.core.models.uploaded_file import UploadedFile
 from ocdb.core.roles import Roles
 from .context import WsContext
 from .defaults import DEFAULT_ADDRESS, DEFAULT_PORT, DEFAULT_CONFIG_FILE, DEFAULT_UPDATE_PERIOD, DEFAULT_LOG_PREFIX, \
     DEFAULT_SSL
+from .multipart import MultipartStreamParser, StreamedFile
 from .reqparams import RequestParams
 from ..core import UNDEFINED
 
 _LOG = logging.getLogger('ocdb')
 _LOG_FidRadDb = logging.getLogger('fidraddb')
+_LOG_PERF = logging.getLogger('ocdb.perf')
 
 class WebService:
     """
@@ -87,6 +96,16 @@ class WebService:
         options.log_file_prefix = log_file_prefix or DEFAULT_LOG_PREFIX
         options.log_to_stderr = log_to_stderr
         enable_pretty_logging()
+        # traced database queries go to a log of their own, e.g. "ocdb-server-perf.log"
+        if options.log_file_prefix and not _LOG_PERF.handlers:
+            perf_handler = logging.handlers.RotatingFileHandler(
+                os.path.splitext(options.log_file_prefix)[0] + '-perf.log',
+                maxBytes=options.log_file_max_size,
+                backupCount=options.log_file_num_backups,
+                delay=True)
+            perf_handler.setFormatter(logging.Formatter('%(asctime)s %(levelname)s %(message)s'))
+            _LOG_PERF.addHandler(perf_handler)
+            _LOG_PERF.propagate = False
 
         self.config_file = os.path.abspath(config_file) if config_file else None
         print(f"Using config file {self.config_file}")
@@ -212,6 +231,7 @@ class WsRequestHandler(RequestHandler):
         self._header = WsRequestHeader(self)
         self._query = WsRequestQuery(self)
         self._cookie = WsRequestCookie(self)
+        self._current_db_user = UNDEFINED
 
     @property
     def ws_context(self) -> WsContext:
@@ -279,38 +299,44 @@ class WsRequestHandler(RequestHandler):
             obj['traceback'] = traceback_lines
         self.finish(self.to_json(obj))
 
-    def has_admin_rights(self):
-        user_name = self.get_current_user()
-        if not user_name:
-            return False
+    async def run_in_thread(self, func: Callable[..., Any], *args, **kwargs) -> Any:
+        """
+        Run the blocking function *func*, usually a controller querying the database, in the thread pool of
+        the context and await its result. Meanwhile, the IOLoop keeps serving other requests, so that
+        concurrent requests overlap instead of queueing. The pymongo driver is thread-safe.
+        """
+        return await IOLoop.current().run_in_executor(self.ws_context.thread_pool,
+                                                      functools.partial(func, *args, **kwargs))
 
-        user = self.ws_context.get_user(user_name)
-        if not Roles.is_admin(user.roles):
-            return False
+    async def get_current_db_user(self):
+        """
+        Get the database user of the logged-in user, or None. The user is looked up in the thread pool once per
+        request and cached, so that the access checks of a request do not block the IOLoop.
+        """
+        if self._current_db_user is UNDEFINED:
+            user_name = self.get_current_user()
+            self._current_db_user = await self.run_in_thread(self.ws_context.get_user, user_name) \
+                if user_name else None
+        return self._current_db_user
+
+    def _get_cached_db_user(self):
+        # async handler methods resolve the user with get_current_db_user() first, plain ones look it up here
+        if self._current_db_user is UNDEFINED:
+            user_name = self.get_current_user()
+            self._current_db_user = self.ws_context.get_user(user_name) if user_name else None
+        return self._current_db_user
 
-        return True
+    def has_admin_rights(self):
+        user = self._get_cached_db_user()
+        return user is not None and Roles.is_admin(user.roles)
 
     def has_submit_rights(self):
-        user_name = self.get_current_user()
-        if not user_name:
-            return False
-
-        user = self.ws_context.get_user(user_name)
-        if not Roles.is_submit(user.roles):
-            return False
-
-        return True
+        user = self._get_cached_db_user()
+        return user is not None and Roles.is_submit(user.roles)
 
     def has_fidrad_rights(self):
-        user_name = self.get_current_user()
-        if not user_name:
-            return False
-
-        user = self.ws_context.get_user(user_name)
-        if not Roles.is_fidrad(user.roles):
-            return False
-
-        return True
+        user = self._get_cached_db_user()
+        return user is not None and Roles.is_fidrad(user.roles)
 
     def is_self(self, user_name: str):
         current_user_name = self.get_current_user()
@@ -323,6 +349,128 @@ class WsRequestHandler(RequestHandler):
             return False
 
 
+SPOOL_DIR_NAME = '.incoming'
+
+
+# noinspection PyAbstractClass
+@stream_request_body
+class WsStreamingRequestHandler(WsRequestHandler):
+    """
+    A request handler which processes the request body while it is received.
+
+    The files of multipart/form-data bodies are written to a spool directory in the upload space as they arrive,
+    see ``get_body_arguments_and_files()``. Other bodies are collected, see ``get_body()``. The bodies of
+    requests without a logged-in user, or of users not allowed to send them, see ``may_send_body()``, are
+    discarded.
+    """
+
+    _multipart_parser = None
+    _spool_dir_path = None
+    _body = None
+
+    async def prepare(self):
+        self._multipart_parser = None
+        self._spool_dir_path = None
+        self._body = None
+
+        # the body is only read once prepare() has completed, nothing is written before the user is authorized
+        if await self.get_current_db_user() is None or not self.may_send_body():
+            return
+
+        content_type = self.request.headers.get("Content-Type", "")
+        if content_type.startswith("multipart/form-data"):
+            self.request.connection.set_max_body_size(self.ws_context.max_upload_size)
+            spool_root_path = os.path.join(self.ws_context.upload_path, SPOOL_DIR_NAME)
+            os.makedirs(spool_root_path, exist_ok=True)
+            self._spool_dir_path = tempfile.mkdtemp(dir=spool_root_path)
+            self._multipart_parser = MultipartStreamParser(content_type, self._spool_dir_path,
+                                                           on_file_received=self.on_file_received)
+        else:
+            self._body = bytearray()
+
+    def data_received(self, chunk: bytes):
+        if self._multipart_parser is not None:
+            self._multipart_parser.data_received(chunk)
+        elif self._body is not None:
+            self._body.extend(chunk)
+            # with a known length, request.body is set as usual once the body is complete
+            content_length = self.request.headers.get("Content-Length")
+            if content_length is not None and len(self._body) >= int(content_length):
+                self.get_body()
+
+    def get_body(self) -> bytes:
+        """
+        Get the request body, which must have been received completely. Bodies sent without a Content-Length
+        header are only available from here, not from ``request.body``.
+        """
+        if self._body is not None:
+            self.request.body = bytes(self._body)
+            self._body = None
+        return self.request.body
+
+    def may_send_body(self) -> bool:
+        """
+        Called before the body of a logged-in user is received. May be overridden to discard the bodies of users
+        who are not allowed to send them, before anything is spooled to disk or processed.
+        """
+        return True
+
+    def on_file_received(self, file: StreamedFile):
+        """
+        Called for every file of a multipart/form-data body, as soon as it has been received completely.
+        May be overridden to start processing the file while the rest of the body is still being received.
+        """
+
+    def get_body_arguments_and_files(self) -> Tuple[Dict[str, List[bytes]],
+                                                    Dict[str, List[Union[StreamedFile, UploadedFile]]]]:
+        """
+        Get the form fields and files of the request body, which must have been received completely.
+
+        :return: A dictionary mapping field names to values and one mapping field names to files
+        """
+        if self._multipart_parser is not None:
+            self._multipart_parser.finish()
+            return self._multipart_parser.arguments, self._multipart_parser.files
+
+        arguments = dict()
+        files = dict()
+        tornado.httputil.parse_body_arguments(self.request.headers.get("Content-Type"),
+                                              self.get_body(),
+                                              arguments,
+                                              files)
+        return arguments, {name: [UploadedFile.from_dict(file) for file in file_list]
+                           for name, file_list in files.items()}
+
+    def on_connection_close(self):
+        super().on_connection_close()
+        self._remove_spool_dir()
+
+    def on_finish(self):
+        super().on_finish()
+        self._remove_spool_dir()
+
+    def _remove_spool_dir(self):
+        futures = []
+        if self._multipart_parser is not None:
+            self._multipart_parser.close()
+            futures = [file.future for file_list in self._multipart_parser.files.values() for file in file_list
+                       if file.future is not None]
+        if self._spool_dir_path is not None:
+            spool_dir_path = self._spool_dir_path
+            self._spool_dir_path = None
+            # files still read by the process pool, e.g. after an error, are removed once they have been read
+            running_futures = [future for future in futures if not future.cancel() and not future.done()]
+            if running_futures:
+                self.ws_context.thread_pool.submit(_remove_dir_when_done, spool_dir_path, running_futures)
+            else:
+                shutil.rmtree(spool_dir_path, ignore_errors=True)
+
+
+def _remove_dir_when_done(dir_path: str, futures: List[concurrent.futures.Future]):
+    concurrent.futures.wait(futures)
+    shutil.rmtree(dir_path, ignore_errors=True)
+
+
 class WsRequestHeader(RequestParams):
     def __init__(self, handler: RequestHandler):
         self.handler = handler
@@ -55,6 +55,9 @@ setup(
     entry_points={
         'console_scripts': [
             'ocdb-server = ocdb.ws.main:main',
+            'ocdb-ingest = ocdb.db.ingest:main',
+            'ocdb-migrate = ocdb.db.migrate:main',
+            'ocdb-indexes = ocdb.db.indexes:main',
         ],
     },
     install_requires=requirements,
@@ -1,6 +1,9 @@
 import datetime
 from unittest import TestCase
 
+import numpy as np
+
+from ocdb.core.db.db_dataset import DbDataset
 from tests.helpers import new_test_db_dataset
 
 
@@ -110,3 +113,34 @@ class DbDatsetTest(TestCase):
         self.dataset.add_time(datetime.datetime.utcnow())
 
         self.assertEqual(2, len(self.dataset.times))
+
+    def test_columns_and_records(self):
+        dataset = DbDataset({}, None, columns=[np.array([-38.4, -38.5]),
+                                               np.array([109, 110]),
+                                               np.array(['a', 'b'], dtype=object)])
+        self.assertTrue(dataset.is_columnar)
+        self.assertEqual(2, dataset.record_count)
+        self.assertEqual([109, 110], dataset.get_column_values(1))
+        self.assertEqual([[-38.4, 109, 'a'], [-38.5, 110, 'b']], dataset.records)
+        self.assertEqual([[-38.4, 109, 'a'], [-38.5, 110, 'b']], dataset.to_dict()['records'])
+        self.assertNotIn('columns', dataset.to_dict())
+
+        dataset.add_record([-38.6, 111, 'c'])
+        self.assertFalse(dataset.is_columnar)
+        self.assertEqual(3, dataset.record_count)
+
+    def test_get_column_from_records(self):
+        self.dataset.add_record([-38.4, 109, 'a'])
+        self.dataset.add_record([-38.5, 110, 'b'])
+
+        self.assertFalse(self.dataset.is_columnar)
+        self.assertEqual(np.float64, self.dataset.get_column(0).dtype)
+        self.assertEqual(np.int64, self.dataset.get_column(1).dtype)
+        self.assertEqual(object, self.dataset.get_column(2).dtype)
+        np.testing.assert_almost_equal([-38.4, -38.5], self.dataset.get_column(0))
+
+    def test_equal_by_value_and_not_hashable(self):
+        dataset = DbDataset({}, None, columns=[np.array([-38.4, -38.5])])
+        self.assertEqual(DbDataset({}, [[-38.4], [-38.5]]), dataset)
+        with self.assertRaises(TypeError):
+            hash(dataset)
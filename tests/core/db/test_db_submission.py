@@ -103,6 +103,31 @@ class DbSubmissionTest(TestCase):
         self.assertEqual("Warburga", subm.files[1].filename)
         self.assertEqual(1, subm.files[1].index)
 
+    def test_from_dict_converts_files_lazily(self):
+        subm_dict = {'date': datetime(2002, 3, 4, 5, 6, 7),
+                     'file_refs': [],
+                     'files': [{'filename': 'Werner',
+                                'filetype': 'measurement',
+                                'index': 0,
+                                'result': {'issues': [], 'status': 'OK'},
+                                'status': QC_STATUS_SUBMITTED,
+                                'submission_id': 'submitme'}],
+                     'status': 'Yo!',
+                     'qc_status': 'Very good',
+                     'submission_id': 'submitme',
+                     'path': 'up where we belong',
+                     'publication_date': None,
+                     'allow_publication': False,
+                     'store_sub_path': 'Tom_Helge',
+                     'user_id': 'Tom'}
+
+        subm = DbSubmission.from_dict(subm_dict)
+        self.assertIsInstance(subm._files[0], dict)
+
+        self.assertIsInstance(subm.files[0], SubmissionFile)
+        self.assertIs(subm.files[0], subm.files[0])
+        self.assertEqual(["Werner"], [file_ref.filename for file_ref in subm.to_submission().file_refs])
+
     def test_to_submission(self):
         files = [SubmissionFile(submission_id="submitme",
                                 index=0,
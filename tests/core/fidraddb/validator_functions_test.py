@@ -1,4 +1,5 @@
 import copy
+import io
 import unittest
 from unittest.mock import MagicMock
 import ocdb.core.fidraddb.validator as v
@@ -27,6 +28,12 @@ class ValidatorCreationTest(unittest.TestCase):
         ]
         self.assertEqual(expected, actual)
 
+    def testThatLinesAreReadFromTextFilesLikeFromBytes(self):
+        for text in ['', 'a', 'a\n', ' a \r\nb\rc\n\rd', 'a\n\r\n\r', '\r\n\n\r\r']:
+            expected = CalCharValidator._convert_bytes_to_lines(text.encode('utf-8')) if text else ['']
+            actual = CalCharValidator._read_lines(io.StringIO(text, newline=''))
+            self.assertEqual(expected, actual, repr(text))
+
     def testThatTransposeThrowsTypeExceptionIfTheArgumentIsNotAListOfList(self):
         with self.assertRaises(TypeError) as te:
             v.transpose_list_per_row_to_list_per_column(None)
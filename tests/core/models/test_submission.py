@@ -26,7 +26,8 @@ class SubmissionTest(TestCase):
                                          'creationdate': NOW,
                                          'index': 7,
                                          'status': 'who_knows',
-                                         'submission_id': '12'}],
+                                         'submission_id': '12',
+                                         'issue_counts': None}],
                           'qc_status': 'OK',
                           'status': QC_STATUS_SUBMITTED,
                           'publication_date': datetime(2016, 2, 21, 10, 13, 32),
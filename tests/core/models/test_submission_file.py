@@ -55,3 +55,17 @@ class SubmissionFileTest(TestCase):
         self.assertEqual("is_a_secret", sfr.filename)
         self.assertEqual("a cool one", sfr.filetype)
         self.assertEqual(QC_STATUS_SUBMITTED, sfr.status)
+        self.assertEqual({'ERROR': 1, 'WARNING': 0}, sfr.issue_counts)
+
+    def test_issue_counts(self):
+        sf = SubmissionFile(index=11, submission_id="yeswecan", filename="is_a_secret", filetype="a cool one",
+                            status=QC_STATUS_SUBMITTED, result=None)
+        self.assertIsNone(sf.issue_counts)
+
+        sf.result = {'status': 'WARNING', 'issue_counts': {'ERROR': 0, 'WARNING': 2}}
+        self.assertEqual({'ERROR': 0, 'WARNING': 2}, sf.issue_counts)
+
+        sf.result = {'status': 'ERROR', 'issues': [{'type': 'ERROR', 'description': 'bad'},
+                                                   {'type': 'WARNING', 'description': 'odd'},
+                                                   {'type': 'ERROR', 'description': 'worse'}]}
+        self.assertEqual({'ERROR': 2, 'WARNING': 1}, sf.issue_counts)
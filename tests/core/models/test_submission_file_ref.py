@@ -20,7 +20,8 @@ class SubmissionFileRefTest(TestCase):
                           'index': 12,
                           'creationdate': NOW,
                           'status': QC_STATUS_APPROVED,
-                          'submission_id': 'suppe'}, sfr.to_dict())
+                          'submission_id': 'suppe',
+                          'issue_counts': None}, sfr.to_dict())
 
     def test_from_dict(self):
         sfr_dict={'index': 13, 'submission_id': 'moin!', "filename": "Franz", 'filetype': 'blue', 'status': QC_STATUS_PUBLISHED}
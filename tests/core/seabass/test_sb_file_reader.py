@@ -1,6 +1,8 @@
 import datetime
 import unittest
 
+import numpy as np
+
 from ocdb.core.seabass.sb_file_reader import SbFileReader, SbFormatError
 from tests.helpers import new_test_db_dataset
 
@@ -344,6 +346,263 @@ class SbFileReaderTest(unittest.TestCase):
         self.assertEqual("agp440", dataset.attributes[4])
         self.assertEqual("cgp488", dataset.attributes[14])
 
+    def test_parse_columnar(self):
+        sb_file = ['/begin_header\n',
+                   '/delimiter=comma\n',
+                   '/fields=date,time,lat,lon,station,chl\n',
+                   '/units=yyyymmdd,hh:mm:ss,degrees,degrees,none,mg/m^3\n',
+                   '/end_header\n',
+                   '20040120,10:28:00,-32.1,115.2,st01,0.51\n',
+                   '20040120,10:29:00,-32.2,115.3,st02,2\n']
+
+        dataset = SbFileReader(columnar=True)._parse(sb_file)
+        self.assertTrue(dataset.is_columnar)
+        self.assertEqual(2, dataset.record_count)
+        self.assertEqual(6, len(dataset.columns))
+        self.assertEqual(np.int64, dataset.columns[0].dtype)
+        self.assertEqual(object, dataset.columns[1].dtype)
+        self.assertEqual(np.float64, dataset.columns[2].dtype)
+        self.assertEqual(object, dataset.columns[4].dtype)
+        self.assertEqual(np.float64, dataset.columns[5].dtype)
+        np.testing.assert_almost_equal([0.51, 2.0], dataset.columns[5])
+
+        self.assertEqual([-32.1, -32.2], dataset.latitudes)
+        self.assertEqual([115.2, 115.3], dataset.longitudes)
+        self.assertEqual(datetime.datetime(2004, 1, 20, 10, 29, 0), dataset.times[1])
+
+        self.assertEqual([[20040120, '10:28:00', -32.1, 115.2, 'st01', 0.51],
+                          [20040120, '10:29:00', -32.2, 115.3, 'st02', 2.0]], dataset.records)
+
+    def test_parse_columnar_equals_row_wise_parse(self):
+        sb_file = ['/begin_header\n',
+                   '/delimiter=space\n',
+                   '/start_date=20010723\n',
+                   '/start_time=00:08:00[GMT]\n',
+                   '/north_latitude=11.713[DEG]\n',
+                   '/east_longitude=109.587[DEG]\n',
+                   '/fields=depth,Wt,sal\n',
+                   '/units=m,degreesC,PSU\n',
+                   '/end_header\n',
+                   '1 -1.67 30.515\n',
+                   '2 -1.671 30.514\n']
+
+        row_wise = SbFileReader()._parse(sb_file)
+        columnar = SbFileReader(columnar=True)._parse(sb_file)
+        self.assertEqual(row_wise.records, columnar.records)
+        self.assertEqual(row_wise.to_dict(), columnar.to_dict())
+
+    def test_parse_columnar_value_missing(self):
+        sb_file = ['/begin_header\n',
+                   '/delimiter=comma\n',
+                   '/fields=lat,lon,chl\n',
+                   '/units=degrees,degrees,mg/m^3\n',
+                   '/end_header\n',
+                   '-32.1,115.2,0.51\n',
+                   '-32.2,,0.52\n']
+
+        with self.assertRaises(SbFormatError) as cm:
+            SbFileReader(columnar=True)._parse(sb_file)
+        self.assertEqual('Value missing in data row 2 and column 2. Please use the placeholder as defined in '
+                         'metadata header “/missing”.', f"{cm.exception}")
+
+    def test_parse_columnar_number_of_columns_differs_in_later_row(self):
+        sb_file = ['/begin_header\n',
+                   '/delimiter=comma\n',
+                   '/fields=lat,lon,chl\n',
+                   '/units=degrees,degrees,mg/m^3\n',
+                   '/end_header\n',
+                   '-32.1,115.2,0.51\n',
+                   '-32.2,115.3,0.52,17\n']
+
+        with self.assertRaises(SbFormatError) as cm:
+            SbFileReader(columnar=True)._parse(sb_file)
+        self.assertEqual('Number of fields (3) does not match number of columns (4).', f"{cm.exception}")
+
+    def test_read_from_iterable_of_lines(self):
+        sb_file = ['/begin_header\n',
+                   '/delimiter=comma\n',
+                   '/fields=date,time,lat,lon,chl\n',
+                   '/units=yyyymmdd,hh:mm:ss,degrees,degrees,mg/m^3\n',
+                   '/end_header\n',
+                   '20040120,10:28:00,-32.1,115.2,0.51\n']
+
+        dataset = self.reader.read(line for line in sb_file)
+        self.assertEqual([[20040120, '10:28:00', -32.1, 115.2, 0.51]], dataset.records)
+
+    def test_read_chunks(self):
+        sb_file = ['/begin_header\n',
+                   '/delimiter=comma\n',
+                   '/fields=date,time,lat,lon,chl\n',
+                   '/units=yyyymmdd,hh:mm:ss,degrees,degrees,mg/m^3\n',
+                   '/end_header\n',
+                   '20040120,10:28:00,-32.1,115.2,0.51\n',
+                   '20040120,10:29:00,-32.2,115.3,0.52\n',
+                   '20040120,10:30:00,-32.3,115.4,0.53\n',
+                   '\n',
+                   '20040120,10:31:00,-32.4,115.5,0.54\n',
+                   '20040120,10:32:00,-32.5,115.6,0.55\n']
+
+        for reader in (SbFileReader(), SbFileReader(columnar=True)):
+            chunks = list(reader.read_chunks(iter(sb_file), chunk_size=2))
+            self.assertEqual([2, 2, 1], [chunk.record_count for chunk in chunks])
+            self.assertEqual([-32.3, -32.4], chunks[1].latitudes)
+            self.assertEqual(datetime.datetime(2004, 1, 20, 10, 32, 0), chunks[2].times[0])
+            self.assertEqual(['date', 'time', 'lat', 'lon', 'chl'], chunks[2].attributes)
+            self.assertEqual([[20040120, '10:32:00', -32.5, 115.6, 0.55]], chunks[2].records)
+
+    def test_read_chunks_value_missing_reports_row_in_file(self):
+        sb_file = ['/begin_header\n',
+                   '/delimiter=comma\n',
+                   '/start_date=20040120\n',
+                   '/start_time=10:28:00[GMT]\n',
+                   '/fields=lat,lon,chl\n',
+                   '/units=degrees,degrees,mg/m^3\n',
+                   '/end_header\n',
+                   '-32.1,115.2,0.51\n',
+                   '-32.2,115.3,0.52\n',
+                   '-32.3,,0.53\n']
+
+        for reader in (SbFileReader(), SbFileReader(columnar=True)):
+            chunks = reader.read_chunks(sb_file, chunk_size=2)
+            self.assertEqual(2, next(chunks).record_count)
+            with self.assertRaises(SbFormatError) as cm:
+                next(chunks)
+            self.assertEqual('Value missing in data row 3 and column 2. Please use the placeholder as defined in '
+                             'metadata header “/missing”.', f"{cm.exception}")
+
+    def test_read_chunks_header_errors_raised_first(self):
+        chunks = self.reader.read_chunks(['/begin_header\n'])
+        with self.assertRaises(SbFormatError) as cm:
+            next(chunks)
+        self.assertEqual('/end_header tag missing', f"{cm.exception}")
+
+    def test_parse_times_as_datetime64(self):
+        sb_file = ['/begin_header\n',
+                   '/delimiter=space\n',
+                   '/fields=date,time,lat,lon,depth\n',
+                   '/units=yyyymmdd,hh:mm:ss,degrees,degrees,m\n',
+                   '/end_header\n',
+                   '20040120 10:28:00 -4.7 38.1 3.4\n',
+                   '20040229 23:59:59 -4.7 38.1 3.4\n']
+
+        for columnar in (False, True):
+            dataset = SbFileReader(columnar=columnar)._parse(sb_file)
+            self.assertIsInstance(dataset.times, np.ndarray)
+            self.assertEqual(np.dtype('datetime64[s]'), dataset.times.dtype)
+            self.assertEqual([datetime.datetime(2004, 1, 20, 10, 28, 0),
+                              datetime.datetime(2004, 2, 29, 23, 59, 59)], dataset.times.tolist())
+            self.assertEqual(['2004-01-20T10:28:00', '2004-02-29T23:59:59'], dataset.to_dict()['times'])
+
+    def test_parse_times_as_datetime64_from_time_fields(self):
+        sb_file = ['/begin_header\n',
+                   '/delimiter=space\n',
+                   '/fields=year,month,day,hour,minute,lat,lon,CHL\n',
+                   '/units=year,month,day,hour,minute,lat,lon,CHL\n',
+                   '/end_header\n',
+                   '1992 03 01 23 04 12.00 -110.03 0.1700\n',
+                   '1969 12 31 00 59 12.00 -110.03 0.1900\n']
+
+        dataset = SbFileReader(columnar=True)._parse(sb_file)
+        self.assertEqual([datetime.datetime(1992, 3, 1, 23, 4, 0),
+                          datetime.datetime(1969, 12, 31, 0, 59, 0)], dataset.times.tolist())
+
+    def test_parse_times_invalid_date_reports_same_error(self):
+        sb_file = ['/begin_header\n',
+                   '/delimiter=space\n',
+                   '/fields=date,time,lat,lon,depth\n',
+                   '/units=yyyymmdd,hh:mm:ss,degrees,degrees,m\n',
+                   '/end_header\n',
+                   '20040120 10:28:00 -4.7 38.1 3.4\n',
+                   '20041320 10:28:00 -4.7 38.1 3.4\n']
+
+        for columnar in (False, True):
+            with self.assertRaises(SbFormatError) as cm:
+                SbFileReader(columnar=columnar)._parse(sb_file)
+            self.assertEqual("Invalid date (20041320). Format corresponds to YYYYMMDD.\n"
+                             "Valid value ranges for year month day are (1900-current_year) (1-12) (1-31)",
+                             f"{cm.exception}")
+
+    def test_parse_times_invalid_time_reports_same_error(self):
+        sb_file = ['/begin_header\n',
+                   '/delimiter=space\n',
+                   '/start_date=20040120\n',
+                   '/start_time=10:28:00[GMT]\n',
+                   '/fields=time,lat,lon,depth\n',
+                   '/units=hh:mm:ss,degrees,degrees,m\n',
+                   '/end_header\n',
+                   '10:28:00 -4.7 38.1 3.4\n',
+                   '10:61:00 -4.7 38.1 3.4\n']
+
+        with self.assertRaises(SbFormatError) as cm:
+            SbFileReader(columnar=True)._parse(sb_file)
+        self.assertEqual("Invalid time format (10:61:00). Format must correspond to HH:MM:SS. "
+                         "see: https://seabass.gsfc.nasa.gov/wiki/metadataheaders#start_date", f"{cm.exception}")
+
+    def test_parse_times_falls_back_to_row_wise_conversion(self):
+        sb_file = ['/begin_header\n',
+                   '/delimiter=space\n',
+                   '/fields=date,time,lat,lon,depth\n',
+                   '/units=yyyymmdd,hh:mm:ss,degrees,degrees,m\n',
+                   '/end_header\n',
+                   '20040120 10:28:00[GMT] -4.7 38.1 3.4\n']
+
+        dataset = SbFileReader(columnar=True)._parse(sb_file)
+        self.assertEqual([datetime.datetime(2004, 1, 20, 10, 28, 0)], dataset.times)
+
+    def test_read_header(self):
+        sb_file = ['/begin_header\n',
+                   '/delimiter=space\n',
+                   '/fields=date,time,lat,lon,depth,Wt\n',
+                   '/units=yyyymmdd,hh:mm:ss,degrees,degrees,m,degreesc\n',
+                   '/end_header\n',
+                   '20040120 10:28:00 -4.7 38.1 3.4 21.5\n',
+                   '20040120 10:29:00 -4.7 38.1 3.4 21.6\n']
+
+        lines = iter(sb_file)
+        header = self.reader.read_header(lines)
+        self.assertEqual({'delimiter': 'space',
+                          'fields': 'date,time,lat,lon,depth,Wt',
+                          'units': 'yyyymmdd,hh:mm:ss,degrees,degrees,m,degreesc'}, header.metadata)
+        self.assertEqual(['date', 'time', 'lat', 'lon', 'depth', 'wt'], header.attributes)
+        self.assertEqual(SbFileReader()._parse(sb_file).groups, header.groups)
+        self.assertIsNone(header.row_count)
+        # the records are not read
+        self.assertEqual('20040120 10:28:00 -4.7 38.1 3.4 21.5\n', next(lines))
+
+    def test_read_header_count_rows(self):
+        sb_file = ['/begin_header\n',
+                   '/delimiter=comma\n',
+                   '/start_date=20040120\n',
+                   '/start_time=10:28:00[GMT]\n',
+                   '/fields=lat,lon,depth\n',
+                   '/units=degrees,degrees,m\n',
+                   '/end_header\n',
+                   '\n',
+                   '-4.7,38.1,3.4\n',
+                   '   \n',
+                   '-4.7,38.1,5.2\n',
+                   '-4.7,38.1,7.0\n']
+
+        header = self.reader.read_header(sb_file, count_rows=True)
+        self.assertEqual(3, header.row_count)
+        self.assertEqual(SbFileReader()._parse(sb_file).record_count, header.row_count)
+
+    def test_read_header_errors(self):
+        with self.assertRaises(SbFormatError) as cm:
+            self.reader.read_header(['/begin_header\n', '/fields=lat,lon\n', '/delimiter=comma\n'])
+        self.assertEqual('/end_header tag missing', f"{cm.exception}")
+
+        with self.assertRaises(SbFormatError) as cm:
+            self.reader.read_header(['/begin_header\n', '/fields=lat,lon\n', '/delimiter=comma\n',
+                                     '/end_header\n'])
+        self.assertEqual('SeaBASS header field "units" required. '
+                         'See: https://seabass.gsfc.nasa.gov/wiki/metadataheaders#units', f"{cm.exception}")
+
+        with self.assertRaises(SbFormatError) as cm:
+            self.reader.read_header(['/begin_header\n', '/fields=lat,lon\n', '/units=degrees\n',
+                                     '/delimiter=comma\n', '/end_header\n'])
+        self.assertEqual('Number of fields (2) does not match number of units (1).', f"{cm.exception}")
+
     def test_extract_delimiter_regex(self):
         metadata = {'delimiter': 'comma'}
 
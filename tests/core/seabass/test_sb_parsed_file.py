@@ -0,0 +1,110 @@
+import datetime
+import os
+import pickle
+import shutil
+import tempfile
+import unittest
+
+import numpy as np
+
+from ocdb.core.seabass import sb_parsed_file
+from ocdb.core.seabass.sb_file_reader import SbFileReader, SbFormatError
+
+SB_FILE_TEXT = ('/begin_header\n'
+                '/delimiter=space\n'
+                '/fields=date,time,lat,lon,depth,station\n'
+                '/units=yyyymmdd,hh:mm:ss,degrees,degrees,m,none\n'
+                '/end_header\n'
+                '20040120 10:28:00 -4.7 38.1 3.4 st1\n'
+                '20040120 10:29:00 -4.8 38.2 5 st2\n')
+
+
+class SbParsedFileTest(unittest.TestCase):
+
+    def setUp(self):
+        self.dir_path = tempfile.mkdtemp()
+        self.cache_dir_path = os.path.join(self.dir_path, '.parsed')
+        self.file_path = os.path.join(self.dir_path, 'dataset.sb')
+        with open(self.file_path, 'w') as fp:
+            fp.write(SB_FILE_TEXT)
+
+    def tearDown(self):
+        shutil.rmtree(self.dir_path, ignore_errors=True)
+
+    def test_write_and_read_parsed_file(self):
+        dataset = SbFileReader().read(self.file_path)
+        content_hash = sb_parsed_file.compute_content_hash(self.file_path)
+
+        parsed_file_path = sb_parsed_file.write_parsed_file(dataset, self.file_path, self.cache_dir_path)
+        self.assertEqual(os.path.join(self.cache_dir_path, content_hash + '.parsed'), parsed_file_path)
+        self.assertTrue(os.path.isfile(parsed_file_path))
+
+        parsed_dataset = sb_parsed_file.read_parsed_file(self.cache_dir_path, content_hash)
+        self.assertIsNotNone(parsed_dataset)
+        self.assertTrue(parsed_dataset.is_columnar)
+        self.assertEqual(dataset.metadata, parsed_dataset.metadata)
+        self.assertEqual(dataset.attributes, parsed_dataset.attributes)
+        self.assertEqual(dataset.groups, parsed_dataset.groups)
+        self.assertEqual(dataset.records, parsed_dataset.records)
+        self.assertEqual(dataset.to_dict(), parsed_dataset.to_dict())
+
+    def test_write_and_read_parsed_file_with_datetime_times(self):
+        dataset = SbFileReader().read(self.file_path)
+        dataset.times = [datetime.datetime(2004, 1, 20, 10, 28), datetime.datetime(2004, 1, 20, 10, 29)]
+        sb_parsed_file.write_parsed_file(dataset, self.file_path, self.cache_dir_path, content_hash='abc')
+
+        parsed_dataset = sb_parsed_file.read_parsed_file(self.cache_dir_path, 'abc')
+        self.assertEqual(dataset.times, parsed_dataset.times)
+
+    def test_read_parsed_file_missing(self):
+        self.assertIsNone(sb_parsed_file.read_parsed_file(self.cache_dir_path, 'abc'))
+
+    def test_read_parsed_file_content_hash_differs(self):
+        dataset = SbFileReader().read(self.file_path)
+        sb_parsed_file.write_parsed_file(dataset, self.file_path, self.cache_dir_path, content_hash='abc')
+
+        self.assertIsNotNone(sb_parsed_file.read_parsed_file(self.cache_dir_path, 'abc'))
+        self.assertIsNone(sb_parsed_file.read_parsed_file(self.cache_dir_path, 'def'))
+
+    def test_read_parsed_file_does_not_unpickle(self):
+        class Payload:
+            def __reduce__(self):
+                return os.remove, (self_file_path,)
+
+        self_file_path = self.file_path
+        os.makedirs(self.cache_dir_path)
+        with open(sb_parsed_file.get_parsed_file_path(self.cache_dir_path, 'abc'), 'wb') as fp:
+            pickle.dump(dict(version=1, content_hash='abc'), fp, protocol=0)
+        with open(sb_parsed_file.get_parsed_file_path(self.cache_dir_path, 'def'), 'wb') as fp:
+            np.save(fp, np.array([Payload()], dtype=object), allow_pickle=True)
+
+        self.assertIsNone(sb_parsed_file.read_parsed_file(self.cache_dir_path, 'abc'))
+        self.assertIsNone(sb_parsed_file.read_parsed_file(self.cache_dir_path, 'def'))
+        self.assertTrue(os.path.isfile(self.file_path))
+
+    def test_read_dataset_parses_changed_file(self):
+        dataset = SbFileReader().read(self.file_path)
+        sb_parsed_file.write_parsed_file(dataset, self.file_path, self.cache_dir_path)
+
+        with open(self.file_path, 'a') as fp:
+            fp.write('20040120 10:30:00 -4.9 38.3 7 st3\n')
+
+        dataset = sb_parsed_file.read_dataset(self.file_path, self.cache_dir_path)
+        self.assertEqual(3, dataset.record_count)
+        self.assertEqual('st3', dataset.records[2][5])
+
+        with open(self.file_path, 'a') as fp:
+            fp.write('20041320 10:31:00 -4.9 38.3 9 st4\n')
+
+        with self.assertRaises(SbFormatError):
+            sb_parsed_file.read_dataset(self.file_path, self.cache_dir_path)
+
+    def test_delete_parsed_file(self):
+        dataset = SbFileReader().read(self.file_path)
+        parsed_file_path = sb_parsed_file.write_parsed_file(dataset, self.file_path, self.cache_dir_path,
+                                                            content_hash='abc')
+
+        sb_parsed_file.delete_parsed_file(self.cache_dir_path, 'abc')
+        self.assertFalse(os.path.exists(parsed_file_path))
+        # deleting a missing parsed file is a no-op
+        sb_parsed_file.delete_parsed_file(self.cache_dir_path, 'abc')
@@ -0,0 +1,20 @@
+import unittest
+
+from ocdb.db import geohash
+
+
+class GeohashTest(unittest.TestCase):
+
+    def test_get_cells(self):
+        self.assertEqual([], geohash.get_cells([]))
+        # known geohashes: u4pruydqqvj (57.64911, 10.40744), dr5ru (40.7128, -74.0060)
+        self.assertEqual(['dr5', 'u4p'], geohash.get_cells([(10.40744, 57.64911), (-74.0060, 40.7128),
+                                                            (10.5, 57.6)]))
+        self.assertEqual(['000', 'zzz'], geohash.get_cells([(-180.0, -90.0), (180.0, 90.0)]))
+
+    def test_get_region_cells(self):
+        self.assertEqual({'dr5'}, geohash.get_region_cells(-74.1, 40.6, -74.0, 40.7))
+        cells = geohash.get_region_cells(-180.0, -90.0, 180.0, 90.0)
+        self.assertEqual(32 ** 3, len(cells))
+        self.assertEqual(len(cells), geohash.get_region_cell_count(-180.0, -90.0, 180.0, 90.0))
+        self.assertEqual(2, geohash.get_region_cell_count(11.0, -18.0, 12.0, -17.0))
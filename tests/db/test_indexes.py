@@ -0,0 +1,58 @@
+import unittest
+
+import mongomock
+import pymongo
+
+from ocdb.db.indexes import INDEX_SPECS, IndexSpec, diff_indexes, ensure_indexes, find_collection_scans, main
+
+
+class IndexesTest(unittest.TestCase):
+
+    def test_ensure_indexes(self):
+        db = mongomock.MongoClient().ocdb
+        created = ensure_indexes(db)
+
+        self.assertEqual(sum(len(specs) for specs in INDEX_SPECS.values()), len(created))
+        self.assertIn('sb_datasets._text_', created)
+        self.assertIn('_products_', db.sb_datasets.index_information())
+        self.assertEqual([], ensure_indexes(db))
+
+    def test_diff_indexes(self):
+        specs = [IndexSpec("_status_", [('status', pymongo.ASCENDING)]),
+                 IndexSpec("_name_", [('name', pymongo.ASCENDING)], collation={'locale': 'en', 'strength': 2}),
+                 IndexSpec("_date_", [('date', pymongo.DESCENDING)])]
+        diff = diff_indexes('submission_files', {
+            '_id_': {'key': [('_id', 1)]},
+            '_status_': {'key': [('status', 1)]},
+            '_name_': {'key': [('name', 1)], 'collation': {'locale': 'en', 'strength': 3}},
+            '_times_': {'key': [('times', 1)]},
+        }, specs)
+
+        self.assertFalse(diff.is_empty)
+        self.assertEqual(['_date_'], [spec.name for spec in diff.missing])
+        self.assertEqual(['_name_'], [spec.name for spec in diff.changed])
+        self.assertEqual(['_times_'], diff.obsolete)
+        self.assertEqual("submission_files: missing index _date_\n"
+                         "submission_files: index _name_ differs from spec\n"
+                         "submission_files: index _times_ not in spec", str(diff))
+
+    def test_text_index_matches(self):
+        spec = IndexSpec("_text_", [('path', pymongo.TEXT), ('metadata.cruise', pymongo.TEXT)])
+
+        self.assertTrue(spec.matches({'key': [('_fts', 'text'), ('_ftsx', 1)],
+                                      'weights': {'path': 1, 'metadata.cruise': 1}}))
+        self.assertFalse(spec.matches({'key': [('_fts', 'text'), ('_ftsx', 1)],
+                                       'weights': {'path': 1}}))
+
+    def test_find_collection_scans(self):
+        self.assertEqual([], find_collection_scans({'stage': 'FETCH', 'inputStage': {'stage': 'IXSCAN'}}))
+        self.assertEqual(['COLLSCAN'], find_collection_scans({
+            'stage': 'SUBPLAN',
+            'inputStage': {'stage': 'OR', 'inputStages': [{'stage': 'IXSCAN'}, {'stage': 'COLLSCAN'}]}}))
+
+    # noinspection PyMethodMayBeStatic
+    def test_cli(self):
+        try:
+            main(['--help'])
+        except SystemExit:
+            pass
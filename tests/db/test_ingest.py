@@ -0,0 +1,177 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+from ocdb.core.models.dataset_query import DatasetQuery
+from ocdb.db.ingest import ingest, main, scan
+from ocdb.db.mongo_db_driver import MongoDbDriver
+
+SB_FILE_TEXT = ("/begin_header\n"
+                "/received=20120330\n"
+                "/delimiter = comma\n"
+                "/north_latitude=42.598[DEG]\n"
+                "/east_longitude=-67.105[DEG]\n"
+                "/start_date=20101117\n"
+                "/end_date=20101117\n"
+                "/start_time=20:14:00[GMT]\n"
+                "/end_time=20:14:00[GMT]\n"
+                "/fields = station, SN, lat, lon, year, month, day, hour, minute, pressure, wt, sal, CHL\n"
+                "/units = none, none, degrees, degrees, yyyy, mo, dd, hh, mn, dbar, degreesC, PSU, mg/m^3\n"
+                "/end_header\n"
+                "97,420,42.598,-67.105,2010,11,17,20,14,3,11.10,33.030,{chl}\n"
+                "97,420,42.598,-67.105,2010,11,17,20,15,4,11.10,33.030,2.51\n")
+
+
+class IngestTest(unittest.TestCase):
+
+    def setUp(self):
+        self._driver = MongoDbDriver()
+        self._driver.init(mock=True)
+        self._dir_path = tempfile.mkdtemp()
+        self._input_dir = os.path.join(self._dir_path, 'archive')
+        self._checkpoint_path = os.path.join(self._dir_path, 'ingest.checkpoint')
+        self._messages = []
+
+    def tearDown(self):
+        self._driver.clear()
+        self._driver.close()
+        shutil.rmtree(self._dir_path)
+
+    def _write_file(self, rel_path: str, text: str):
+        path = os.path.join(self._input_dir, rel_path)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'w') as fp:
+            fp.write(text)
+
+    def _ingest(self, **kwargs):
+        kwargs.setdefault('archive_root_path', self._dir_path)
+        kwargs.setdefault('checkpoint_path', self._checkpoint_path)
+        kwargs.setdefault('max_workers', 0)
+        return ingest(self._driver, self._input_dir, log=self._messages.append, **kwargs)
+
+    def _find_paths(self):
+        result = self._driver.find_datasets(DatasetQuery())
+        return sorted(ds_ref.path + '/' + ds_ref.filename for ds_ref in result.datasets)
+
+    def test_ingest(self):
+        self._write_file('a/cruise/ds1.txt', SB_FILE_TEXT.format(chl=2.47))
+        self._write_file('a/cruise/ds2.txt', SB_FILE_TEXT.format(chl=2.48))
+        self._write_file('b/ds3.txt', SB_FILE_TEXT.format(chl=2.49))
+        self._write_file('b/readme.txt', "no SeaBASS file")
+
+        stats = self._ingest(batch_size=2)
+
+        self.assertEqual(3, stats.file_count)
+        self.assertEqual(0, stats.skipped_count)
+        self.assertEqual(0, stats.failed_count)
+        self.assertEqual(6, stats.record_count)
+        self.assertEqual(['archive/a/cruise/ds1.txt', 'archive/a/cruise/ds2.txt', 'archive/b/ds3.txt'],
+                         self._find_paths())
+        self.assertEqual(3, self._driver.find_datasets(DatasetQuery(status='PUBLISHED')).total_count)
+        # one message per batch and the final one
+        self.assertEqual(2, len(self._messages))
+        self.assertIn('3 files (0 skipped, 0 failed), 6 records', self._messages[-1])
+        self.assertIn('files/s', self._messages[-1])
+        self.assertIn('records/s', self._messages[-1])
+        self.assertIn('MB/s', self._messages[-1])
+
+    def test_ingest_resumes_from_checkpoint(self):
+        self._write_file('ds1.txt', SB_FILE_TEXT.format(chl=2.47))
+        self._ingest()
+        with open(self._checkpoint_path) as fp:
+            self.assertEqual([os.path.join(self._input_dir, 'ds1.txt') + '\n'], fp.readlines())
+
+        self._write_file('ds2.txt', SB_FILE_TEXT.format(chl=2.48))
+        stats = self._ingest()
+
+        self.assertEqual(1, stats.file_count)
+        self.assertEqual(0, stats.skipped_count)
+        self.assertEqual(['archive/ds1.txt', 'archive/ds2.txt'], self._find_paths())
+
+    def test_ingest_skips_known_content(self):
+        self._write_file('ds1.txt', SB_FILE_TEXT.format(chl=2.47))
+        self._ingest(archive_root_path=None, checkpoint_path=None)
+
+        # a copy of the same content, and a copy within the same run
+        self._write_file('copy/ds1.txt', SB_FILE_TEXT.format(chl=2.47))
+        self._write_file('ds2.txt', SB_FILE_TEXT.format(chl=2.48))
+        self._write_file('ds3.txt', SB_FILE_TEXT.format(chl=2.48))
+        stats = self._ingest(archive_root_path=None, checkpoint_path=None)
+
+        self.assertEqual(4, stats.file_count)
+        self.assertEqual(3, stats.skipped_count)
+        self.assertEqual(['./ds1.txt', './ds2.txt'], self._find_paths())
+
+    def test_ingest_reports_failed_files(self):
+        self._write_file('ds1.txt', SB_FILE_TEXT.format(chl=2.47).replace('/fields', '/fieldz'))
+        self._write_file('ds2.txt', SB_FILE_TEXT.format(chl=2.48))
+
+        stats = self._ingest()
+
+        self.assertEqual(2, stats.file_count)
+        self.assertEqual(1, stats.failed_count)
+        self.assertEqual(['archive/ds2.txt'], self._find_paths())
+        self.assertTrue(self._messages[0].startswith('FAILED - ' + os.path.join(self._input_dir, 'ds1.txt')))
+        with open(self._checkpoint_path) as fp:
+            self.assertEqual([os.path.join(self._input_dir, 'ds2.txt') + '\n'], fp.readlines())
+
+    def test_ingest_only_searches_archive_dirs(self):
+        self._write_file('ds1.txt', SB_FILE_TEXT.format(chl=2.47))
+        documents_path = os.path.join(self._dir_path, 'documents')
+        os.makedirs(documents_path)
+        with open(os.path.join(documents_path, 'ds2.txt'), 'w') as fp:
+            fp.write(SB_FILE_TEXT.format(chl=2.48))
+
+        stats = ingest(self._driver, self._dir_path, checkpoint_path=None, max_workers=0,
+                       log=self._messages.append)
+
+        self.assertEqual(1, stats.file_count)
+        self.assertEqual(['archive/ds1.txt'], self._find_paths())
+
+    def test_ingest_ignores_undecodable_bytes(self):
+        path = os.path.join(self._input_dir, 'ds1.txt')
+        os.makedirs(self._input_dir)
+        text = SB_FILE_TEXT.format(chl=2.47).replace('/delimiter', '!comment\n/delimiter')
+        with open(path, 'wb') as fp:
+            fp.write(text.encode('utf-8').replace(b'comment', b'comm\xff\xfeent'))
+
+        stats = self._ingest()
+
+        self.assertEqual(1, stats.file_count)
+        self.assertEqual(0, stats.failed_count)
+        self.assertEqual(['archive/ds1.txt'], self._find_paths())
+
+    def test_ingest_in_process_pool(self):
+        self._write_file('ds1.txt', SB_FILE_TEXT.format(chl=2.47))
+        self._write_file('ds2.txt', SB_FILE_TEXT.format(chl=2.48))
+
+        stats = self._ingest(max_workers=1)
+
+        self.assertEqual(2, stats.file_count)
+        self.assertEqual(['archive/ds1.txt', 'archive/ds2.txt'], self._find_paths())
+
+    def test_ingest_missing_input_dir(self):
+        with self.assertRaises(IOError):
+            ingest(self._driver, os.path.join(self._dir_path, 'missing'), checkpoint_path=None)
+
+    def test_scan(self):
+        self._write_file('ds1.txt', SB_FILE_TEXT.format(chl=2.47))
+        self._write_file('ds2.txt', SB_FILE_TEXT.format(chl=2.48).replace('/fields', '/fieldz'))
+        self._write_file('readme.txt', "no SeaBASS file")
+
+        stats = scan(self._input_dir, log=self._messages.append)
+
+        self.assertEqual(2, stats.file_count)
+        self.assertEqual(1, stats.failed_count)
+        self.assertEqual(2, stats.record_count)
+        self.assertTrue(self._messages[0].startswith('FAILED - ' + os.path.join(self._input_dir, 'ds2.txt')))
+        # nothing is stored
+        self.assertEqual([], self._find_paths())
+
+    # noinspection PyMethodMayBeStatic
+    def test_cli(self):
+        try:
+            main(['--help'])
+        except SystemExit:
+            pass
@@ -0,0 +1,63 @@
+import unittest
+
+from datetime import datetime
+
+from ocdb.core.db.db_submission import DbSubmission
+from ocdb.db.migrate import main, migrate_envelopes, migrate_locations, migrate_products, migrate_records, \
+    migrate_submissions
+from ocdb.db.mongo_db_driver import MongoDbDriver
+from tests import helpers
+
+
+class MigrateTest(unittest.TestCase):
+
+    def setUp(self):
+        self._driver = MongoDbDriver()
+        self._driver.init(mock=True)
+
+    def tearDown(self):
+        self._driver.clear()
+        self._driver.close()
+
+    def test_migrate_records(self):
+        self._driver._records_format = 'pickle'
+        self._driver.add_dataset(helpers.new_test_db_dataset(1))
+        self._driver._records_format = 'columnar'
+
+        self.assertEqual("converted 1 datasets, 0 already in columnar format", migrate_records(self._driver, None))
+
+    def test_migrate_locations(self):
+        dataset = helpers.new_test_db_dataset(1)
+        dataset.add_geo_location(lon=-76.5, lat=40.0)
+        self._driver.add_dataset(dataset)
+        self._driver._collection.update_many({}, {'$unset': {'location': ''}})
+
+        self.assertEqual("added locations to 1 datasets, 0 datasets without valid positions",
+                         migrate_locations(self._driver, None))
+
+    def test_migrate_envelopes(self):
+        self._driver.add_dataset(helpers.new_test_db_dataset(1))
+        self._driver._collection.update_many({}, {'$unset': {'record_count': ''}})
+
+        self.assertEqual("added envelopes to 1 datasets", migrate_envelopes(self._driver, None))
+
+    def test_migrate_products(self):
+        self._driver.add_dataset(helpers.new_test_db_dataset(1))
+        self._driver._collection.update_many({}, {'$unset': {'products': ''}})
+
+        self.assertEqual("added products to 1 datasets", migrate_products(self._driver, None))
+
+    def test_migrate_submissions(self):
+        self._driver.add_submission(DbSubmission(submission_id="sub", date=datetime(2020, 1, 1), user_id="scott",
+                                                 status="SUBMITTED", qc_status="OK", path="amt", files=[],
+                                                 store_user_path="scott"))
+        self._driver._submit_collection.update_many({}, {'$unset': {'search_keys': ''}})
+
+        self.assertEqual("added search keys to 1 submissions", migrate_submissions(self._driver, None))
+
+    # noinspection PyMethodMayBeStatic
+    def test_cli(self):
+        try:
+            main(['--help'])
+        except SystemExit:
+            pass
@@ -1,10 +1,13 @@
 import unittest
+import unittest.mock
 from datetime import datetime
 
 from ocdb.core.db.db_submission import DbSubmission
 from ocdb.core.db.db_user import DbUser
 from ocdb.core.db.errors import OperationalError
 from ocdb.core.models.dataset_query import DatasetQuery
+from ocdb.core.models.dataset_validation_result import DatasetValidationResult
+from ocdb.core.models.issue import Issue
 from ocdb.core.models.qc_info import QC_STATUS_VALIDATED, \
     QC_STATUS_SUBMITTED, QC_STATUS_PUBLISHED, QC_STATUS_APPROVED
 from ocdb.core.models.submission_file import SubmissionFile
@@ -49,6 +52,113 @@ class TestMongoDbDriver(unittest.TestCase):
         self.assertAlmostEqual(109.8, result.records[0][0], 8)
         self.assertAlmostEqual(-38.3, result.records[1][1], 8)
 
+    def test_add_datasets(self):
+        datasets = [helpers.new_test_db_dataset(1), helpers.new_test_db_dataset(2), helpers.new_test_dataset(3)]
+        datasets[1].records = [[float(i), float(i + 1), float(i + 2)] for i in range(100000)]
+
+        ds_ids = self._driver.add_datasets(datasets, ["hash-1", "hash-2", "hash-3"])
+        self.assertEqual(3, len(ds_ids))
+
+        for ds_id, dataset in zip(ds_ids, datasets):
+            result = self._driver.get_dataset(ds_id)
+            self.assertIsNotNone(result)
+            self.assertEqual(dataset.filename, result.filename)
+            self.assertEqual(dataset.records, result.records)
+
+        self.assertEqual({"hash-1", "hash-2", "hash-3"}, self._driver.get_content_hashes())
+
+    def test_add_datasets_without_content_hashes(self):
+        self.assertEqual([], self._driver.add_datasets([]))
+
+        ds_ids = self._driver.add_datasets([helpers.new_test_db_dataset(1)])
+        self.assertEqual(1, len(ds_ids))
+        self.assertEqual("dataset-1.txt", self._driver.get_dataset(ds_ids[0]).filename)
+        self.assertEqual(set(), self._driver.get_content_hashes())
+
+        with self.assertRaises(ValueError):
+            self._driver.add_datasets([helpers.new_test_db_dataset(1)], ["hash-1", "hash-2"])
+
+    def test_add_datasets_in_chunks(self):
+        datasets = [helpers.new_test_db_dataset(n) for n in range(5)]
+
+        ds_ids = self._driver.add_datasets(datasets, chunk_size=2)
+        self.assertEqual(5, len(ds_ids))
+        self.assertEqual(["dataset-0.txt", "dataset-1.txt", "dataset-2.txt", "dataset-3.txt", "dataset-4.txt"],
+                         [self._driver.get_dataset(ds_id).filename for ds_id in ds_ids])
+
+    def test_add_datasets_rolled_back(self):
+        datasets = [helpers.new_test_db_dataset(n) for n in range(5)]
+        # fails while the third chunk is added
+        datasets[4].to_dict = None
+
+        with self.assertRaises(TypeError):
+            self._driver.add_datasets(datasets, chunk_size=2)
+
+        self.assertEqual(0, self._driver._collection.count_documents({}))
+        self.assertEqual(0, self._driver._fs_db.fs.files.count_documents({}))
+        self.assertEqual(0, self._driver._fs_db.fs.chunks.count_documents({}))
+
+    def test_get_records_in_both_formats(self):
+        # as written by former versions
+        self._driver._records_format = 'pickle'
+        pickle_ds_id = self._driver.add_dataset(helpers.new_test_db_dataset(1))
+        self._driver._records_format = 'columnar'
+        columnar_ds_id = self._driver.add_dataset(helpers.new_test_db_dataset(2))
+
+        self.assertEqual(helpers.new_test_db_dataset(1).records, self._driver.get_dataset(pickle_ds_id).records)
+        self.assertEqual(helpers.new_test_db_dataset(2).records, self._driver.get_dataset(columnar_ds_id).records)
+
+    def test_get_dataset_fields(self):
+        for records_format in ('columnar', 'pickle'):
+            self._driver._records_format = records_format
+            dataset = helpers.new_test_db_dataset(1)
+            dataset.attributes = ['lon', 'lat', 'Chl']
+            ds_id = self._driver.add_dataset(dataset)
+
+            result = self._driver.get_dataset(ds_id, fields=['CHL', 'lon', 'sst'])
+            self.assertEqual(['lon', 'chl'], result.attributes)
+            self.assertEqual([[2.2, 4.4], [5.5, 7.7]], result.records)
+            self.assertEqual(dataset.metadata, result.metadata)
+
+            result = self._driver.get_dataset(ds_id, fields=['sst'])
+            self.assertEqual([], result.attributes)
+            self.assertEqual([], result.records)
+
+            result = self._driver.get_dataset(ds_id)
+            self.assertEqual(['lon', 'lat', 'chl'], result.attributes)
+            self.assertEqual(dataset.records, result.records)
+
+    def test_get_dataset_fields_duplicate_attributes(self):
+        dataset = helpers.new_test_db_dataset(1)
+        dataset.attributes = ['lon', 'chl', 'chl']
+        ds_id = self._driver.add_dataset(dataset)
+
+        result = self._driver.get_dataset(ds_id, fields=['chl'])
+        self.assertEqual(['chl', 'chl'], result.attributes)
+        self.assertEqual([[3.3, 4.4], [6.6, 7.7]], result.records)
+
+    def test_migrate_records(self):
+        self._driver._records_format = 'pickle'
+        pickle_ds_ids = [self._driver.add_dataset(helpers.new_test_db_dataset(n)) for n in range(3)]
+        self._driver._records_format = 'columnar'
+        columnar_ds_id = self._driver.add_dataset(helpers.new_test_db_dataset(3))
+
+        messages = []
+        self.assertEqual((3, 1), self._driver.migrate_records(log=messages.append))
+        self.assertEqual(3, len(messages))
+        for n, ds_id in enumerate(pickle_ds_ids):
+            self.assertEqual(helpers.new_test_db_dataset(n).records, self._driver.get_dataset(ds_id).records)
+        self.assertEqual(helpers.new_test_db_dataset(3).records, self._driver.get_dataset(columnar_ds_id).records)
+
+        self.assertEqual((0, 4), self._driver.migrate_records())
+
+    def test_records_config(self):
+        driver = MongoDbDriver()
+        with self.assertRaises(ValueError):
+            driver.init(mock=True, records_format='xml')
+        with self.assertRaises(ValueError):
+            driver.init(mock=True, records_compression='gzip')
+
     def test_get_invalid_id(self):
         dataset = helpers.new_test_dataset(2)
 
@@ -333,6 +443,19 @@ class TestMongoDbDriver(unittest.TestCase):
         self.assertEqual("archive", result.datasets[0].path)
         self.assertEqual("dataset-3.txt", result.datasets[0].filename)
 
+    def test_negative_count_page_not_in_facet(self):
+        self._add_test_datasets_to_db()
+
+        collection = self._driver._collection
+        with unittest.mock.patch.object(collection, 'aggregate', wraps=collection.aggregate) as aggregate:
+            result = self._driver.find_datasets(DatasetQuery(offset=4, count=-1))
+
+        # an unlimited page could exceed the maximum document size as a $facet result
+        facets = aggregate.call_args[0][0][1]['$facet']
+        self.assertEqual(['total'], list(facets.keys()))
+        self.assertEqual(7, len(result.datasets))
+        self.assertEqual("dataset-3.txt", result.datasets[0].filename)
+
     def test_insert_two_and_get_by_location(self):
         dataset = helpers.new_test_db_dataset(11)
         dataset.add_geo_location(lon=-76.3461, lat=39.0652)
@@ -350,6 +473,107 @@ class TestMongoDbDriver(unittest.TestCase):
         self.assertEqual("archive", result.datasets[0].path)
         self.assertEqual("dataset-12.txt", result.datasets[0].filename)
 
+    def test_get_by_location_matches_positions(self):
+        # longitude of the first, latitude of the second position would be in the region
+        dataset = helpers.new_test_db_dataset(11)
+        dataset.add_geo_location(lon=-76.5, lat=40.0)
+        dataset.add_geo_location(lon=-70.0, lat=38.5)
+        self._driver.add_dataset(dataset)
+
+        result = self._driver.find_datasets(DatasetQuery(region=[-77.0, 38.0, -76.0, 38.9]))
+        self.assertEqual(0, result.total_count)
+
+        result = self._driver.find_datasets(DatasetQuery(region=[-71.0, 38.0, -69.0, 38.9]))
+        self.assertEqual(1, result.total_count)
+
+    def test_add_dataset_location(self):
+        dataset = helpers.new_test_db_dataset(11)
+        dataset.add_geo_location(lon=-76.5, lat=40.0)
+        dataset.add_geo_location(lon=-999, lat=-999)
+        dataset.add_geo_location(lon=-70.0, lat=38.5)
+        dataset.add_geo_location(lon=-76.5, lat=40.0)
+        dataset.add_geo_location(lon=float('nan'), lat=38.5)
+        ds_id = self._driver.add_dataset(dataset)
+        dataset_without_location = helpers.new_test_db_dataset(12)
+        self._driver.add_datasets([dataset_without_location])
+
+        dataset_dict = self._driver._collection.find_one({'filename': 'dataset-11.txt'})
+        self.assertEqual({'type': 'MultiPoint', 'coordinates': [[-76.5, 40.0], [-70.0, 38.5]]},
+                         dataset_dict['location'])
+        self.assertEqual([-76.5, 38.5, -70.0, 40.0], dataset_dict['bbox'])
+        dataset_dict = self._driver._collection.find_one({'filename': 'dataset-12.txt'})
+        self.assertNotIn('location', dataset_dict)
+        self.assertNotIn('bbox', dataset_dict)
+
+        result = self._driver.get_dataset(ds_id)
+        self.assertEqual(5, len(result.longitudes))
+
+    def test_migrate_locations(self):
+        dataset = helpers.new_test_db_dataset(11)
+        dataset.add_geo_location(lon=-76.5, lat=40.0)
+        self._driver.add_dataset(dataset)
+        self._driver.add_dataset(helpers.new_test_db_dataset(12))
+        # as stored by former versions
+        self._driver._collection.update_many({}, {'$unset': {'location': '', 'bbox': ''}})
+
+        self.assertEqual((1, 1), self._driver.migrate_locations())
+
+        dataset_dict = self._driver._collection.find_one({'filename': 'dataset-11.txt'})
+        self.assertEqual({'type': 'MultiPoint', 'coordinates': [[-76.5, 40.0]]}, dataset_dict['location'])
+        self.assertEqual([-76.5, 40.0, -76.5, 40.0], dataset_dict['bbox'])
+        result = self._driver.find_datasets(DatasetQuery(region=[-77.0, 39.0, -76.0, 41.0]))
+        self.assertEqual(1, result.total_count)
+
+        self.assertEqual((0, 1), self._driver.migrate_locations())
+
+    def test_add_dataset_envelope(self):
+        dataset = helpers.new_test_db_dataset(11)
+        dataset.add_geo_location(lon=-76.5, lat=40.0)
+        dataset.add_geo_location(lon=-70.0, lat=38.5)
+        dataset.add_time(datetime(2016, 5, 2, 10, 0, 0))
+        dataset.add_time(datetime(2016, 5, 1, 10, 0, 0))
+        self._driver.add_dataset(dataset)
+        self._driver.add_datasets([helpers.new_test_db_dataset(12)])
+
+        dataset_dict = self._driver._collection.find_one({'filename': 'dataset-11.txt'})
+        self.assertEqual(datetime(2016, 5, 1, 10, 0, 0), dataset_dict['time_min'])
+        self.assertEqual(datetime(2016, 5, 2, 10, 0, 0), dataset_dict['time_max'])
+        self.assertEqual(2, dataset_dict['record_count'])
+        self.assertEqual(['dqy', 'dr1'], dataset_dict['geohashes'])
+        dataset_dict = self._driver._collection.find_one({'filename': 'dataset-12.txt'})
+        self.assertNotIn('time_min', dataset_dict)
+        self.assertEqual([], dataset_dict['geohashes'])
+
+        result = self._driver.find_datasets(DatasetQuery(time=['2016-05-02T00:00:00', None]))
+        self.assertEqual(1, result.total_count)
+        result = self._driver.find_datasets(DatasetQuery(time=['2016-05-03T00:00:00', None]))
+        self.assertEqual(0, result.total_count)
+        result = self._driver.find_datasets(DatasetQuery(region=[-71.0, 38.0, -69.0, 38.9]))
+        self.assertEqual(1, result.total_count)
+        self.assertEqual(2, len(self._driver.get_dataset(result.datasets[0].id).times))
+
+    def test_migrate_envelopes(self):
+        dataset = helpers.new_test_db_dataset(11)
+        dataset.add_geo_location(lon=-76.5, lat=40.0)
+        dataset.add_time(datetime(2016, 5, 1, 10, 0, 0))
+        self._driver.add_dataset(dataset)
+        self._driver._records_format = 'pickle'
+        self._driver.add_dataset(helpers.new_test_db_dataset(12))
+        # as stored by former versions
+        self._driver._collection.update_many({}, {'$unset': {'time_min': '', 'time_max': '',
+                                                             'record_count': '', 'geohashes': ''}})
+
+        self.assertEqual(2, self._driver.migrate_envelopes())
+
+        dataset_dict = self._driver._collection.find_one({'filename': 'dataset-11.txt'})
+        self.assertEqual(datetime(2016, 5, 1, 10, 0, 0), dataset_dict['time_min'])
+        self.assertEqual(2, dataset_dict['record_count'])
+        self.assertEqual(['dr1'], dataset_dict['geohashes'])
+        dataset_dict = self._driver._collection.find_one({'filename': 'dataset-12.txt'})
+        self.assertEqual(2, dataset_dict['record_count'])
+
+        self.assertEqual(0, self._driver.migrate_envelopes())
+
     def test_insert_two_and_get_by_location_many_records(self):
         dataset = helpers.new_test_db_dataset(13)
         dataset.add_geo_location(lon=-69.8150, lat=42.7250)
@@ -719,6 +943,41 @@ class TestMongoDbDriver(unittest.TestCase):
         self.assertEqual("archive", result.datasets[1].path)
         self.assertEqual("dataset-23.txt", result.datasets[1].filename)
 
+    def test_insert_two_and_get_by_product_name_wavelength_stripped(self):
+        dataset = helpers.new_test_db_dataset(22)
+        dataset.attributes = ["Rrs_412", "Rrs_443", "Chl_c1"]
+        self._driver.add_dataset(dataset)
+
+        dataset = helpers.new_test_db_dataset(23)
+        dataset.attributes = ["abs_ag676", "Chl_c2"]
+        self._driver.add_dataset(dataset)
+
+        dataset_dict = self._driver._collection.find_one({'filename': 'dataset-22.txt'})
+        self.assertEqual(['chl_c', 'chl_c1', 'rrs', 'rrs_412', 'rrs_443'], dataset_dict['products'])
+
+        result = self._driver.find_datasets(DatasetQuery(pname=["rrs"]))
+        self.assertEqual(1, result.total_count)
+        result = self._driver.find_datasets(DatasetQuery(pname=["chl_c"]))
+        self.assertEqual(2, result.total_count)
+        result = self._driver.find_datasets(DatasetQuery(pname=["chl_c1"]))
+        self.assertEqual(1, result.total_count)
+        result = self._driver.find_datasets(DatasetQuery(pname=["abs*"]))
+        self.assertEqual(1, result.total_count)
+        self.assertEqual("dataset-23.txt", result.datasets[0].filename)
+
+    def test_migrate_products(self):
+        dataset = helpers.new_test_db_dataset(11)
+        dataset.attributes = ["Rrs_412"]
+        self._driver.add_dataset(dataset)
+        # as stored by former versions
+        self._driver._collection.update_many({}, {'$unset': {'products': ''}})
+
+        self.assertEqual(1, self._driver.migrate_products())
+
+        dataset_dict = self._driver._collection.find_one({'filename': 'dataset-11.txt'})
+        self.assertEqual(['rrs', 'rrs_412'], dataset_dict['products'])
+        self.assertEqual(0, self._driver.migrate_products())
+
     def test_insert_two_and_get_by_measurement_type_all(self):
         dataset = helpers.new_test_db_dataset(40)
         dataset.metadata['data_type'] = 'cast'
@@ -762,6 +1021,51 @@ class TestMongoDbDriver(unittest.TestCase):
         result = self._driver.get_dataset(ds_id)
         self.assertEqual("a_thing_we_added", result.metadata["the_new"])
 
+    def test_update_dataset_metadata(self):
+        ds_id = self._driver.add_dataset(helpers.new_test_db_dataset(45))
+        grid_fs_id = self._driver._collection.find_one({'filename': 'dataset-45.txt'})['grid_fs_id']
+
+        success = self._driver.update_dataset_metadata(ds_id, {'metadata.qc_info': {'status': 'VALIDATED'},
+                                                               'status': 'VALIDATED'})
+        self.assertTrue(success)
+
+        # the record blob is kept
+        self.assertEqual(grid_fs_id, self._driver._collection.find_one({'filename': 'dataset-45.txt'})['grid_fs_id'])
+        result = self._driver.get_dataset(ds_id)
+        self.assertEqual({'status': 'VALIDATED'}, result.metadata['qc_info'])
+        self.assertEqual('VALIDATED', result.status)
+        self.assertEqual(helpers.new_test_db_dataset(45).records, result.records)
+
+        self.assertTrue(self._driver.update_dataset_metadata(ds_id, {}))
+        self.assertFalse(self._driver.update_dataset_metadata('5c5ab0d0d6aa0cbe2e5bf9b5', {'status': 'VALIDATED'}))
+        self.assertFalse(self._driver.update_dataset_metadata('nasenmann', {'status': 'VALIDATED'}))
+        with self.assertRaises(ValueError):
+            self._driver.update_dataset_metadata(ds_id, {'times': []})
+        with self.assertRaises(ValueError):
+            self._driver.update_dataset_metadata(ds_id, {'location.coordinates': []})
+
+    def test_delete_datasets_by_submission(self):
+        datasets = [helpers.new_test_db_dataset(n) for n in range(5)]
+        for dataset in datasets[:4]:
+            dataset.submission_id = 'sub-1'
+        datasets[4].submission_id = 'sub-2'
+        ds_ids = self._driver.add_datasets(datasets)
+
+        self.assertEqual(2, self._driver.delete_datasets_by_submission('sub-1', exclude_dataset_ids=ds_ids[2:4]))
+        self.assertIsNone(self._driver.get_dataset(ds_ids[0]))
+        self.assertIsNone(self._driver.get_dataset(ds_ids[1]))
+        self.assertIsNotNone(self._driver.get_dataset(ds_ids[2]))
+        self.assertEqual(3, self._driver._fs_db.fs.files.count_documents({}))
+
+        self.assertEqual(2, self._driver.delete_datasets_by_submission('sub-1'))
+        self.assertEqual(0, self._driver.delete_datasets_by_submission('sub-1'))
+        self.assertEqual(ds_ids[4], self._driver.get_dataset(ds_ids[4]).id)
+
+        # the blobs of the deleted datasets are gone, those of the remaining dataset are kept
+        grid_fs_id = self._driver._collection.find_one({'submission_id': 'sub-2'})['grid_fs_id']
+        self.assertEqual(1, self._driver._fs_db.fs.files.count_documents({}))
+        self.assertEqual(0, self._driver._fs_db.fs.chunks.count_documents({'files_id': {'$ne': grid_fs_id}}))
+
     def test_get_get_start_index_and_page_size(self):
         query = DatasetQuery()
         query.offset = 1
@@ -1002,6 +1306,114 @@ class TestMongoDbDriver(unittest.TestCase):
         self.assertEqual(0, len(result_sub.files))
         self.assertEqual(0, len(result_sub.file_refs))
 
+    def test_get_submissions_after_submission(self):
+        # two submissions of each status, the ties are broken by _id
+        for n, status in enumerate([QC_STATUS_SUBMITTED, QC_STATUS_VALIDATED, QC_STATUS_SUBMITTED,
+                                    QC_STATUS_PUBLISHED, QC_STATUS_VALIDATED, QC_STATUS_PUBLISHED]):
+            files = [SubmissionFile(index=0, submission_id=f"sub-{n}", filename="file.txt", filetype="MEASUREMENT",
+                                    status=status, result=DatasetValidationResult("OK", []))]
+            self._driver.add_submission(DbSubmission(submission_id=f"sub-{n}", date=datetime(2020, 1, n + 1),
+                                                     user_id='scott', status=status, qc_status="OK", path="a/b",
+                                                     files=files, store_user_path='scott'))
+
+        for sort_order, expected_ids in [("asc", ["sub-3", "sub-5", "sub-0", "sub-2", "sub-1", "sub-4"]),
+                                         ("desc", ["sub-4", "sub-1", "sub-2", "sub-0", "sub-5", "sub-3"])]:
+            pages = []
+            after_submission_id = None
+            while True:
+                result, tot_count = self._driver.get_submissions(count=4, sort_column="status", sort_order=sort_order,
+                                                                 after_submission_id=after_submission_id)
+                self.assertEqual(6, tot_count)
+                if not result:
+                    break
+                pages.append([submission.submission_id for submission in result])
+                after_submission_id = result[-1].submission_id
+            self.assertEqual([expected_ids[:4], expected_ids[4:]], pages)
+
+        result, tot_count = self._driver.get_submissions(count=2, after_submission_id="sub-3", query_column="status",
+                                                         query_value=QC_STATUS_VALIDATED, query_operator="is")
+        self.assertEqual(2, tot_count)
+        self.assertEqual(["sub-4"], [submission.submission_id for submission in result])
+
+        result, tot_count = self._driver.get_submissions(count=2, after_submission_id="nasenmann")
+        self.assertEqual(([], 6), (result, tot_count))
+
+        # the validation results only count the issues
+        result, _ = self._driver.get_submissions(offset=0, count=1)
+        self.assertEqual("sub-0", result[0].submission_id)
+        self.assertEqual({'status': 'OK', 'issue_counts': {'ERROR': 0, 'WARNING': 0}}, result[0].files[0].result)
+
+    def test_get_submissions_after_submission_without_sort_value(self):
+        for n, publication_date in enumerate([datetime(2020, 1, 2), None, datetime(2020, 1, 1), None]):
+            self._driver.add_submission(DbSubmission(submission_id=f"sub-{n}", date=datetime(2020, 1, 1),
+                                                     user_id='scott', status=QC_STATUS_SUBMITTED, qc_status="OK",
+                                                     path="a/b", files=[], store_user_path='scott',
+                                                     publication_date=publication_date))
+
+        for sort_order, expected_ids in [("asc", ["sub-1", "sub-3", "sub-2", "sub-0"]),
+                                         ("desc", ["sub-0", "sub-2", "sub-3", "sub-1"])]:
+            submission_ids = []
+            for after_submission_id in [None] + expected_ids[:-1]:
+                result, _ = self._driver.get_submissions(count=1, sort_column="publication_date",
+                                                         sort_order=sort_order,
+                                                         after_submission_id=after_submission_id)
+                submission_ids.extend(submission.submission_id for submission in result)
+            self.assertEqual(expected_ids, submission_ids)
+
+    def test_get_submissions_filtered_case_insensitively(self):
+        for submission_id, user_id, path in [("Cruise-A", "Scott", "AMT/2019/cast"),
+                                             ("cruise-b", "tiger", "amt/2020/Cast"),
+                                             ("CAST-C", "scottie", "other/cruise")]:
+            self._driver.add_submission(DbSubmission(submission_id=submission_id, date=datetime(2020, 1, 1),
+                                                     user_id=user_id, status=QC_STATUS_SUBMITTED, qc_status="OK",
+                                                     path=path, files=[], store_user_path=user_id))
+
+        def get_submission_ids(**kwargs):
+            result, tot_count = self._driver.get_submissions(**kwargs)
+            self.assertEqual(tot_count, len(result))
+            return sorted(submission.submission_id for submission in result)
+
+        self.assertEqual(["Cruise-A", "cruise-b"],
+                         get_submission_ids(query_column="submission_id", query_value="CRUISE",
+                                            query_operator="startsWith"))
+        self.assertEqual(["Cruise-A", "cruise-b"],
+                         get_submission_ids(query_column="path", query_value="cAsT", query_operator="contains"))
+        self.assertEqual(["CAST-C", "Cruise-A"],
+                         get_submission_ids(query_column="user_id", query_value="scot", query_operator="contains"))
+        self.assertEqual(["Cruise-A"],
+                         get_submission_ids(query_column="user_id", query_value="ott", query_operator="endsWith"))
+        self.assertEqual(["CAST-C"],
+                         get_submission_ids(query_column="path", query_value="Uise", query_operator="endsWith"))
+        # shorter than a trigram
+        self.assertEqual(["CAST-C", "Cruise-A"],
+                         get_submission_ids(query_column="user_id", query_value="Sc", query_operator="contains"))
+        # all trigrams match, but not in this order
+        self.assertEqual([], get_submission_ids(query_column="submission_id", query_value="uisecr",
+                                                query_operator="contains"))
+        # the values are literal
+        self.assertEqual([], get_submission_ids(query_column="path", query_value=".*", query_operator="contains"))
+
+        result, _ = self._driver.get_submissions(sort_column="submission_id", sort_order="asc")
+        self.assertEqual(["CAST-C", "Cruise-A", "cruise-b"], [submission.submission_id for submission in result])
+        result, _ = self._driver.get_submissions(count=1, sort_column="submission_id", sort_order="asc",
+                                                 after_submission_id="Cruise-A")
+        self.assertEqual(["cruise-b"], [submission.submission_id for submission in result])
+
+    def test_migrate_submission_search_keys(self):
+        self._driver.add_submission(DbSubmission(submission_id="Cruise-A", date=datetime(2020, 1, 1), user_id="Scott",
+                                                 status=QC_STATUS_SUBMITTED, qc_status="OK", path="AMT", files=[],
+                                                 store_user_path="Scott"))
+        self._driver._submit_collection.update_many({}, {'$unset': {'search_keys': '', 'search_ngrams': ''}})
+
+        self.assertEqual(1, self._driver.migrate_submission_search_keys())
+        self.assertEqual(0, self._driver.migrate_submission_search_keys())
+
+        submission_dict = self._driver._submit_collection.find_one({})
+        self.assertEqual({'submission_id': 'cruise-a', 'user_id': 'scott', 'path': 'amt'},
+                         submission_dict['search_keys'])
+        self.assertIn('submission_id:ise', submission_dict['search_ngrams'])
+        self.assertEqual("Cruise-A", self._driver.get_submission("Cruise-A").submission_id)
+
     def test_add_submission_and_get_file(self):
         date = datetime(2017, 3, 22, 11, 14, 33)
         submission_id = "her_we_go"
@@ -1030,6 +1442,43 @@ class TestMongoDbDriver(unittest.TestCase):
         self.assertEqual(1, result.index)
         self.assertEqual("Number two", result.filename)
 
+    def test_add_submission_and_get_file_by_filename(self):
+        submission_id = "her_we_go"
+        sf_0 = SubmissionFile(index=0, submission_id=submission_id, filename="Number one", filetype="yepp",
+                              status=QC_STATUS_SUBMITTED, result=None)
+        sf_1 = SubmissionFile(index=1, submission_id=submission_id, filename="Number two", filetype="sure",
+                              status=QC_STATUS_VALIDATED, result=None)
+        sf = DbSubmission(submission_id=submission_id, date=datetime(2017, 3, 22, 11, 14, 33), user_id='5876123',
+                          status=QC_STATUS_SUBMITTED, qc_status="OK", path="/some/where/", files=[sf_0, sf_1],
+                          store_user_path='Tom_Helge')
+        self._driver.add_submission(sf)
+
+        result = self._driver.get_submission_file_by_filename(submission_id=submission_id, file_name="Number two")
+        self.assertIsNotNone(result)
+        self.assertEqual(1, result.index)
+        self.assertEqual("Number two", result.filename)
+        self.assertEqual(QC_STATUS_VALIDATED, result.status)
+
+        result = self._driver.get_submission_file_by_filename(submission_id=submission_id, file_name="Number three")
+        self.assertIsNone(result)
+
+    def test_get_submission_without_files(self):
+        submission_id = "her_we_go"
+        sf_0 = SubmissionFile(index=0, submission_id=submission_id, filename="Number one", filetype="yepp",
+                              status=QC_STATUS_SUBMITTED, result=None)
+        sf = DbSubmission(submission_id=submission_id, date=datetime(2017, 3, 22, 11, 14, 33), user_id='5876123',
+                          status=QC_STATUS_SUBMITTED, qc_status="OK", path="/some/where/", files=[sf_0],
+                          store_user_path='Tom_Helge')
+        self._driver.add_submission(sf)
+
+        result = self._driver.get_submission(submission_id, include_files=False)
+        self.assertEqual(submission_id, result.submission_id)
+        self.assertEqual('5876123', result.user_id)
+        self.assertEqual([], result.files)
+
+        result = self._driver.get_submission(submission_id)
+        self.assertEqual(1, len(result.files))
+
     def test_add_submission_and_get_file_invalid_index(self):
         date = datetime(2017, 3, 22, 11, 14, 33)
         submission_id = "her_we_go"
@@ -1104,6 +1553,121 @@ class TestMongoDbDriver(unittest.TestCase):
         self.assertEqual(QC_STATUS_APPROVED, submission.status)
         self.assertEqual(QC_STATUS_VALIDATED, submission.qc_status)
 
+    def test_update_submission_fields(self):
+        self._driver.add_submission(DbSubmission(submission_id="dunno_", date=datetime(2019, 2, 22), user_id='scott',
+                                                 status=QC_STATUS_SUBMITTED, qc_status="OK", path="a/b/c",
+                                                 files=[], store_user_path='scott_dunno_'))
+
+        self.assertTrue(self._driver.set_submission_status("dunno_", QC_STATUS_APPROVED))
+        self.assertTrue(self._driver.set_submission_status("dunno_", QC_STATUS_APPROVED,
+                                                           publication_date=datetime(2020, 1, 1)))
+        submission = self._driver.get_submission("dunno_")
+        self.assertEqual(QC_STATUS_APPROVED, submission.status)
+        self.assertEqual(datetime(2020, 1, 1), submission.publication_date)
+
+        self.assertTrue(self._driver.update_submission_fields("dunno_", {'submission_id': "Renamed", 'path': "d/e/f"}))
+        self.assertIsNone(self._driver.get_submission("dunno_"))
+        self.assertEqual("d/e/f", self._driver.get_submission("Renamed").path)
+        result, _ = self._driver.get_submissions(query_column="submission_id", query_value="renamed",
+                                                 query_operator="contains")
+        self.assertEqual(1, len(result))
+
+        self.assertFalse(self._driver.set_submission_status("dunno_", QC_STATUS_APPROVED))
+        self.assertFalse(self._driver.update_submission_fields("dunno_", {'path': "g/h/i"}))
+        with self.assertRaises(ValueError):
+            self._driver.update_submission_fields("Renamed", {'files': []})
+
+    def test_update_submission_files(self):
+        def new_file(index: int) -> SubmissionFile:
+            return SubmissionFile(index=index, submission_id="dunno_", filename=f"file-{index}.txt",
+                                  filetype="MEASUREMENT", status=QC_STATUS_SUBMITTED,
+                                  result=DatasetValidationResult("OK", []))
+
+        self._driver.add_submission(DbSubmission(submission_id="dunno_", date=datetime(2019, 2, 22), user_id='scott',
+                                                 status=QC_STATUS_SUBMITTED, qc_status="OK", path="a/b/c",
+                                                 files=[new_file(0), new_file(1)], store_user_path='scott_dunno_'))
+
+        self.assertTrue(self._driver.set_submission_file_status("dunno_", 1, QC_STATUS_VALIDATED))
+        self.assertTrue(self._driver.push_submission_file("dunno_", new_file(2), status=QC_STATUS_VALIDATED))
+        replacement = new_file(0)
+        replacement.filename = "other.txt"
+        self.assertTrue(self._driver.set_submission_file("dunno_", 0, replacement))
+
+        submission = self._driver.get_submission("dunno_")
+        self.assertEqual(QC_STATUS_VALIDATED, submission.status)
+        self.assertEqual(["other.txt", "file-1.txt", "file-2.txt"], [file.filename for file in submission.files])
+        self.assertEqual([QC_STATUS_SUBMITTED, QC_STATUS_VALIDATED, QC_STATUS_SUBMITTED],
+                         [file.status for file in submission.files])
+        self.assertEqual("OK", submission.files[2].result["status"])
+
+        self.assertTrue(self._driver.pull_submission_file("dunno_", 1))
+        submission = self._driver.get_submission("dunno_")
+        self.assertEqual([(0, "other.txt"), (1, "file-2.txt")],
+                         [(file.index, file.filename) for file in submission.files])
+
+        self.assertFalse(self._driver.set_submission_file_status("dunno_", 2, QC_STATUS_VALIDATED))
+        self.assertFalse(self._driver.set_submission_file("dunno_", -1, replacement))
+        self.assertFalse(self._driver.pull_submission_file("dunno_", 2))
+        self.assertFalse(self._driver.push_submission_file("nasenmann", new_file(0)))
+
+    def test_submission_file_issues(self):
+        def new_file(index: int, issue_count: int) -> SubmissionFile:
+            issues = [Issue("ERROR" if n % 2 else "WARNING", f"issue {index}-{n}") for n in range(issue_count)]
+            return SubmissionFile(index=index, submission_id="dunno_", filename=f"file-{index}.txt",
+                                  filetype="MEASUREMENT", status=QC_STATUS_SUBMITTED,
+                                  result=DatasetValidationResult("ERROR" if issue_count else "OK", issues))
+
+        self._driver.add_submission(DbSubmission(submission_id="dunno_", date=datetime(2019, 2, 22), user_id='scott',
+                                                 status=QC_STATUS_SUBMITTED, qc_status="OK", path="a/b/c",
+                                                 files=[new_file(0, 5), new_file(1, 3)], store_user_path='scott'))
+
+        # the submission only counts the issues
+        submission_dict = self._driver._submit_collection.find_one({})
+        self.assertEqual({'status': 'ERROR', 'issue_counts': {'ERROR': 2, 'WARNING': 3}},
+                         submission_dict['files'][0]['result'])
+        result, _ = self._driver.get_submissions()
+        self.assertEqual({'ERROR': 1, 'WARNING': 2}, result[0].files[1].issue_counts)
+
+        issues, tot_count = self._driver.get_submission_file_issues("dunno_", 0, offset=1, count=3)
+        self.assertEqual(5, tot_count)
+        self.assertEqual(["issue 0-1", "issue 0-2", "issue 0-3"], [issue.description for issue in issues])
+        self.assertEqual(["ERROR", "WARNING", "ERROR"], [issue.type for issue in issues])
+
+        self.assertTrue(self._driver.push_submission_file("dunno_", new_file(2, 2)))
+        self.assertTrue(self._driver.set_submission_file("dunno_", 0, new_file(0, 1)))
+        self.assertEqual(1, self._driver.get_submission_file_issues("dunno_", 0)[1])
+
+        # the issues of the following files are renumbered along with the files
+        self.assertTrue(self._driver.pull_submission_file("dunno_", 1))
+        issues, tot_count = self._driver.get_submission_file_issues("dunno_", 1)
+        self.assertEqual(2, tot_count)
+        self.assertEqual(["issue 2-0", "issue 2-1"], [issue.description for issue in issues])
+        self.assertEqual(([], 0), self._driver.get_submission_file_issues("dunno_", 2))
+
+        self.assertTrue(self._driver.update_submission_fields("dunno_", {'submission_id': "renamed"}))
+        self.assertEqual(2, self._driver.get_submission_file_issues("renamed", 1)[1])
+
+        self.assertTrue(self._driver.delete_submission("renamed"))
+        self.assertEqual(0, self._driver._issues_collection.count_documents({}))
+
+    def test_migrate_submission_issues(self):
+        self._driver._submit_collection.insert_one({
+            'submission_id': "dunno_",
+            'files': [{'index': 0, 'result': {'status': 'WARNING',
+                                              'issues': [{'type': 'WARNING', 'description': 'a'},
+                                                         {'type': 'WARNING', 'description': 'b'}]}},
+                      {'index': 1, 'result': None}]})
+
+        self.assertEqual(1, self._driver.migrate_submission_issues())
+        self.assertEqual(0, self._driver.migrate_submission_issues())
+
+        submission_dict = self._driver._submit_collection.find_one({})
+        self.assertEqual({'status': 'WARNING', 'issue_counts': {'ERROR': 0, 'WARNING': 2}},
+                         submission_dict['files'][0]['result'])
+        issues, tot_count = self._driver.get_submission_file_issues("dunno_", 0)
+        self.assertEqual(2, tot_count)
+        self.assertEqual(["a", "b"], [issue.description for issue in issues])
+
     def test_insert_submission_and_delete(self):
         # insert
         submission_id = "dunno_"
@@ -22,24 +22,49 @@ class TestMongoQueryConverter(unittest.TestCase):
     def test_to_dict_region(self):
         query = DatasetQuery(region=[11, -18, 12, -17.4])
         mongo_dict = self.converter.to_dict(query)
-        self.assertEqual({'latitudes': {'$gte': -18, '$lte': -17.4},
-                          'longitudes': {'$gte': 11, '$lte': 12}}, mongo_dict)
+        self.assertEqual({'geohashes': {'$in': ['khz', 'kkb']},
+                          'location': {'$geoIntersects': {'$geometry': {
+            'type': 'Polygon',
+            'coordinates': [[[11.0, -18], [12.0, -18], [12.0, -17.4], [11.0, -17.4], [11, -18]]],
+            'crs': {'type': 'name', 'properties': {'name': 'urn:x-mongodb:crs:strictwinding:EPSG:4326'}}
+        }}}}, mongo_dict)
+
+    def test_to_dict_region_large(self):
+        query = DatasetQuery(region=[-180, -90, 180, 90])
+        mongo_dict = self.converter.to_dict(query)
+        # too many geohash cells
+        self.assertNotIn('geohashes', mongo_dict)
+        ring = mongo_dict['location']['$geoIntersects']['$geometry']['coordinates'][0]
+        # the parallels are approximated in steps of one degree
+        self.assertEqual(2 * 361 + 1, len(ring))
+        self.assertEqual([-180.0, -90], ring[0])
+        self.assertEqual([-179.0, -90], ring[1])
+        self.assertEqual([180.0, 90], ring[361])
+        self.assertEqual(ring[0], ring[-1])
+
+    def test_to_dict_region_without_geo_index(self):
+        converter = MongoDbDriver.QueryConverter(geo_index=False)
+        query = DatasetQuery(region=[11, -18, 12, -17.4])
+        mongo_dict = converter.to_dict(query)
+        self.assertEqual({'geohashes': {'$in': ['khz', 'kkb']},
+                          'location.coordinates': {'$elemMatch': {'0': {'$gte': 11, '$lte': 12},
+                                                                  '1': {'$gte': -18, '$lte': -17.4}}}}, mongo_dict)
 
     def test_to_dict_times_start_to_stop(self):
         query = DatasetQuery(time=["2016-01-01T00:00:00", "2016-01-01T04:00:00"])
         mongo_dict = self.converter.to_dict(query)
-        self.assertEqual({'times': {'$gte': datetime.datetime(2016, 1, 1, 0, 0),
-                                    '$lte': datetime.datetime(2016, 1, 1, 4, 0)}}, mongo_dict)
+        self.assertEqual({'time_max': {'$gte': datetime.datetime(2016, 1, 1, 0, 0)},
+                          'time_min': {'$lte': datetime.datetime(2016, 1, 1, 4, 0)}}, mongo_dict)
 
     def test_to_dict_times_no_start(self):
         query = DatasetQuery(time=[None, "2016-01-01T04:00:00"])
         mongo_dict = self.converter.to_dict(query)
-        self.assertEqual({'times': {'$lte': datetime.datetime(2016, 1, 1, 4, 0)}}, mongo_dict)
+        self.assertEqual({'time_min': {'$lte': datetime.datetime(2016, 1, 1, 4, 0)}}, mongo_dict)
 
     def test_to_dict_times_no_stop(self):
         query = DatasetQuery(time=["2016-01-01T00:00:00", None])
         mongo_dict = self.converter.to_dict(query)
-        self.assertEqual({'times': {'$gte': datetime.datetime(2016, 1, 1, 0, 0)}}, mongo_dict)
+        self.assertEqual({'time_max': {'$gte': datetime.datetime(2016, 1, 1, 0, 0)}}, mongo_dict)
 
     def test_to_dict_both_None(self):
         # noinspection PyTypeChecker
@@ -66,20 +91,19 @@ class TestMongoQueryConverter(unittest.TestCase):
         query = DatasetQuery(pname=["diato"])
 
         mongo_dict = self.converter.to_dict(query)
-        self.assertEqual({'attributes': {
-            '$in': [
-                re.compile('^diato_?\\d*\\.?\\d*$', re.IGNORECASE)
-            ]}}, mongo_dict)
+        self.assertEqual({'products': {'$in': ['diato']}}, mongo_dict)
 
     def test_to_dict_two_pname(self):
         query = DatasetQuery(pname=["fuco", "perid"])
 
         mongo_dict = self.converter.to_dict(query)
-        self.assertEqual({'attributes': {
-            '$in': [
-                re.compile('^fuco_?\\d*\\.?\\d*$', re.IGNORECASE),
-                re.compile('^perid_?\\d*\\.?\\d*$', re.IGNORECASE)
-            ]}}, mongo_dict)
+        self.assertEqual({'products': {'$in': ['fuco', 'perid']}}, mongo_dict)
+
+    def test_to_dict_pname_wildcard(self):
+        query = DatasetQuery(pname=["Chl", "a*ph"])
+
+        mongo_dict = self.converter.to_dict(query)
+        self.assertEqual({'products': {'$in': ['chl', re.compile('^a.*ph$')]}}, mongo_dict)
 
     def test_to_dict_shallow_no(self):
         query = DatasetQuery(shallow='no')
@@ -0,0 +1,105 @@
+import unittest
+from datetime import datetime
+from types import SimpleNamespace
+
+import pymongo.errors
+
+from ocdb.db.query_trace import QueryTracer, get_query_shape
+
+
+def _started(request_id, command_name, command):
+    return SimpleNamespace(connection_id=('localhost', 27017), request_id=request_id, command_name=command_name,
+                           database_name='ocdb', command=command)
+
+
+def _succeeded(request_id, duration_ms, reply):
+    return SimpleNamespace(connection_id=('localhost', 27017), request_id=request_id,
+                           duration_micros=int(duration_ms * 1000), reply=reply)
+
+
+class QueryTracerTest(unittest.TestCase):
+
+    def test_get_query_shape(self):
+        self.assertEqual({'status': '?', 'time_max': {'$gte': '?'}, 'products': {'$in': '?'}},
+                         get_query_shape({'status': 'PUBLISHED', 'time_max': {'$gte': datetime(2016, 1, 1)},
+                                          'products': {'$in': ['chl', 'rrs']}}))
+        self.assertEqual([{'$match': {'$or': [{'user_id': '?'}, {'status': '?'}]}}, {'$sort': {'date': -1}}],
+                         get_query_shape([{'$match': {'$or': [{'user_id': 'scott'}, {'status': 'PUBLISHED'}]}},
+                                          {'$sort': {'date': -1}}]))
+
+    def test_trace(self):
+        tracer = QueryTracer(slow_query_ms=50, buffer_size=2)
+
+        tracer.started(_started(1, 'find', {'find': 'submission_files', 'filter': {'user_id': 'scott'}}))
+        tracer.succeeded(_succeeded(1, 10, {'cursor': {'firstBatch': [{}, {}]}, 'ok': 1}))
+        tracer.started(_started(2, 'find', {'find': 'submission_files', 'filter': {'user_id': 'tiger'}}))
+        tracer.succeeded(_succeeded(2, 30, {'cursor': {'firstBatch': [{}]}, 'ok': 1}))
+        tracer.started(_started(3, 'count', {'count': 'sb_datasets', 'query': {'status': 'PUBLISHED'}}))
+        tracer.succeeded(_succeeded(3, 60, {'n': 1234, 'ok': 1}))
+        # not traced
+        tracer.started(_started(4, 'hello', {'hello': 1}))
+        tracer.succeeded(_succeeded(4, 1, {'ok': 1}))
+
+        traces = tracer.traces
+        self.assertEqual(2, len(traces))
+        self.assertEqual('ocdb.sb_datasets.count', traces[1].operation)
+        self.assertEqual('{"query": {"status": "?"}}', traces[1].shape)
+        self.assertEqual(1234, traces[1].doc_count)
+
+        shapes = tracer.get_slowest_shapes()
+        self.assertEqual(2, len(shapes))
+        self.assertEqual('ocdb.sb_datasets.count', shapes[0]['operation'])
+        self.assertEqual('ocdb.submission_files.find', shapes[1]['operation'])
+        self.assertEqual('{"filter": {"user_id": "?"}}', shapes[1]['shape'])
+        self.assertEqual(2, shapes[1]['count'])
+        self.assertAlmostEqual(40., shapes[1]['total_ms'])
+        self.assertAlmostEqual(30., shapes[1]['max_ms'])
+        self.assertAlmostEqual(1.5, shapes[1]['mean_doc_count'])
+        self.assertIsNone(shapes[1]['explain'])
+
+        self.assertEqual(1, len(tracer.get_slowest_shapes(limit=1)))
+
+        tracer.clear()
+        self.assertEqual([], tracer.traces)
+        self.assertEqual([], tracer.get_slowest_shapes())
+
+    def test_explain(self):
+        tracer = QueryTracer()
+        tracer.started(_started(1, 'find', {'find': 'submission_files', 'filter': {'user_id': 'scott'},
+                                             'lsid': {'id': 1}, '$db': 'ocdb'}))
+        tracer.succeeded(_succeeded(1, 10, {'cursor': {'firstBatch': []}, 'ok': 1}))
+
+        explained = []
+
+        def explain(database_name, command):
+            explained.append((database_name, command))
+            return {'queryPlanner': {'winningPlan': {'stage': 'FETCH',
+                                                     'inputStage': {'stage': 'IXSCAN', 'indexName': '_userid_'}}},
+                    'executionStats': {'totalDocsExamined': 3, 'totalKeysExamined': 3, 'executionTimeMillis': 1}}
+
+        shapes = tracer.get_slowest_shapes(explain=explain)
+        self.assertEqual([('ocdb', {'find': 'submission_files', 'filter': {'user_id': 'scott'}})], explained)
+        self.assertEqual({'stages': ['FETCH', 'IXSCAN _userid_'], 'docs_examined': 3, 'keys_examined': 3,
+                          'execution_ms': 1}, shapes[0]['explain'])
+
+        # explained once per shape
+        tracer.get_slowest_shapes(explain=explain)
+        self.assertEqual(1, len(explained))
+
+    def test_explain_failed(self):
+        tracer = QueryTracer()
+        tracer.started(_started(1, 'find', {'find': 'submission_files', 'filter': {'user_id': 'scott'},
+                                             '$db': 'ocdb'}))
+        tracer.succeeded(_succeeded(1, 20, {'cursor': {'firstBatch': []}, 'ok': 1}))
+        tracer.started(_started(2, 'find', {'find': 'sb_datasets', 'filter': {'status': 'PUBLISHED'},
+                                             '$db': 'ocdb'}))
+        tracer.succeeded(_succeeded(2, 10, {'cursor': {'firstBatch': []}, 'ok': 1}))
+
+        def explain(database_name, command):
+            if command['find'] == 'submission_files':
+                raise pymongo.errors.OperationFailure('cannot explain')
+            return {'queryPlanner': {'winningPlan': {'stage': 'COLLSCAN'}}, 'executionStats': {}}
+
+        shapes = tracer.get_slowest_shapes(explain=explain)
+        self.assertEqual({'error': 'cannot explain'}, shapes[0]['explain'])
+        self.assertEqual(['COLLSCAN'], shapes[1]['explain']['stages'])
@@ -0,0 +1,91 @@
+import importlib.util
+import io
+import json
+import pickle
+import struct
+import unittest
+
+from ocdb.db.record_format import encode_records, decode_records, decode_columns, is_columnar, \
+    check_compression, COMPRESSION_NONE, COMPRESSION_ZLIB, COMPRESSION_LZ4
+
+RECORDS = [[109.8, -38.4, 998, 'ab', 'x', 1.5],
+           [109.9, -38.3, 999, 'cdé', 2, -999],
+           [110.0, -38.2, 2 ** 70, '', None, float('nan')]]
+
+
+class RecordFormatTest(unittest.TestCase):
+
+    def test_encode_decode(self):
+        for compression in (COMPRESSION_NONE, COMPRESSION_ZLIB):
+            blob = encode_records(RECORDS, ['lon', 'lat', 'depth', 'station', 'mixed', 'chl'],
+                                  compression=compression)
+            self.assertTrue(is_columnar(blob))
+
+            records = decode_records(io.BytesIO(blob))
+            self.assertEqual(3, len(records))
+            self.assertEqual(RECORDS[0], records[0])
+            self.assertEqual(RECORDS[1], records[1])
+            self.assertEqual(RECORDS[2][:5], records[2][:5])
+            self.assertNotEqual(records[2][5], records[2][5])
+            self.assertEqual([float, float, int, str, str, float], [type(value) for value in records[0]])
+            # the integer fill value of the float column is stored as float
+            self.assertEqual([float, float, int, str, int, float], [type(value) for value in records[1]])
+
+    def test_decode_columns(self):
+        blob = encode_records(RECORDS, ['lon', 'lat', 'depth', 'station', 'mixed', 'chl'])
+
+        columns = decode_columns(io.BytesIO(blob), ['station', 'lat', 'unknown'])
+        self.assertEqual(['lat', 'station'], list(columns.keys()))
+        self.assertEqual([-38.4, -38.3, -38.2], columns['lat'])
+        self.assertEqual(['ab', 'cdé', ''], columns['station'])
+
+        columns = decode_columns(io.BytesIO(blob))
+        self.assertEqual(['lon', 'lat', 'depth', 'station', 'mixed', 'chl'], list(columns.keys()))
+
+    def test_encode_float_column_with_fill_values(self):
+        blob = encode_records([[1.5, -9999], [-9999, 10.5], [2.25, 2 ** 53 + 1]], ['chl', 'depth'],
+                              compression=COMPRESSION_NONE)
+
+        directory = json.loads(blob[12:12 + struct.unpack('<I', blob[8:12])[0]].decode('utf-8'))
+        self.assertEqual(['f8', 'json'], [column['type'] for column in directory['columns']])
+        columns = decode_columns(io.BytesIO(blob))
+        self.assertEqual([1.5, -9999.0, 2.25], columns['chl'])
+        self.assertEqual([float, float, float], [type(value) for value in columns['chl']])
+        # integers not exactly representable as floats keep the column from being promoted
+        self.assertEqual([-9999, 10.5, 2 ** 53 + 1], columns['depth'])
+
+    def test_encode_without_names(self):
+        blob = encode_records([[1, 2.0], [3, 4.0]])
+        self.assertEqual({'0': [1, 3], '1': [2.0, 4.0]}, decode_columns(io.BytesIO(blob)))
+
+        blob = encode_records([[1, 2.0], [3, 4.0]], ['a'])
+        self.assertEqual({'0': [1, 3], '1': [2.0, 4.0]}, decode_columns(io.BytesIO(blob)))
+
+    def test_encode_empty(self):
+        self.assertEqual([], decode_records(io.BytesIO(encode_records([], ['a', 'b']))))
+        self.assertEqual({'a': [], 'b': []}, decode_columns(io.BytesIO(encode_records([], ['a', 'b']))))
+
+    def test_encode_records_of_different_length(self):
+        with self.assertRaises(ValueError):
+            encode_records([[1, 2], [3]])
+
+    def test_compression(self):
+        check_compression(COMPRESSION_NONE)
+        check_compression(COMPRESSION_ZLIB)
+        with self.assertRaises(ValueError):
+            check_compression('gzip')
+
+        if importlib.util.find_spec('lz4') is None:
+            with self.assertRaises(ValueError):
+                check_compression(COMPRESSION_LZ4)
+        else:
+            blob = encode_records(RECORDS[:2], compression=COMPRESSION_LZ4)
+            self.assertEqual(RECORDS[:2], decode_records(io.BytesIO(blob)))
+
+    def test_is_columnar(self):
+        self.assertFalse(is_columnar(pickle.dumps(RECORDS)))
+        self.assertFalse(is_columnar(b''))
+
+    def test_decode_invalid(self):
+        with self.assertRaises(ValueError):
+            decode_records(io.BytesIO(pickle.dumps(RECORDS) + bytes(16)))
@@ -1,7 +1,8 @@
 import unittest
 from typing import List
 
-from ocdb.db.static_data import get_products, get_product_groups, get_fields, get_groups_for_product
+from ocdb.db.static_data import get_products, get_product_groups, get_fields, get_groups_for_product, \
+    get_product_names, get_product_name_pattern, strip_wavelength
 
 
 class StaticDataTest(unittest.TestCase):
@@ -54,6 +55,23 @@ class StaticDataTest(unittest.TestCase):
     def test_get_group_for_product_numbers_stripped(self):
         self.assertEqual(["a"], get_groups_for_product("abs_ag676"))
 
+    def test_strip_wavelength(self):
+        self.assertEqual("Rrs", strip_wavelength("Rrs412.5"))
+        self.assertEqual("abs_ag", strip_wavelength("abs_ag676"))
+        self.assertEqual("Rrs_", strip_wavelength("Rrs_412"))
+        self.assertEqual("Chl_a", strip_wavelength("Chl_a"))
+        self.assertEqual("412", strip_wavelength("412"))
+
+    def test_get_product_names(self):
+        self.assertEqual([], get_product_names([]))
+        self.assertEqual(['chl_c', 'chl_c1', 'fuco', 'lat', 'rrs', 'rrs412.5', 'rrs_412'],
+                         get_product_names(['Rrs_412', 'Rrs412.5', 'Chl_c1', 'Fuco', 'lat']))
+
+    def test_get_product_name_pattern(self):
+        self.assertEqual("^a.*ph$", get_product_name_pattern("a*ph"))
+        self.assertEqual("^abs.$", get_product_name_pattern("Abs?"))
+        self.assertEqual("^beta\\-car$", get_product_name_pattern("beta-Car"))
+
     def assert_valid_field(self, field):
         self.assertIsInstance(field, dict)
         self.assertEqual(4, len(field))
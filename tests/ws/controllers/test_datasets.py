@@ -97,6 +97,27 @@ class DatasetsTest(unittest.TestCase):
         self.assertIsInstance(result, DatasetQueryResult)
         self.assertEqual(3, result.total_count)
 
+    def test_find_datasets_max_total_count(self):
+        for n in range(5):
+            add_dataset(self.ctx, dataset=new_test_dataset(n))
+
+        result = find_datasets(self.ctx, offset=2, count=2, max_total_count=3)
+        self.assertEqual(3, result.total_count)
+        self.assertFalse(result.total_count_exact)
+        self.assertEqual(['dataset-1.txt', 'dataset-2.txt'], [ds_ref.filename for ds_ref in result.datasets])
+
+        result = find_datasets(self.ctx, count=2, max_total_count=10)
+        self.assertEqual(5, result.total_count)
+        self.assertTrue(result.total_count_exact)
+
+        result = find_datasets(self.ctx, count=0)
+        self.assertEqual(5, result.total_count)
+        self.assertTrue(result.total_count_exact)
+        self.assertEqual([], result.datasets)
+
+        with self.assertRaises(WsBadRequestError):
+            find_datasets(self.ctx, max_total_count=0)
+
     def test_find_datasets_pgroup(self):
         dataset = new_test_dataset(1)
         dataset.groups = ["a"]
@@ -260,6 +281,15 @@ class DatasetsTest(unittest.TestCase):
         with self.assertRaises(WsResourceNotFoundError):
             get_dataset_by_id_strict(self.ctx, "gnarz")
 
+    def test_get_dataset_by_id_fields(self):
+        dataset = new_test_dataset(1)
+        dataset.attributes = ['a', 'b', 'c']
+        dataset_id = add_dataset(self.ctx, dataset=dataset).id
+
+        dataset = get_dataset_by_id_strict(self.ctx, dataset_id, fields=['b'])
+        self.assertEqual(['b'], dataset.attributes)
+        self.assertEqual([[3.3], [6.6]], dataset.records)
+
     def test_update_dataset(self):
         dataset_ref = add_dataset(self.ctx, new_test_dataset(42))
         dataset_id = dataset_ref.id
@@ -281,6 +311,18 @@ class DatasetsTest(unittest.TestCase):
         with self.assertRaises(WsResourceNotFoundError):
             delete_dataset(self.ctx, dataset_id)
 
+    def test_delete_datasets_by_submission(self):
+        dataset = new_test_dataset(42)
+        dataset.submission_id = 'sub-1'
+        dataset_id = add_dataset(self.ctx, dataset).id
+        other_dataset_id = add_dataset(self.ctx, new_test_dataset(43)).id
+
+        self.assertEqual(1, delete_datasets_by_submission(self.ctx, 'sub-1'))
+        self.assertEqual(0, delete_datasets_by_submission(self.ctx, 'sub-1'))
+        with self.assertRaises(WsResourceNotFoundError):
+            get_dataset_by_id_strict(self.ctx, dataset_id)
+        self.assertEqual(other_dataset_id, get_dataset_by_id_strict(self.ctx, other_dataset_id).id)
+
     @unittest.skip('not implemented yet')
     def test_get_datasets_in_path(self):
         # TODO (generated): set required parameters
@@ -326,3 +368,6 @@ class DatasetsTest(unittest.TestCase):
         set_dataset_qc_info(self.ctx, dataset_id, expected_qc_info)
         qc_info = get_dataset_qc_info(self.ctx, dataset_id)
         self.assertEqual(expected_qc_info, qc_info)
+
+        with self.assertRaises(WsResourceNotFoundError):
+            set_dataset_qc_info(self.ctx, '5c5ab0d0d6aa0cbe2e5bf9b5', expected_qc_info)
@@ -43,3 +43,10 @@ class ServiceTest(unittest.TestCase):
         self.assertIsNotNone(result["info"].get("description"))
         self.assertEqual("RESTful API for the EUMETSAT Ocean C",
                          result["info"].get("description")[0:36])
+
+    def test_get_query_stats(self):
+        # the mock driver does not trace queries
+        self.assertEqual(dict(enabled=False, shapes=[]), get_query_stats(self.ctx))
+
+        with self.assertRaises(WsBadRequestError):
+            get_query_stats(self.ctx, limit=0)
@@ -19,11 +19,12 @@
 # OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
 # SOFTWARE.
 import unittest
+import unittest.mock
 
 from ocdb.core.db.db_user import DbUser
 from ocdb.core.models import User
 from ocdb.ws.controllers.store import *
-from ocdb.ws.controllers.store import _get_summary_validation_status
+from ocdb.ws.controllers.store import _get_summary_validation_status, _ingest_dataset_file
 from ocdb.ws.controllers.users import create_user
 from tests.helpers import new_test_service_context
 
@@ -574,6 +575,199 @@ class StoreTest(unittest.TestCase):
         finally:
             self.delete_test_file("DEL1012_Station_097_CTD_Data.txt")
 
+    def test_upload_store_files_in_process_pool(self):
+        store_user_path = 'process_pool_test'
+        self.ctx.configure(dict(self.ctx.config, max_process_count=2))
+        try:
+            header = ("/begin_header\n"
+                      "/delimiter = comma\n"
+                      "/north_latitude=42.598[DEG]\n"
+                      "/east_longitude=-67.105[DEG]\n"
+                      "/start_date=20101117\n"
+                      "/start_time=20:14:00[GMT]\n"
+                      "/fields = station, CHL\n"
+                      "/units = none, mg/m^3\n"
+                      "/end_header\n")
+            uploaded_files = [UploadedFile("first.txt", "text", (header + "97,2.47\n").encode("utf-8")),
+                              UploadedFile("second.txt", "text", b"no header\n"),
+                              UploadedFile("third.txt", "text", (header + "98,2.5\n").encode("utf-8"))]
+
+            result = upload_submission_files(ctx=self.ctx,
+                                             path="test_files/cruise/experiment",
+                                             submission_id="an_id",
+                                             user_name="scott",
+                                             dataset_files=uploaded_files,
+                                             publication_date="2100-01-01",
+                                             allow_publication=False,
+                                             doc_files=[],
+                                             store_user_path=store_user_path)
+
+            self.assertEqual(["first.txt", "second.txt", "third.txt"], list(result.keys()))
+            self.assertEqual("OK", result["first.txt"].status)
+            self.assertEqual("ERROR", result["second.txt"].status)
+            self.assertEqual("OSError: Unknown file format.", result["second.txt"].issues[0].description)
+            self.assertEqual("OK", result["third.txt"].status)
+
+            submission = get_submission(self.ctx, "an_id")
+            self.assertEqual(["first.txt", "second.txt", "third.txt"], [f.filename for f in submission.files])
+
+            datasets_dir_path = self.ctx.get_datasets_upload_path(os.path.join(store_user_path,
+                                                                               "test_files/cruise/experiment"))
+            with open(os.path.join(datasets_dir_path, "third.txt")) as fp:
+                self.assertEqual(header + "98,2.5\n", fp.read())
+            self.assertTrue(os.path.isfile(self._get_parsed_file_path(os.path.join(datasets_dir_path, "third.txt"))))
+            self.assertFalse(os.path.isfile(self._get_parsed_file_path(os.path.join(datasets_dir_path,
+                                                                                    "second.txt"))))
+            self.assertEqual(["first.txt", "second.txt", "third.txt"], sorted(os.listdir(datasets_dir_path)))
+        finally:
+            self.ctx.dispose()
+            shutil.rmtree(self.ctx.get_submission_path(store_user_path), ignore_errors=True)
+
+    def test_upload_streamed_files_in_process_pool(self):
+        store_user_path = 'process_pool_streamed_test'
+        self.ctx.configure(dict(self.ctx.config, max_process_count=1))
+        spool_dir_path = tempfile.mkdtemp()
+        try:
+            self.assertIsInstance(self.ctx.process_pool, concurrent.futures.ProcessPoolExecutor)
+            text = ("/begin_header\n"
+                    "/delimiter = comma\n"
+                    "/north_latitude=42.598[DEG]\n"
+                    "/east_longitude=-67.105[DEG]\n"
+                    "/start_date=20101117\n"
+                    "/start_time=20:14:00[GMT]\n"
+                    "/fields = station, CHL\n"
+                    "/units = none, mg/m^3\n"
+                    "/end_header\n"
+                    "97,2.47\n")
+            streamed_file = StreamedFile("datasetfiles", "streamed.txt", "text/plain",
+                                         os.path.join(spool_dir_path, "streamed.txt"))
+            streamed_file.write(text.encode("utf-8"))
+            streamed_file.close()
+            # parsing starts while the body is being received, in a spawned worker process
+            start_reading_dataset_file(self.ctx, streamed_file)
+
+            result = upload_submission_files(ctx=self.ctx,
+                                             path="test_files/cruise/experiment",
+                                             submission_id="an_id",
+                                             user_name="scott",
+                                             dataset_files=[streamed_file],
+                                             publication_date="2100-01-01",
+                                             allow_publication=False,
+                                             doc_files=[],
+                                             store_user_path=store_user_path)
+
+            self.assertIsInstance(result["streamed.txt"], DatasetValidationResult)
+            self.assertEqual("OK", result["streamed.txt"].status)
+            file_path = os.path.join(self.ctx.get_datasets_upload_path(os.path.join(store_user_path,
+                                                                                    "test_files/cruise/experiment")),
+                                     "streamed.txt")
+            with open(file_path) as fp:
+                self.assertEqual(text, fp.read())
+            self.assertFalse(os.path.exists(streamed_file.path))
+            # written by the worker process
+            self.assertTrue(os.path.isfile(self._get_parsed_file_path(file_path)))
+        finally:
+            self.ctx.dispose()
+            shutil.rmtree(spool_dir_path, ignore_errors=True)
+            shutil.rmtree(self.ctx.get_submission_path(store_user_path), ignore_errors=True)
+
+    def test_upload_store_files_removed_if_worker_fails(self):
+        store_user_path = 'worker_failure_test'
+        ingest_dataset_file_unpatched = _ingest_dataset_file
+
+        def ingest_dataset_file(source, *args):
+            if source == b"fails":
+                raise MemoryError()
+            return ingest_dataset_file_unpatched(source, *args)
+
+        try:
+            uploaded_files = [UploadedFile("first.txt", "text", b"no header\n"),
+                              UploadedFile("second.txt", "text", b"fails")]
+            with unittest.mock.patch('ocdb.ws.controllers.store._ingest_dataset_file', ingest_dataset_file):
+                with self.assertRaises(MemoryError):
+                    upload_submission_files(ctx=self.ctx,
+                                            path="test_files/cruise/experiment",
+                                            submission_id="an_id",
+                                            user_name="scott",
+                                            dataset_files=uploaded_files,
+                                            publication_date="2100-01-01",
+                                            allow_publication=False,
+                                            doc_files=[],
+                                            store_user_path=store_user_path)
+
+            datasets_dir_path = self.ctx.get_datasets_upload_path(os.path.join(store_user_path,
+                                                                               "test_files/cruise/experiment"))
+            self.assertEqual([], os.listdir(datasets_dir_path))
+            self.assertIsNone(get_submission(self.ctx, "an_id"))
+        finally:
+            shutil.rmtree(self.ctx.get_submission_path(store_user_path), ignore_errors=True)
+
+    def test_upload_and_publish_uses_parsed_file(self):
+        store_user_path = 'parsed_file_test'
+        try:
+            self._make_submission_at(store_user_path)
+
+            file_path = os.path.join(
+                self.ctx.get_datasets_upload_path(os.path.join(store_user_path, "test_files/cruise/experiment")),
+                "DEL1012_Station_097_CTD_Data.txt")
+            parsed_file_path = self._get_parsed_file_path(file_path)
+            self.assertTrue(os.path.isfile(parsed_file_path))
+
+            submission = get_submission(self.ctx, "an_id")
+            with unittest.mock.patch.object(SbFileReader, 'read', side_effect=AssertionError("parsed again")):
+                update_submission(self.ctx, submission, QC_STATUS_PUBLISHED, "2100-01-01")
+
+            result = find_datasets(self.ctx, submission_id="an_id")
+            self.assertEqual(1, result.total_count)
+            dataset = get_dataset_by_id(self.ctx, result.datasets[0].id)
+            self.assertEqual(1, len(dataset.records))
+            self.assertEqual(97, dataset.records[0][0])
+
+            delete_submission(self.ctx, "an_id")
+            self.assertFalse(os.path.isfile(parsed_file_path))
+        finally:
+            shutil.rmtree(self.ctx.get_submission_path(store_user_path), ignore_errors=True)
+
+    def test_upload_rejects_parsed_file_names(self):
+        uploaded_file = UploadedFile("foo.txt.parsed", "text", b"/begin_header\n")
+
+        with self.assertRaises(WsBadRequestError) as cm:
+            upload_submission_files(ctx=self.ctx, path="test_files/cruise/experiment", submission_id="an_id",
+                                    user_name="scott", dataset_files=[uploaded_file], publication_date="2100-01-01",
+                                    allow_publication=False, doc_files=[], store_user_path='parsed_name_test')
+        self.assertEqual("File names must not end with '.parsed': foo.txt.parsed", cm.exception.reason)
+        self.assertIsNone(get_submission(self.ctx, "an_id"))
+
+    def _get_parsed_file_path(self, file_path: str) -> str:
+        return sb_parsed_file.get_parsed_file_path(self.ctx.parsed_files_path,
+                                                   sb_parsed_file.compute_content_hash(file_path))
+
+    def _make_submission_at(self, store_user_path: str):
+        data_file_text = ("/begin_header\n"
+                          "/received=20120330\n"
+                          "/delimiter = comma\n"
+                          "/north_latitude=42.598[DEG]\n"
+                          "/east_longitude=-67.105[DEG]\n"
+                          "/start_date=20101117\n"
+                          "/end_date=20101117\n"
+                          "/start_time=20:14:00[GMT]\n"
+                          "/end_time=20:14:00[GMT]\n"
+                          "/fields = station, SN, lat, lon, year, month, day, hour, minute, pressure, wt, sal, CHL, Epar, oxygen\n"
+                          "/units = none, none, degrees, degrees, yyyy, mo, dd, hh, mn, dbar, degreesC, PSU, mg/m^3, uE/cm^2s, ml/L\n"
+                          "/end_header\n"
+                          "97,420,42.598,-67.105,2010,11,17,20,14,3,11.10,33.030,2.47,188,6.1\n")
+        uploaded_file = UploadedFile("DEL1012_Station_097_CTD_Data.txt", "text", data_file_text.encode("utf-8"))
+
+        upload_submission_files(ctx=self.ctx,
+                                path="test_files/cruise/experiment",
+                                submission_id="an_id",
+                                user_name="scott",
+                                dataset_files=[uploaded_file],
+                                publication_date="2100-01-01",
+                                allow_publication=False,
+                                doc_files=[],
+                                store_user_path=store_user_path)
+
     def test_get_summary_vaidation_status_no_results(self):
         self.assertEqual(DATASET_VALIDATION_RESULT_STATUS_OK, _get_summary_validation_status({}))
 
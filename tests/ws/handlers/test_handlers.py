@@ -18,11 +18,14 @@
 # LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
 # OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
 # SOFTWARE.
+import asyncio
 import datetime
 import io
 import os
 import tempfile
+import threading
 import unittest
+import unittest.mock
 import urllib.parse
 import zipfile
 from typing import Optional
@@ -38,12 +41,15 @@ from ocdb.core.models.qc_info import QcInfo, QC_STATUS_SUBMITTED, \
 from ocdb.core.models.submission import Submission, TYPE_MEASUREMENT
 from ocdb.core.models.submission_file import SubmissionFile
 from ocdb.core.roles import Roles
+from ocdb.core.seabass import sb_parsed_file
 from ocdb.version import MIN_CLIENT_VERSION
 from ocdb.ws.app import new_application
 from ocdb.ws.controllers.datasets import add_dataset, get_dataset_qc_info
 from ocdb.ws.controllers.users import create_user
 from ocdb.ws.handlers import API_URL_PREFIX
 # noinspection PyProtectedMember
+from ocdb.ws.handlers import _handlers
+# noinspection PyProtectedMember
 from ocdb.ws.handlers._handlers import _ensure_string_argument, WsBadRequestError, _ensure_int_argument, \
     UpdateSubmissionStatus
 from tests.core.mpf import MultiPartForm
@@ -251,6 +257,23 @@ class StoreInfoTest(WsTestCase):
         self.assertIn("productGroups", result)
 
 
+class QueryStatsTest(WsTestCase):
+
+    def test_get(self):
+        response = self.fetch(API_URL_PREFIX + "/service/queries", method='GET')
+        self.assertEqual(403, response.code)
+
+        cookie = self.login_admin()
+        try:
+            response = self.fetch(API_URL_PREFIX + "/service/queries?limit=10", method='GET',
+                                  headers={'Cookie': cookie})
+            self.assertEqual(200, response.code)
+            result = tornado.escape.json_decode(response.body)
+            self.assertEqual({'enabled': False, 'shapes': []}, result)
+        finally:
+            self.logout_admin()
+
+
 class HandleSubmissionTest(WsTestCase):
 
     def test_post_invalid_submission_id(self):
@@ -352,7 +375,7 @@ class HandleSubmissionTest(WsTestCase):
                                            'filename': os.path.basename(TEST_DATA_FILE_NAME),
                                            'filetype': 'MEASUREMENT',
                                            'status': 'OK',
-                                           'result': {'status': 'OK', 'issues': []}
+                                           'result': {'status': 'OK', 'issue_counts': {'ERROR': 0, 'WARNING': 0}}
                                            }
                                       ]
                                       }
@@ -361,6 +384,56 @@ class HandleSubmissionTest(WsTestCase):
         finally:
             self.logout_admin()
 
+    def test_post_submission_spooled_files_moved(self):
+        cookie = self.login_admin()
+        try:
+            form = MultiPartForm()
+            form.add_field('path', "KK/KK/KK")
+            form.add_field('submissionid', "SPOOLED")
+            form.add_field('publicationdate', str(None))
+            form.add_field('allowpublication', str(False))
+            form.add_file(f'datasetfiles', os.path.basename(TEST_DATA_FILE_NAME), TEST_DATA_FILE_NAME,
+                          mime_type="text/plain")
+            form.add_file(f'docfiles', "readme.txt", io.StringIO("read me"), mime_type="text/plain")
+
+            data = bytes(form)
+            response = self.fetch(API_URL_PREFIX + "/store/upload/submission", method='POST', body=data,
+                                  headers={"Cookie": cookie, 'Content-length': len(data),
+                                           'Content-type': form.content_type})
+            self.assertEqual(200, response.code)
+
+            sub_path = os.path.join("chef_SPOOLED", "KK/KK/KK")
+            dataset_path = os.path.join(self.ctx.get_datasets_upload_path(sub_path),
+                                        os.path.basename(TEST_DATA_FILE_NAME))
+            with open(TEST_DATA_FILE_NAME, 'rb') as fp, open(dataset_path, 'rb') as uploaded_fp:
+                self.assertEqual(fp.read(), uploaded_fp.read())
+            parsed_file_path = sb_parsed_file.get_parsed_file_path(self.ctx.parsed_files_path,
+                                                                   sb_parsed_file.compute_content_hash(dataset_path))
+            self.assertTrue(os.path.isfile(parsed_file_path))
+            self.assertFalse(os.path.exists(dataset_path + '.parsed'))
+            with open(os.path.join(self.ctx.get_doc_files_upload_path(sub_path), "readme.txt")) as fp:
+                self.assertEqual("read me", fp.read())
+
+            # nothing remains in the spool directory
+            self.assertEqual([], os.listdir(os.path.join(self.ctx.upload_path, '.incoming')))
+        finally:
+            self.logout_admin()
+
+    def test_put_chunked_body(self):
+        cookie = self.login_admin()
+        try:
+            async def body_producer(write):
+                await write(b'{"submissionid": "", ')
+                await write(b'"path": "KK/KK/KK"}')
+
+            # without a Content-Length header, the body is sent with chunked transfer encoding
+            response = self.fetch(API_URL_PREFIX + "/store/upload/submission/I_DO_EXIST", method='PUT',
+                                  body_producer=body_producer, headers={"Cookie": cookie})
+            self.assertEqual(400, response.code)
+            self.assertTrue(response.reason.startswith("Please use only alphanumeric characters"))
+        finally:
+            self.logout_admin()
+
     def test_post_submission_pub_not_allowed(self):
         cookie = self.login_admin()
         try:
@@ -396,6 +469,33 @@ class HandleSubmissionTest(WsTestCase):
         finally:
             self.logout_admin()
 
+    def test_post_without_submit_rights_not_spooled(self):
+        create_user(ctx=self.ctx, user=DbUser(id_='reader_id', name="reader", password="reader", first_name='Read',
+                                              last_name="Only", email="", phone="", roles=[]))
+        credentials = {'username': "reader", 'password': "reader", 'client_version': MIN_CLIENT_VERSION}
+        response = self.fetch(API_URL_PREFIX + f"/users/login", method='POST',
+                              body=tornado.escape.json_encode(credentials))
+        cookie = response.headers._dict["Set-Cookie"]
+        try:
+            form = MultiPartForm()
+            form.add_field('submissionid', "READER")
+            form.add_file(f'datasetfiles', os.path.basename(TEST_DATA_FILE_NAME), TEST_DATA_FILE_NAME,
+                          mime_type="text/plain")
+
+            data = bytes(form)
+            with unittest.mock.patch.object(_handlers, 'start_reading_dataset_file') as start_reading:
+                response = self.fetch(API_URL_PREFIX + "/store/upload/submission", method='POST', body=data,
+                                      headers={"Cookie": cookie, 'Content-length': len(data),
+                                               'Content-type': form.content_type})
+
+            self.assertEqual(403, response.code)
+            self.assertEqual('Not enough access rights to perform a submission', response.reason)
+            start_reading.assert_not_called()
+            spool_root_path = os.path.join(self.ctx.upload_path, '.incoming')
+            self.assertFalse(os.path.isdir(spool_root_path) and os.listdir(spool_root_path))
+        finally:
+            self.fetch(API_URL_PREFIX + "/users/logout", method='GET')
+
     def test_post_not_logged_in(self):
         mpf = MultiPartForm(boundary="HEFFALUMP")
         mpf.add_field("submissionid", "whatever")
@@ -465,6 +565,18 @@ class HandleSubmissionTest(WsTestCase):
         finally:
             self.logout_admin()
 
+    def test_get_looks_up_user_once(self):
+        cookie = self.login_admin()
+        try:
+            with unittest.mock.patch.object(self.ctx, 'get_user', wraps=self.ctx.get_user) as get_user:
+                response = self.fetch(API_URL_PREFIX + f"/store/upload/submission/I_DO_EXIST", method='GET',
+                                      headers={"Cookie": cookie})
+
+            self.assertEqual(200, response.code)
+            get_user.assert_called_once_with("chef")
+        finally:
+            self.logout_admin()
+
     def test_get_success(self):
         cookie = self.login_admin()
         try:
@@ -672,7 +784,7 @@ class HandleSubmissionFileTest(WsTestCase):
                               'creationdate': '2009-08-07T06:05:04',
                               'filetype': 'black',
                               'index': 0,
-                              'result': {'issues': [], 'status': 'OK'},
+                              'result': {'issue_counts': {'ERROR': 0, 'WARNING': 0}, 'status': 'OK'},
                               'status': 'SUBMITTED',
                               'submission_id': 'submitme'}, actual_response_data)
         finally:
@@ -892,7 +1004,7 @@ class HandleSubmissionFileTest(WsTestCase):
                               'filetype': TYPE_MEASUREMENT,
                               'index': 1,
                               'creationdate': '2009-08-07T06:05:04',
-                              'result': {'issues': [], 'status': 'OK'},
+                              'result': {'issue_counts': {'ERROR': 0, 'WARNING': 0}, 'status': 'OK'},
                               'status': "OK",
                               'submission_id': 'rabatz'}, actual_response_data)
         finally:
@@ -952,6 +1064,38 @@ class HandleSubmissionFileTest(WsTestCase):
                "401  0.121268  0.018595  0.058999  0.007099"
 
 
+class GetSubmissionFileIssuesTest(WsTestCase):
+
+    def test_get(self):
+        cookie = self.login_admin()
+        try:
+            issues = [Issue(type="WARNING", description=f"This might be wrong in line {n}") for n in range(5)]
+            files = [SubmissionFile(submission_id="submitme", index=0, creationdate=NOW, filename="Helga",
+                                    filetype="green", status=QC_STATUS_VALIDATED,
+                                    result=DatasetValidationResult(status="WARNING", issues=issues))]
+            db_subm = DbSubmission(status="Hellyeah", user_id='88763', submission_id="submitme", files=files,
+                                   qc_status="OK", path="/root/hell/yeah", date=datetime.datetime(2001, 2, 3, 4, 5, 6),
+                                   store_user_path='Tom_Helge')
+            self.ctx.db_driver.add_submission(db_subm)
+
+            response = self.fetch(API_URL_PREFIX + "/store/issues/submissionfile/submitme/0?offset=3&count=10",
+                                  method='GET', headers={"Cookie": cookie})
+
+            self.assertEqual(200, response.code)
+            actual_response_data = tornado.escape.json_decode(response.body)
+            self.assertEqual({'issues': [{'type': 'WARNING', 'description': 'This might be wrong in line 3'},
+                                         {'type': 'WARNING', 'description': 'This might be wrong in line 4'}],
+                              'tot_count': 5}, actual_response_data)
+        finally:
+            self.logout_admin()
+
+    def test_get_not_logged_in(self):
+        response = self.fetch(API_URL_PREFIX + "/store/issues/submissionfile/submitme/0", method='GET')
+
+        self.assertEqual(403, response.code)
+        self.assertEqual('Please login.', response.reason)
+
+
 class UpdateSubmissionFileStatusTest(WsTestCase):
 
     def test_update_invalid_submissionfile(self):
@@ -1048,8 +1192,7 @@ class UpdateSubmissionFileStatusTest(WsTestCase):
                               'creationdate': '2009-08-07T06:05:04',
                               'filetype': 'green',
                               'index': 1,
-                              'result': {'issues': [{'description': 'This might be wrong',
-                                                     'type': 'WARNING'}],
+                              'result': {'issue_counts': {'ERROR': 0, 'WARNING': 1},
                                          'status': 'WARNING'},
                               'status': 'APPROVED',
                               'submission_id': 'submitme'}, actual_response_data)
@@ -1173,6 +1316,27 @@ class StoreDownloadTest(WsTestCase):
         self.assertEqual('OK', response.reason)
         self.assertIsNone(response._body)
 
+    def test_post_concurrently(self):
+        # each download only returns once both downloads are running
+        barrier = threading.Barrier(2, timeout=5)
+        download_unpatched = _handlers.download_store_files_by_id
+
+        def download_store_files_by_id(*args, **kwargs):
+            barrier.wait()
+            return download_unpatched(*args, **kwargs)
+
+        body = tornado.escape.json_encode({"id_list": [], "docs": False})
+
+        async def fetch_both():
+            return await asyncio.gather(*[self.http_client.fetch(self.get_url(API_URL_PREFIX + "/store/download"),
+                                                                 method='POST', body=body) for _ in range(2)])
+
+        with unittest.mock.patch.object(_handlers, 'download_store_files_by_id', download_store_files_by_id):
+            responses = self.io_loop.run_sync(fetch_both, timeout=10)
+
+        for response in responses:
+            self.assertEqual(200, response.code)
+
     def test_post_valid_list(self):
         target_dir = None
         target_file_1 = None
@@ -1384,6 +1548,17 @@ class DatasetsTest(WsTestCase):
         self.assertIn("total_count", actual_response_data)
         self.assertEqual(4, actual_response_data["total_count"])
 
+    def test_get_max_total_count(self):
+        for n in range(4):
+            add_dataset(self.ctx, new_test_dataset(n))
+
+        response = self.fetch(API_URL_PREFIX + "/datasets?count=1&max_total_count=2", method='GET')
+        self.assertEqual(200, response.code)
+        actual_response_data = tornado.escape.json_decode(response.body)
+        self.assertEqual(2, actual_response_data["total_count"])
+        self.assertFalse(actual_response_data["total_count_exact"])
+        self.assertEqual(1, len(actual_response_data["datasets"]))
+
     def test_get_multiple_pgroups(self):
         dataset = new_test_dataset(0)
         dataset.groups = ['chl_a']
@@ -1518,6 +1693,28 @@ class DatasetsTest(WsTestCase):
         self.assertIn("total_count", actual_response_data)
         self.assertEqual(2, actual_response_data["total_count"])
 
+    def test_get_concurrently(self):
+        add_dataset(self.ctx, new_test_dataset(0))
+
+        # each search only returns once both searches are running
+        barrier = threading.Barrier(2, timeout=5)
+        find_datasets_unpatched = _handlers.find_datasets
+
+        def find_datasets(*args, **kwargs):
+            barrier.wait()
+            return find_datasets_unpatched(*args, **kwargs)
+
+        async def fetch_both():
+            return await asyncio.gather(self.http_client.fetch(self.get_url(API_URL_PREFIX + "/datasets")),
+                                        self.http_client.fetch(self.get_url(API_URL_PREFIX + "/datasets")))
+
+        with unittest.mock.patch.object(_handlers, 'find_datasets', find_datasets):
+            responses = self.io_loop.run_sync(fetch_both, timeout=10)
+
+        for response in responses:
+            self.assertEqual(200, response.code)
+            self.assertEqual(1, tornado.escape.json_decode(response.body)["total_count"])
+
 
 class DatasetsIdTest(WsTestCase):
     @property
@@ -1539,6 +1736,16 @@ class DatasetsIdTest(WsTestCase):
         self.assertEqual(404, response.code)
         self.assertEqual('Dataset with ID gnarz-foop not found', response.reason)
 
+    def test_get_fields(self):
+        dataset = new_test_dataset(0)
+        dataset.attributes = ['a', 'b', 'c']
+        dataset_id = add_dataset(self.ctx, dataset).id
+        response = self.fetch(API_URL_PREFIX + f"/datasets/{dataset_id}?fields=c,A", method='GET')
+        self.assertEqual(200, response.code)
+        actual_response_data = tornado.escape.json_decode(response.body)
+        self.assertEqual(['a', 'c'], actual_response_data["attributes"])
+        self.assertEqual([[1.2, 3.4], [4.5, 6.7]], actual_response_data["records"])
+
     def test_delete_not_logged_in(self):
         dataset_ref = add_dataset(self.ctx, new_test_dataset(0))
         dataset_id = dataset_ref.id
@@ -17,11 +17,11 @@ class ParserTest(unittest.TestCase):
         self.assertIsNotNone(openapi.components.schemas)
         self.assertEqual(16, len(openapi.components.schemas))
         self.assertIsNotNone(openapi.components.parameters)
-        self.assertEqual(25, len(openapi.components.parameters))
+        self.assertEqual(26, len(openapi.components.parameters))
         self.assertIsNotNone(openapi.components.request_bodies)
         self.assertEqual(9, len(openapi.components.request_bodies))
         self.assertIsNotNone(openapi.components.responses)
         self.assertEqual(17, len(openapi.components.responses))
 
         self.assertIsNotNone(openapi.path_items)
-        self.assertEqual(29, len(openapi.path_items))
+        self.assertEqual(31, len(openapi.path_items))
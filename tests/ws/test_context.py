@@ -23,6 +23,29 @@ class WsContextTest(unittest.TestCase):
         self.assertIsInstance(ctx.base_dir, str)
         self.assertTrue(ctx.base_dir.replace("\\", "/").endswith("/ocdb-server/tests/ws/res"))
 
+    def test_process_pool(self):
+        ctx = new_test_service_context()
+        # the test configuration runs tasks in the calling thread
+        future = ctx.process_pool.submit(divmod, 7, 2)
+        self.assertTrue(future.done())
+        self.assertEqual((3, 1), future.result())
+        future = ctx.process_pool.submit(divmod, 7, 0)
+        self.assertIsInstance(future.exception(), ZeroDivisionError)
+
+        process_pool = ctx.process_pool
+        ctx.configure(dict(ctx.config, max_process_count=1))
+        self.assertIsNot(process_pool, ctx.process_pool)
+        try:
+            self.assertEqual((3, 1), ctx.process_pool.submit(divmod, 7, 2).result())
+        finally:
+            ctx.dispose()
+
+    def test_max_upload_size(self):
+        ctx = new_test_service_context()
+        self.assertEqual(4 * 1024 ** 3, ctx.max_upload_size)
+        ctx.configure(dict(ctx.config, max_upload_size=1024))
+        self.assertEqual(1024, ctx.max_upload_size)
+
     def test_store_path(self):
         ctx = new_test_service_context()
         path = ctx.store_path
@@ -0,0 +1,80 @@
+import hashlib
+import io
+import os
+import shutil
+import tempfile
+import unittest
+
+from ocdb.ws.errors import WsBadRequestError
+from ocdb.ws.multipart import MultipartStreamParser, get_boundary
+from tests.core.mpf import MultiPartForm
+
+SB_TEXT = ("/begin_header\n"
+           "/fields=lat,lon\n"
+           "/end_header\n"
+           "12.5 -110.03\n") * 50
+
+
+class MultipartStreamParserTest(unittest.TestCase):
+
+    def setUp(self):
+        self.spool_dir_path = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.spool_dir_path, ignore_errors=True)
+
+    def _parse(self, form: MultiPartForm, chunk_size: int, on_file_received=None) -> MultipartStreamParser:
+        parser = MultipartStreamParser(form.content_type, self.spool_dir_path, on_file_received=on_file_received)
+        body = bytes(form)
+        for offset in range(0, len(body), chunk_size):
+            parser.data_received(body[offset:offset + chunk_size])
+        parser.finish()
+        return parser
+
+    def test_fields_and_files(self):
+        form = MultiPartForm(boundary="HEFFALUMP")
+        form.add_field("submissionid", "an_id")
+        form.add_field("path", "a/b/c")
+        form.add_file("datasetfiles", "one.txt", io.StringIO(SB_TEXT), mime_type="text/plain")
+        form.add_file("datasetfiles", "two.txt", io.StringIO("\r\n--HEFFALUM\r\n"), mime_type="text/plain")
+        form.add_file("docfiles", "doc.pdf", io.BytesIO(b"%PDF\x00\x01"), mime_type="application/pdf")
+
+        for chunk_size in (1, 7, 64, 1024 * 1024):
+            received = []
+            parser = self._parse(form, chunk_size, on_file_received=lambda f: received.append(f.filename))
+
+            self.assertEqual({"submissionid": [b"an_id"], "path": [b"a/b/c"]}, parser.arguments)
+            self.assertEqual(["one.txt", "two.txt", "doc.pdf"], received)
+
+            one, two = parser.files["datasetfiles"]
+            self.assertEqual("one.txt", one.filename)
+            self.assertEqual("text/plain", one.content_type)
+            self.assertEqual(SB_TEXT.encode("utf-8"), one.body)
+            self.assertEqual(len(SB_TEXT), one.size)
+            self.assertEqual(hashlib.sha256(SB_TEXT.encode("utf-8")).hexdigest(), one.content_hash)
+            self.assertEqual("ascii", one.encoding)
+            with one.open_text() as text:
+                self.assertEqual(SB_TEXT, text.read())
+            self.assertEqual(self.spool_dir_path, os.path.dirname(one.path))
+
+            self.assertEqual(b"\r\n--HEFFALUM\r\n", two.body)
+
+            doc, = parser.files["docfiles"]
+            self.assertEqual("doc.pdf", doc.filename)
+            self.assertEqual(b"%PDF\x00\x01", doc.body)
+
+    def test_body_incomplete(self):
+        form = MultiPartForm(boundary="HEFFALUMP")
+        form.add_file("datasetfiles", "one.txt", io.StringIO(SB_TEXT))
+        parser = MultipartStreamParser(form.content_type, self.spool_dir_path)
+        parser.data_received(bytes(form)[:100])
+
+        with self.assertRaises(WsBadRequestError) as cm:
+            parser.finish()
+        self.assertEqual("HTTP 400: Invalid multipart/form-data: body incomplete", f"{cm.exception}")
+
+    def test_get_boundary(self):
+        self.assertEqual(b"HEFFALUMP", get_boundary("multipart/form-data; boundary=HEFFALUMP"))
+        self.assertEqual(b"a b", get_boundary('multipart/form-data; boundary="a b"'))
+        with self.assertRaises(WsBadRequestError):
+            get_boundary("multipart/form-data")
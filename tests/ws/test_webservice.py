@@ -1,5 +1,9 @@
+import concurrent.futures
+import os
 import re
+import tempfile
 import unittest
+from types import SimpleNamespace
 
 from ocdb.ws import webservice
 
@@ -41,3 +45,33 @@ class UrlPatternTest(unittest.TestCase):
         with self.assertRaises(ValueError) as cm:
             webservice.url_pattern('/info/{id')
         self.assertEqual(str(cm.exception), 'no matching "}" after "{" in "/info/{id"')
+
+
+class WsStreamingRequestHandlerTest(unittest.TestCase):
+
+    def test_remove_spool_dir_waits_for_running_futures(self):
+        spool_dir_path = tempfile.mkdtemp()
+        running_future = concurrent.futures.Future()
+        running_future.set_running_or_notify_cancel()
+        pending_future = concurrent.futures.Future()
+        parser = SimpleNamespace(close=lambda: None,
+                                 files={'datasetfiles': [SimpleNamespace(future=running_future),
+                                                         SimpleNamespace(future=pending_future),
+                                                         SimpleNamespace(future=None)]})
+        thread_pool = concurrent.futures.ThreadPoolExecutor(max_workers=1)
+        handler = SimpleNamespace(_multipart_parser=parser, _spool_dir_path=spool_dir_path,
+                                  ws_context=SimpleNamespace(thread_pool=thread_pool))
+        try:
+            webservice.WsStreamingRequestHandler._remove_spool_dir(handler)
+
+            self.assertIsNone(handler._spool_dir_path)
+            self.assertTrue(pending_future.cancelled())
+            self.assertTrue(os.path.isdir(spool_dir_path))
+
+            running_future.set_result(None)
+            thread_pool.shutdown(wait=True)
+            self.assertFalse(os.path.exists(spool_dir_path))
+        finally:
+            thread_pool.shutdown(wait=True)
+            if os.path.isdir(spool_dir_path):
+                os.rmdir(spool_dir_path)